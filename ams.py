@@ -12,13 +12,21 @@ import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.writ
 
 # import re  # Regex
 import argparse  # commandline argument parsers
+import collections  # AMS command description
+import contextlib  # Redirections of AMS commands
+import errno  # Scripts without interpreter line
+import shlex  # To print AMS commands
+import shutil  # To remove scratch directories of concurrent jobs
+import threading  # Renames of concurrent jobs
+import time  # Wall time of calculations
+from concurrent.futures import ThreadPoolExecutor  # To run calculations concurrently
 
-# import subprocess  # Spawn process: subprocess.run('ls', stdout=subprocess.PIPE)
+import subprocess  # Spawn process: subprocess.run('ls', stdout=subprocess.PIPE)
 # import typing  # Explicit typing of arguments
 # import tempfile  # To create teporary files
 import socket  # Just to get hostname
-import mail  # My mail system
-from feutils import bashrun, cd, check_extension, errore, wide_help  # My generic functions
+from feutils import BASH, cd, check_extension, cputot, envsnapshot, errore, loginenv, mergeenv  # My generic functions
+from feutils import wide_help
 
 # ==============
 #  PROGRAM DATA
@@ -60,11 +68,18 @@ Engine ADF
 EndEngine
 """
 AMSDEFAULT = "/home/egidi/usr/local/ams/ams.trunk"
+# Output files of concurrent jobs are renamed one job at a time
+CLEANLOCK = threading.Lock()
+# Variables of the current environment seen by amsbashrc.sh
+AMSPRESET = ("SCM_TMPDIR", "SCMLICENSE")
+# License given before setting the AMS environment
+SCMLICENSE = None
 
 # =========
 #  CLASSES
 # =========
-
+# Command line, environment, input and output of an AMS run, and its directory if not the current one
+AmsCmd = collections.namedtuple("AmsCmd", "argv env inp out append cwd", defaults=(None,))
 
 # =================
 #  BASIC FUNCTIONS
@@ -107,7 +122,15 @@ def amsparser(parser):
         help="Set path to AMSHOME or choose AMS version",
     )
     parser.add_argument(
-        "-p", "--nproc", metavar="NSCM", type=int, dest="nproc", default=1, help="Set number of processors"
+        "-p", "--nproc", metavar="NSCM", type=int, dest="nproc", default=None, help="Set number of processors"
+    )
+    parser.add_argument(
+        "--jobs",
+        metavar="NJOBS",
+        dest="njobs",
+        type=int,
+        default=1,
+        help="Run up to NJOBS inputs concurrently splitting processors among them",
     )
     # parser.add_argument('-t', '--tmp', metavar='SCM_TMPDIR',
     #     dest='tmp', action='store', default=None,
@@ -148,19 +171,46 @@ def parseopt(args=None):
     # if opts.gauroot in GAUDIR.keys():
     #     opts.gauroot = exepath(GAUDIR[opts.gauroot])
     opts.amshome = amsdefault(opts.amshome)
+    if opts.njobs < 1:
+        errore("Number of concurrent jobs must be positive")
+    elif opts.njobs > 1:
+        if opts.out is not None and len(opts.inp) > 1:
+            errore("Output file cannot be set when running concurrent jobs")
+        opts.njobs = min(opts.njobs, len(opts.inp))
+        nslot = cputot() // opts.njobs
+        if nslot < 1:
+            errore(f"Too many concurrent jobs for {cputot()} processors")
+        if opts.nproc is None:
+            opts.nproc = nslot
+        elif opts.nproc > nslot:
+            errore(
+                f"{opts.nproc} processors per job requested, but only {nslot} available for each of {opts.njobs} jobs"
+            )
+    if opts.nproc is None:
+        opts.nproc = 1
     return opts
 
 
 # ================
 #  WORK FUNCTIONS
 # ================
+def amsprofenv(env, amshome: str) -> dict:
+    """Variables set or changed by amsbashrc.sh in the login environment, cached on disk until it changes"""
+    preset = {var: env[var] for var in AMSPRESET if env.get(var)}
+    preset["AMSHOME"] = amshome
+    login = loginenv()
+    sourced = envsnapshot(scripts=[os.path.join(amshome, "amsbashrc.sh")], preset=preset)
+    return {var: val for var, val in sourced.items() if login.get(var) != val}
+
+
 def setamsenv(env, amshome: str, vrb: int = 0) -> str:
     """Set basic AMS environment"""
     # Set AMS home directory
     env["AMSHOME"] = amshome
+    # Same variables as sourcing amsbashrc.sh, without running it each time
+    env = mergeenv(env, amsprofenv(env, amshome))
     # Set AMS scratch directory
-    tmpdir = bashrun("source ${AMSHOME}/amsbashrc.sh; echo -n ${SCM_TMPDIR}", env=env)
-    SCM_TMPDIR = os.path.join(tmpdir, USER, "ams")
+    SCM_TMPDIR = os.path.join(env.get("SCM_TMPDIR", ""), USER, "ams")
     env["SCM_TMPDIR"] = SCM_TMPDIR
     # env['SCM_DEBUG'] = 'YES'
     # Possibly create scratch directory
@@ -171,47 +221,180 @@ def setamsenv(env, amshome: str, vrb: int = 0) -> str:
     return env
 
 
-def amsbuildcmd(env, inp, prog="ams", nproc=1, out="ams.out", ad=">"):
-    """Build command to launch AMS"""
+def amsbuildcmd(env, inp, prog="ams", nproc=1, out="ams.out", ad=">", resultsdir="."):
+    """Build command and environment to launch AMS"""
     inp_nam, inp_ext = os.path.splitext(inp)
-    cmdlist = []
-    cmdlist.append("source ${AMSHOME}/amsbashrc.sh")
-    cmdlist.append(f'export SCM_TMPDIR={env["SCM_TMPDIR"]}')
-    cmdlist.append(f"if [[ ! -f $SCMLICESE ]]; then export SCMLICENSE={SCMLICENSE} ; fi")
-    cmdlist.append(f"export NSCM={nproc}")
-    cmdlist.append("unset AMS_SWITCH_LOGFILE_AND_STDOUT")
+    jobenv = dict(env)
+    if SCMLICENSE and not os.path.isfile(jobenv.get("SCMLICENSE", "")):
+        jobenv["SCMLICENSE"] = SCMLICENSE
+    jobenv["NSCM"] = str(nproc)
+    jobenv.pop("AMS_SWITCH_LOGFILE_AND_STDOUT", None)
+    append = ad == ">>"
     if prog is None:
         if os.access(f"{inp}", os.X_OK):
-            cmdlist.append(f'AMS_JOBNAME="ams.{inp_nam}" ./{inp} {ad} {out}')
+            jobenv["AMS_JOBNAME"] = f"ams.{inp_nam}"
+            if resultsdir != ".":
+                jobenv["AMS_RESULTSDIR"] = resultsdir
+            return AmsCmd([os.path.join(".", inp)], jobenv, None, out, append)
         else:
             raise ValueError(f"{inp} file is not executable")
     elif prog == "python":
-        cmdlist.append(f"amspython {inp}")
-    else:
-        cmdlist.append(f'AMS_JOBNAME="{prog}.{inp_nam}" AMS_RESULTSDIR=. $AMSBIN/{prog} < "{inp}" {ad} {out}')
-    return " ; ".join(cmdlist)
+        return AmsCmd([os.path.join(jobenv["AMSBIN"], "amspython"), inp], jobenv, None, None, append)
+    jobenv["AMS_JOBNAME"] = f"{prog}.{inp_nam}"
+    if resultsdir == ".":
+        jobenv["AMS_RESULTSDIR"] = resultsdir
+        return AmsCmd([os.path.join(jobenv["AMSBIN"], prog)], jobenv, inp, out, append)
+    # Run in the results directory, where legacy programs write TAPE61 and other files
+    jobenv["AMS_RESULTSDIR"] = os.path.abspath(resultsdir)
+    argv = [os.path.join(jobenv["AMSBIN"], prog)]
+    return AmsCmd(argv, jobenv, os.path.abspath(inp), os.path.abspath(out), append, os.path.abspath(resultsdir))
+
 
+def amscmdline(cmd: AmsCmd) -> str:
+    """Shell equivalent of AMS command, for printing"""
+    jobvars = [f"{var}={cmd.env[var]}" for var in ("NSCM", "AMS_JOBNAME", "AMS_RESULTSDIR") if var in cmd.env]
+    cmdline = shlex.join(jobvars + cmd.argv)
+    if cmd.cwd is not None:
+        cmdline = f"cd {shlex.quote(cmd.cwd)} && {cmdline}"
+    if cmd.inp is not None:
+        cmdline = f"{cmdline} < {shlex.quote(cmd.inp)}"
+    if cmd.out is not None:
+        cmdline = f"{cmdline} {'>>' if cmd.append else '>'} {shlex.quote(cmd.out)}"
+    return cmdline
 
-def amsclean(inp):
-    """Rename or delete calculation files"""
+
+def amscall(cmd: AmsCmd, vrb: int = 0) -> int:
+    """Run AMS command without shell and return its exit status"""
+    with contextlib.ExitStack() as stack:
+        stdin = stack.enter_context(open(cmd.inp, "rb")) if cmd.inp is not None else None
+        stdout = stack.enter_context(open(cmd.out, "ab" if cmd.append else "wb")) if cmd.out is not None else None
+        run = dict(stdin=stdin, stdout=stdout or subprocess.PIPE, stderr=subprocess.PIPE, env=cmd.env, cwd=cmd.cwd)
+        try:
+            process = subprocess.run(cmd.argv, **run)
+        except OSError as err:
+            if err.errno != errno.ENOEXEC:
+                print(f"WARNING: Cannot run {cmd.argv[0]}: {err}")
+                return 127
+            # Script without interpreter line, as bash would run it
+            process = subprocess.run([BASH] + cmd.argv, **run)
+    if vrb >= 1:
+        for output in (process.stdout, process.stderr):
+            if output:
+                print(output.decode(encoding="UTF-8", errors="ignore").rstrip())
+    return process.returncode
+
+
+def amsclean(inp, src=".", jobname=None):
+    """Rename or delete calculation files, moving them from src to the current directory"""
     inp_nam, inp_ext = os.path.splitext(inp)
-    for outfil in AMS_OUTFILS:
-        if os.path.isfile(outfil):
-            n = 1
-            if outfil == "TAPE61":
-                dest = f"{inp_nam}.t61"
-            else:
-                dest = f"{inp_nam}.{outfil}"
-            while os.path.isfile(dest) and n < 100:
-                dest = f"{inp_nam}.{n:02d}.{outfil}"
-                n = n + 1
-            os.rename(outfil, dest)
-    for outfil in AMS_TOREMOVE:
-        if os.path.isfile(outfil):
-            os.remove(outfil)
+    with CLEANLOCK:
+        if src != "." and jobname:
+            # Results folder, where a serial run would have written it
+            path = os.path.join(src, f"{jobname}.results")
+            if os.path.isdir(path):
+                n = 1
+                dest = f"{jobname}.results"
+                while os.path.exists(dest) and n < 100:
+                    dest = f"{jobname}.{n:02d}.results"
+                    n = n + 1
+                os.rename(path, dest)
+        for outfil in AMS_OUTFILS:
+            path = os.path.join(src, outfil)
+            if os.path.isfile(path):
+                n = 1
+                if outfil == "TAPE61":
+                    dest = f"{inp_nam}.t61"
+                else:
+                    dest = f"{inp_nam}.{outfil}"
+                while os.path.isfile(dest) and n < 100:
+                    dest = f"{inp_nam}.{n:02d}.{outfil}"
+                    n = n + 1
+                os.rename(path, dest)
+        for outfil in AMS_TOREMOVE:
+            path = os.path.join(src, outfil)
+            if os.path.isfile(path):
+                os.remove(path)
+    if src != ".":
+        try:
+            os.rmdir(src)
+        except OSError:
+            print(f"WARNING: Other files of {inp} left in {src}")
     return None
 
 
+def amsprog(inp):
+    """Select program to run based on file extension"""
+    inp_nam, inp_ext = os.path.splitext(inp)
+    if inp_ext == ".fcf":
+        return "fcf"
+    elif inp_ext == ".oldfcf":
+        return "oldfcf"
+    elif inp_ext == ".nmr":
+        return "nmr"
+    elif inp_ext in {".py", ".amspy"}:
+        return "python"
+    elif inp_ext == ".run":
+        return None
+    return "ams"
+
+
+def amsjob(opts, inp, env, amsout, ad=">", resultsdir="."):
+    """Run AMS calculation on single input file and return exit status and wall time"""
+    prog = amsprog(inp)
+    # Build calculation command
+    amscmd = amsbuildcmd(env, inp, prog, opts.nproc, amsout, ad, resultsdir)
+    if opts.vrb >= 1:
+        print(amscmdline(amscmd))
+    status = 0
+    walltime = 0.0
+    # Run calculation
+    if not opts.dry:
+        start = time.perf_counter()
+        status = amscall(amscmd, vrb=opts.vrb)
+        walltime = time.perf_counter() - start
+        if status != 0:
+            print(f"WARNING: Calculation on {inp} failed")
+        # Email results
+        if opts.mail or opts.to:
+            try:
+                # Queued, sent with other messages by whoever holds the unlocked key
+                argmail = ["-s", f"{(prog or 'AMS').upper()} calculation on {inp}", "-a", f"{amsout}", "--spool"]
+                if opts.vrb:
+                    argmail.append("-v")
+                if opts.to:
+                    argmail.extend(["-to"] + opts.to)
+                import mail  # My mail system, imported only when needed
+
+                mail.main(argmail)
+            except Exception:
+                print("WARNING: Failed to send mail")
+        amsclean(inp, resultsdir, amscmd.env.get("AMS_JOBNAME"))
+    return status, walltime
+
+
+def amspool(opts, env):
+    """Run input files concurrently, each with its own scratch and results directories"""
+
+    def slotjob(item):
+        """Run input file in its own directories"""
+        num, inp = item
+        inp_nam, inp_ext = os.path.splitext(inp)
+        jobenv = dict(env)
+        jobenv["SCM_TMPDIR"] = os.path.join(env["SCM_TMPDIR"], f"{os.getpid()}.{num}")
+        os.makedirs(jobenv["SCM_TMPDIR"], exist_ok=True)
+        # Next to the input, results are then renamed as for a serial run
+        resultsdir = os.path.join(os.path.dirname(inp), f".ams.{os.path.basename(inp_nam)}.{os.getpid()}.{num}")
+        os.makedirs(resultsdir, exist_ok=True)
+        try:
+            return amsjob(opts, inp, jobenv, opts.out or f"{inp_nam}.out", resultsdir=resultsdir)
+        finally:
+            shutil.rmtree(jobenv["SCM_TMPDIR"], ignore_errors=True)
+
+    with ThreadPoolExecutor(max_workers=opts.njobs) as pool:
+        results = list(pool.map(slotjob, enumerate(opts.inp, start=1)))
+    return results
+
+
 def amsrun(opts):
     """Run AMS calculation with given options"""
     # DEFINE AMS ENVIRONMENT AND SUBMISSION COMMAND
@@ -220,54 +403,30 @@ def amsrun(opts):
         SCMLICENSE = os.environ["SCMLICENSE"]
     # os.environ = cleanenv(os.environ)
     os.environ = setamsenv(os.environ, opts.amshome, opts.vrb)
-    # LOOP OVER INPUT FILES ONE BY ONE
-    ad = ">"
-    for num, inp in enumerate(opts.inp, start=1):
-        inp_nam, inp_ext = os.path.splitext(inp)
-        # Select program to run based on file extension
-        if inp_ext == ".fcf":
-            prog = "fcf"
-        elif inp_ext == ".oldfcf":
-            prog = "oldfcf"
-        elif inp_ext == ".nmr":
-            prog = "nmr"
-        elif inp_ext in {".py", ".amspy"}:
-            prog = "python"
-        elif inp_ext == ".run":
-            prog = None
-        else:
-            prog = "ams"
-        # Set output file
-        if opts.out is None:
-            amsout = inp_nam + ".out"
-        else:
-            amsout = opts.out
-            if num > 1:  # if there are multiple inputs but the output filename is set then append output
-                ad = ">>"
-        # Build calculation command
-        amscmd = amsbuildcmd(os.environ, inp, prog, opts.nproc, amsout, ad)
-        if opts.vrb >= 1:
-            print(amscmd)
-        # Run calculation
-        if not opts.dry:
-            try:
-                # amsjob = bashrun(amscmd, env=os.environ, vrb=opts.vrb)
-                bashrun(amscmd, env=os.environ, vrb=opts.vrb)
-                # Email results
-                if opts.mail or opts.to:
-                    try:
-                        argmail = ["-s", f"{prog.upper()} calculation on {inp}", "-a", f"{amsout}"]
-                        if opts.vrb:
-                            argmail.append("-v")
-                        if opts.to:
-                            argmail.extend(["-to", f"{opts.to}"])
-                        mail.main(argmail)
-                    except Exception:
-                        print("WARNING: Failed to send mail")
-            except Exception:
-                print(f"WARNING: Calculation on {inp} failed")
-            amsclean(inp)
-    return None
+    if opts.njobs > 1:
+        # RUN INPUT FILES CONCURRENTLY
+        results = amspool(opts, os.environ)
+    else:
+        # LOOP OVER INPUT FILES ONE BY ONE
+        results = []
+        ad = ">"
+        for num, inp in enumerate(opts.inp, start=1):
+            inp_nam, inp_ext = os.path.splitext(inp)
+            # Set output file
+            if opts.out is None:
+                amsout = inp_nam + ".out"
+            else:
+                amsout = opts.out
+                if num > 1:  # if there are multiple inputs but the output filename is set then append output
+                    ad = ">>"
+            results.append(amsjob(opts, inp, os.environ, amsout, ad))
+    # SUMMARY OF CALCULATIONS
+    if len(opts.inp) > 1 and not opts.dry:
+        width = max(len(inp) for inp in opts.inp)
+        print(f"{'Input':<{width}}  Status  Wall/s")
+        for inp, (status, walltime) in zip(opts.inp, results):
+            print(f"{inp:<{width}}  {status:>6}  {walltime:.1f}")
+    return results
 
 
 # ==============
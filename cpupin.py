@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+#
+# Hand out disjoint sets of physical cores to concurrent jobs on one node
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import glob  # Unix pathname expansion: glob.glob('*.txt')
+import argparse  # commandline argument parsers
+import collections
+from feutils import errore, ncpuavail, nfreecpu, wide_help  # My generic functions
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+
+# ==========
+#  DEFAULTS
+# ==========
+SYSCPU = "/sys/devices/system/cpu"
+SYSNODE = "/sys/devices/system/node"
+# Physical core with its NUMA node, socket and logical processors (hyperthreads)
+Core = collections.namedtuple("Core", "node package core cpus")
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+def parselist(cpulist: str) -> list:
+    """Expand kernel or Gaussian CPU list such as 0-3,8 into processor numbers"""
+    cpus = []
+    for chunk in cpulist.strip().split(","):
+        if not chunk:
+            continue
+        if "-" in chunk:
+            beg, end = map(int, chunk.split("-"))
+            cpus.extend(range(beg, end + 1))
+        else:
+            cpus.append(int(chunk))
+    return cpus
+
+
+def cpustring(cpus) -> str:
+    """Compress list of processor numbers into Gaussian %CPU ranges"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{beg}" if beg == end else f"{beg}-{end}" for beg, end in ranges)
+
+
+def readsys(path: str, default=None):
+    """Read a sysfs attribute"""
+    try:
+        with open(path, "r") as fil:
+            return fil.read().strip()
+    except OSError:
+        return default
+
+
+# =================
+#  PARSING OPTIONS
+# =================
+def parseopt(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(
+        prog=PROGNAME,
+        formatter_class=wide_help(argparse.HelpFormatter, w=140, h=40),
+        description="Print disjoint NUMA-local %CPU lists for concurrent jobs",
+    )
+    parser.add_argument("-n", "--njobs", metavar="NJOBS", dest="njobs", type=int, default=1, help="Number of jobs")
+    parser.add_argument("-p", "--nproc", metavar="NPROC", dest="nproc", type=int, default=1, help="Cores per job")
+    parser.add_argument(
+        "-i", "--index", metavar="INDEX", dest="index", type=int, default=None, help="Only print list of job INDEX"
+    )
+    opts = parser.parse_args(args)
+    if opts.njobs < 1 or opts.nproc < 1:
+        errore("Number of jobs and cores must be positive")
+    if opts.index is not None and not 0 <= opts.index < opts.njobs:
+        errore(f"Job index must be between 0 and {opts.njobs - 1}")
+    return opts
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+def systopology():
+    """Read physical cores available to this process from sysfs"""
+    allowed = sorted(os.sched_getaffinity(0))
+    # NUMA node of each processor
+    cpunode = {}
+    for nodedir in glob.glob(os.path.join(SYSNODE, "node[0-9]*")):
+        node = int(os.path.basename(nodedir)[4:])
+        for cpu in parselist(readsys(os.path.join(nodedir, "cpulist"), "")):
+            cpunode[cpu] = node
+    # Group logical processors by physical core
+    cores = collections.OrderedDict()
+    for cpu in allowed:
+        topology = os.path.join(SYSCPU, f"cpu{cpu}", "topology")
+        package = int(readsys(os.path.join(topology, "physical_package_id"), 0))
+        core = int(readsys(os.path.join(topology, "core_id"), cpu))
+        key = (package, core)
+        if key not in cores:
+            cores[key] = Core(cpunode.get(cpu, package), package, core, [])
+        cores[key].cpus.append(cpu)
+    return list(cores.values())
+
+
+def ncores() -> int:
+    """Physical cores this process can run on, within the cgroup quota"""
+    return min(len(systopology()), ncpuavail())
+
+
+def allocate(topology, njobs: int, nproc: int):
+    """Assign nproc physical cores to each of njobs jobs,
+    keeping every job within one NUMA node whenever it fits"""
+    free = collections.OrderedDict()
+    for core in topology:
+        # Only one logical processor per physical core
+        free.setdefault(core.node, []).append(min(core.cpus))
+    if sum(len(cpus) for cpus in free.values()) < njobs * nproc:
+        raise ValueError(f"{njobs} jobs of {nproc} cores do not fit in {len(topology)} physical cores")
+    slots = []
+    for _ in range(njobs):
+        # Best fit: the node with the fewest free cores that can still host the whole job
+        fits = [node for node, cpus in free.items() if len(cpus) >= nproc]
+        if fits:
+            node = min(fits, key=lambda n: len(free[n]))
+            slot, free[node] = free[node][:nproc], free[node][nproc:]
+        else:
+            # Span nodes starting from the emptiest ones
+            slot = []
+            for node in sorted(free, key=lambda n: -len(free[n])):
+                take = nproc - len(slot)
+                slot, free[node] = slot + free[node][:take], free[node][take:]
+                if len(slot) == nproc:
+                    break
+        slots.append(slot)
+    return slots
+
+
+def cpuslots(njobs: int, nproc: int):
+    """Return Gaussian %CPU lists for njobs concurrent jobs of nproc cores"""
+    topology = systopology()
+    ncore = min(len(topology), ncpuavail())
+    if njobs * nproc > ncore:
+        raise ValueError(f"{njobs} jobs of {nproc} cores exceed the {ncore} available physical cores")
+    nfree = nfreecpu()
+    if njobs * nproc > nfree:
+        print(f"WARNING: {njobs * nproc} cores requested but only {nfree} look free", file=sys.stderr)
+    slots = allocate(topology, njobs, nproc)
+    return [cpustring(slot) for slot in slots]
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main(args=None):
+    opts = parseopt(args)
+    try:
+        slots = cpuslots(opts.njobs, opts.nproc)
+    except ValueError as err:
+        errore(err)
+    if opts.index is not None:
+        slots = [slots[opts.index]]
+    for slot in slots:
+        print(slot)
+    sys.exit()
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()
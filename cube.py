@@ -71,9 +71,9 @@ def cubeparse():
     #   CHECK PROCESSORS
     opts.nproc = str.lower(str(opts.nproc))
     if opts.nproc in ["all", "max"]:
-        opts.nproc = CPUTOT
+        opts.nproc = cputot()
     elif opts.nproc in ["half", "hlf"]:
-        opts.nproc = max(CPUTOT // 2, 1)
+        opts.nproc = max(cputot() // 2, 1)
     return opts
 
 
@@ -14,6 +14,7 @@ import argparse  # commandline argument parsers
 import subprocess  # Spawn process: subprocess.run('ls', stdout=subprocess.PIPE)
 import typing  # Explicit typing of arguments
 import tempfile  # To create teporary files
+import sysprobe  # Processor usage from /proc and cgroups
 
 # ==============
 #  PROGRAM DATA
@@ -23,7 +24,6 @@ VERSION = "2020.08.26"
 PROGNAME = os.path.basename(sys.argv[0])
 USER = os.getenv("USER")
 HOME = os.getenv("HOME")
-PWD = os.getcwd()
 
 # ==========
 #  DEFAULTS
@@ -217,33 +217,18 @@ def loginshvar(var: str) -> str:
 
 
 def ncpuavail() -> int:
-    """Find number of processors in the machine"""
-    try:
-        result = subprocess.run("nproc", stdout=subprocess.PIPE)
-        nprocs = result.stdout.decode("utf-8").split()[0]
-    except:
-        nprocs = 1
-    return int(nprocs)
+    """Find number of processors this process can run on, within affinity mask and cgroup quota"""
+    return sysprobe.ncpulimit()
 
 
 def nfreecpu() -> int:
     """Find number of free processors in the machine"""
-    ntot = ncpuavail()
-    vmstat = bashrun("vmstat -w -S M", env=os.environ)
-    # r: The number of runnable processes (running or waiting for run time).
-    # b: The number of processes in uninterruptible sleep.
-    info = vmstat.split("\n")[2].split()[0:2]
-    r, b = map(int, info)
-    nfree = ntot - r - b
+    nfree = sysprobe.nfreecpu()
     if nfree <= 0:
         errore("No free processors available")
     return nfree
 
 
-CPUFREE = nfreecpu()
-CPUTOT = ncpuavail()
-
-
 # =================
 #  PARSING OPTIONS
 # =================
@@ -308,7 +293,7 @@ def parseopt(args=None):
         metavar="GAUSS_SCRDIR",
         dest="gauscr",
         action="store",
-        default=gauscr(),
+        default=None,
         help="Set scratch directory",
     )
     parser.add_argument(
@@ -331,6 +316,8 @@ def parseopt(args=None):
     if opts.fq:
         opts.wrkdir = GAUFQ["working"]
         opts.gauroot = GAUFQ["gauroot"]
+    if opts.gauscr is None:
+        opts.gauscr = gauscr()
     if not os.path.isdir(opts.gauscr):
         errore(f"Invalid Gaussian scratch directory {opts.gauscr}")
     if opts.gauroot in GAUPATH.keys():
@@ -338,13 +325,13 @@ def parseopt(args=None):
     if not os.path.isdir(opts.gauroot):
         errore(f"Invalid Gaussian directory {opts.gauroot}")
     if opts.nproc in ["all", "max"]:
-        opts.nproc = CPUTOT
+        opts.nproc = ncpuavail()
     elif opts.nproc in ["half", "hlf"]:
-        opts.nproc = max(CPUTOT // 2, 1)
+        opts.nproc = max(ncpuavail() // 2, 1)
     elif opts.nproc in ["free", "rest"]:
-        opts.nproc = max(CPUFREE, 1)
+        opts.nproc = max(nfreecpu(), 1)
     elif opts.nproc in ["halfree", "hlfree"]:
-        opts.nproc = max(CPUFREE // 2, 1)
+        opts.nproc = max(nfreecpu() // 2, 1)
     if opts.mem:
         if isinstance(opts.mem, int):
             if opts.mem <= 128:
@@ -381,7 +368,7 @@ def cleanenv(env):
     env["USER"] = USER
     env["HOME"] = HOME
     env["PATH"] = loginshvar("PATH")
-    env["PWD"] = PWD
+    env["PWD"] = os.getcwd()
     return env
 
 
@@ -421,6 +408,7 @@ def modgaujob(joblist, gauinp_nam, opts):
             opts.chk = True
         except:
             pass
+    cpufree = nfreecpu()
     for gjf in joblist:
         if opts.chk:
             gjf.addchk(f"{gauinp_nam}.chk")
@@ -434,8 +422,8 @@ def modgaujob(joblist, gauinp_nam, opts):
             gjf.route.append(f"{add}\n")
         if not gjf.mem():
             gjf.setmem(MEM)
-        if gjf.nproc() > CPUFREE:
-            errore(f"{gjf.nproc()} processors requested, but only {CPUFREE} available")
+        if gjf.nproc() > cpufree:
+            errore(f"{gjf.nproc()} processors requested, but only {cpufree} available")
     return joblist
 
 
@@ -14,12 +14,12 @@ import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.writ
 # import typing  # Explicit typing of arguments
 import subprocess  # Spawn process: subprocess.run('ls', stdout=subprocess.PIPE)
 import collections
+import functools  # To compute machine information only once
 import socket
-
-try:
-    import numpy
-except Exception:
-    pass
+import hashlib  # To key cache files
+import json  # Cache file format
+import tempfile  # To write cache files atomically
+import sysprobe  # Processor and memory usage from /proc and cgroups
 
 # ==============
 #  PROGRAM DATA
@@ -27,13 +27,25 @@ except Exception:
 AUTHOR = "Franco Egidi (franco.egidi@gmail.it)"
 USER = os.getenv("USER")
 HOME = os.getenv("HOME")
-HOSTNAME = socket.gethostname()
-PWD = os.getcwd()
 
 # ==========
 #  DEFAULTS
 # ==========
 BASH = "/bin/bash"
+CACHEDIR = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(HOME, ".cache"), "feutils")
+# Files read by a bash login shell, whose changes invalidate cached environments
+LOGINFILES = (
+    "/etc/profile",
+    "/etc/bashrc",
+    "/etc/bash.bashrc",
+    os.path.join(HOME, ".bash_profile"),
+    os.path.join(HOME, ".bash_login"),
+    os.path.join(HOME, ".profile"),
+    os.path.join(HOME, ".bashrc"),
+)
+# Variables specific to the shell that produced the snapshot
+ENVSKIP = frozenset(("PWD", "OLDPWD", "SHLVL", "_"))
+ENVMARK = "__FEUTILS_ENV__"
 Element = collections.namedtuple("Element", "name atomic_number atomic_mass group")
 ELEMENTS = {
     "H": Element("Hydrogen", 1, 1, "Non Metals"),
@@ -122,6 +134,8 @@ class atom:
         self.symbol = symbol
         if coord is not None:
             try:
+                import numpy  # Slow to import, only needed for coordinates
+
                 self.coord = numpy.array([float(x) for x in coord])
             except Exception:
                 self.coord = [float(x) for x in coord]
@@ -265,6 +279,16 @@ def bashrun(comando: str, env=None, vrb=0) -> str:
     return output
 
 
+def bashcall(comando: str, env=None, vrb=0) -> int:
+    """Run bash subprocess and return its exit status"""
+    process = subprocess.run(
+        comando, shell=True, executable=BASH, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env
+    )
+    if vrb >= 1:
+        print(process.stdout.decode(encoding="UTF-8", errors="ignore").rstrip())
+    return process.returncode
+
+
 def check_extension(to_check: str, allowed_ext):
     """Check file extension"""
     filnam, filext = os.path.splitext(to_check)
@@ -272,36 +296,109 @@ def check_extension(to_check: str, allowed_ext):
         raise ValueError("Invalid file extension")
 
 
+def cachedir(*subdirs) -> str:
+    """Return, possibly creating, a cache directory"""
+    path = os.path.join(CACHEDIR, *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def mtime(path: str):
+    """File modification time or None if missing"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def envsnapshot(scripts=(), preset=None) -> dict:
+    """Environment of a clean login shell after sourcing scripts.
+    It is cached on disk until a script or login file changes"""
+    if preset is None:
+        preset = {}
+    scripts = tuple(scripts)
+    key = (scripts, tuple(sorted(preset.items())), tuple((fil, mtime(fil)) for fil in scripts + LOGINFILES))
+    keyhash = hashlib.sha1(repr(key).encode()).hexdigest()
+    if keyhash in _ENVCACHE:
+        return dict(_ENVCACHE[keyhash])
+    cachefile = os.path.join(CACHEDIR, "env", f"{keyhash}.json")
+    try:
+        with open(cachefile, "r") as fil:
+            env = json.load(fil)
+    except (OSError, ValueError):
+        # Capture the whole environment once
+        comando = "".join(f'source "{script}" ; ' for script in scripts)
+        comando = comando + f"printf '\\0{ENVMARK}\\0' ; env -0"
+        basic = [f"HOME={HOME}", f"USER={USER}"] + [f"{var}={val}" for var, val in preset.items()]
+        process = subprocess.run(
+            ["env", "-i"] + basic + [BASH, "-l", "-c", comando], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        output = process.stdout.decode(encoding="UTF-8", errors="ignore")
+        # A failed login or script leaves no environment worth caching
+        if process.returncode != 0 or f"\0{ENVMARK}\0" not in output:
+            errore(f"Cannot capture environment after sourcing {', '.join(scripts) or 'login files'}")
+        output = output.split(f"\0{ENVMARK}\0", 1)[-1]
+        env = {}
+        for item in output.split("\0"):
+            var, sep, val = item.partition("=")
+            if sep and var not in ENVSKIP:
+                env[var] = val
+        try:
+            tmpfil = tempfile.NamedTemporaryFile(mode="w", dir=cachedir("env"), suffix=".tmp", delete=False)
+            with tmpfil as fil:
+                json.dump(env, fil)
+            os.replace(tmpfil.name, cachefile)
+        except OSError:
+            pass
+    _ENVCACHE[keyhash] = env
+    return dict(env)
+
+
+def loginenv() -> dict:
+    """Get environment of the login shell"""
+    return envsnapshot()
+
+
 def loginshvar(var: str) -> str:
     """Get environment variable from the login shell"""
-    comando = " ".join(["env -i", BASH, ' -l -c "printenv', var, '"'])
-    out = bashrun(comando)
-    return out
+    return loginenv().get(var, "")
+
+
+def mergeenv(env, changes: dict):
+    """Set variables changed by a sourced script, additions to lists such as PATH go on top of the current value"""
+    login = loginenv()
+    for var, val in changes.items():
+        if login.get(var) and login[var] in val and env.get(var):
+            val = val.replace(login[var], env[var], 1)
+        env[var] = val
+    return env
+
+
+@functools.lru_cache(maxsize=None)
+def hostname() -> str:
+    """Find host name"""
+    return socket.gethostname()
 
 
 def ncpuavail() -> int:
-    """Find number of processors in the machine"""
-    try:
-        result = subprocess.run("nproc", stdout=subprocess.PIPE)
-        nprocs = result.stdout.decode("utf-8").split()[0]
-    except Exception:
-        nprocs = 1
-    return int(nprocs)
+    """Find number of processors this process can run on, within affinity mask and cgroup quota"""
+    return sysprobe.ncpulimit()
+
+
+@functools.lru_cache(maxsize=None)
+def cputot() -> int:
+    """Number of processors available, computed once"""
+    return ncpuavail()
 
 
 def nfreecpu() -> int:
-    """Find number of free processors in the machine"""
-    ntot = ncpuavail()
-    try:
-        vmstat = bashrun("vmstat -w -S M", env=os.environ)
-        # r: The number of runnable processes (running or waiting for run time).
-        # b: The number of processes in uninterruptible sleep.
-        info = vmstat.split("\n")[2].split()[0:2]
-        r, b = map(int, info)
-        nfree = max(ntot - r - b, 0)
-    except Exception:
-        nfree = ntot
-    return nfree
+    """Find number of free processors among those available"""
+    return sysprobe.nfreecpu()
+
+
+def freemem() -> int:
+    """Find free memory in bytes, within the cgroup memory limit"""
+    return sysprobe.freemem()
 
 
 def cleanenv(env):
@@ -310,9 +407,20 @@ def cleanenv(env):
     # Set basic envvars from current or login shell
     env["USER"] = USER
     env["HOME"] = HOME
-    env["PATH"] = loginshvar("PATH")
-    env["PWD"] = PWD
+    env["PATH"] = loginshvar("PATH") or os.defpath
+    env["PWD"] = os.getcwd()
     return env
 
 
-CPUTOT = ncpuavail()
+def __getattr__(name: str):
+    """Compute machine-dependent constants only when first requested"""
+    if name == "HOSTNAME":
+        return hostname()
+    elif name == "PWD":
+        return os.getcwd()
+    elif name == "CPUTOT":
+        return cputot()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_ENVCACHE = {}
@@ -15,7 +15,15 @@ import subprocess  # Spawn process: subprocess.run('ls', stdout=subprocess.PIPE)
 import typing  # Explicit typing of arguments
 import tempfile  # To create teporary files
 import socket  # Just to get hostname
-from feutils import bashrun, cd, check_extension, errore, int_or_str, wide_help  # My generic functions
+import time  # To time calculations
+import functools  # To probe free memory once per job size
+import queue  # Pool of free processor slots
+from concurrent.futures import ThreadPoolExecutor  # To run calculations concurrently
+from feutils import bashcall, cd, check_extension, cleanenv, cputot, envsnapshot, errore, freemem, int_or_str
+from feutils import loginenv, mergeenv, nfreecpu
+from feutils import wide_help
+import cpupin  # Processor allocation for concurrent jobs
+import telemetry  # Store of finished jobs
 
 # ==============
 #  PROGRAM DATA
@@ -64,8 +72,24 @@ REGAUINP = {
     "atom": r"(?P<El>[A-Z][a-z]?)[0-9]{0,4}(-(?P<Type>\w+)(-(?P<Chrg>[+-]?[0-9.]+))?)?(-\((?P<Flags>(\w+=\w+,?)+)\))?",
     "frag": r"fragment=(?P<frag>\d+)",
     "pembed": r"pembed(=|=\(|\()",
+    # Route keywords with options as keyword=option, keyword=(options) or keyword(options)
+    "token": r"(?P<key>[^\s=(]+)(?:\s*=\s*(?=\()|=)?(?:\((?P<opts>[^)]*)\)|(?<==)(?P<opt>[^\s]+))?",
+    "optsep": r"[\s,]+",
+}
+REGAUCMP = {
+    "link0": re.compile(REGAUINP["link0"]),
+    "link1": re.compile(REGAUINP["link1"], flags=re.IGNORECASE),
+    "route": re.compile(REGAUINP["route"]),
+    "allchk": re.compile(REGAUINP["allchk"], flags=re.IGNORECASE),
+    "atom": re.compile(REGAUINP["atom"], flags=re.ASCII),
+    "frag": re.compile(REGAUINP["frag"], flags=re.ASCII | re.IGNORECASE),
+    "pembed": re.compile(REGAUINP["pembed"], flags=re.IGNORECASE),
+    "token": re.compile(REGAUINP["token"]),
+    "optsep": re.compile(REGAUINP["optsep"]),
 }
 MEM = "1GB"
+# Fraction of free memory that free memory requests may take
+MEMFRAC = 0.9
 TESTGAU = "test"
 
 
@@ -74,7 +98,15 @@ TESTGAU = "test"
 # =========
 # Gaussian input file class
 class gauinput:
+    # Link0 directive and value up to the first comment
+    RELINK0 = re.compile(r"\s*%(?P<key>\w+)(\s*=(?P<val>[^!\n]*))?", flags=re.ASCII)
+    # Directives stored under a common key
+    L0ALIAS = {"nproc": "nprocshared"}
+
     def __init__(self, link0=None, route=None, title=None, mol=None, tail=None):
+        self._l0ref = None
+        self._l0len = 0
+        self._l0map = {}
         self.link0 = link0
         self.route = route
         self.title = title
@@ -126,63 +158,92 @@ class gauinput:
         self.tail = []
         return None
 
-    def _srcsec(attr, pattern):
-        """Search attribute for pattern and return
-        the rest of the line after the match
-        until the first comment"""
-        for line in attr:
-            match = re.search(pattern, line.lower().strip())
-            if match:
-                beg = match.end()
-                comment = re.search(r"!", line.lower().strip())
-                if comment is None:
-                    return line[beg:].rstrip()
-                else:
-                    fin = comment.start()
-                    if fin > beg:
-                        return line[beg:fin].rstrip()
+    def _link0(self):
+        """Return Link0 dictionary of (line index, value) lists,
+        rebuilding it only if the Link0 list was replaced or resized"""
+        if self._l0ref is not self.link0 or self._l0len != len(self.link0):
+            self._l0map = {}
+            for nline, line in enumerate(self.link0):
+                match = gauinput.RELINK0.match(line)
+                if match:
+                    key = match.group("key").lower()
+                    key = gauinput.L0ALIAS.get(key, key)
+                    val = match.group("val")
+                    if val is not None:
+                        val = val.strip()
+                    self._l0map.setdefault(key, []).append((nline, val))
+            self._l0ref = self.link0
+            self._l0len = len(self.link0)
+        return self._l0map
+
+    def _getl0(self, key: str):
+        """Return value of Link0 directive"""
+        entries = self._link0().get(key)
+        if entries:
+            return entries[0][1]
+        return None
+
+    def _setl0(self, key: str, line: str, val: str):
+        """Set Link0 directive replacing the existing one"""
+        l0map = self._link0()
+        entries = l0map.get(key)
+        if not entries:
+            self.link0.append(line)
+            self._l0len = len(self.link0)
+            l0map[key] = [(self._l0len - 1, val)]
+        else:
+            nline = entries[0][0]
+            self.link0[nline] = line
+            l0map[key] = [(nline, val)]
+            if len(entries) > 1:
+                # Drop duplicates and reindex
+                todrop = {n for n, v in entries[1:]}
+                self.link0[:] = [x for n, x in enumerate(self.link0) if n not in todrop]
+                self._l0ref = None
         return None
 
     def chk(self):
         """Return checkpoint file name"""
-        checkpoint = gauinput._srcsec(self.link0, r"^%chk=")
+        checkpoint = self._getl0("chk")
         return checkpoint
 
     def mem(self):
         """Return memory"""
-        memory = gauinput._srcsec(self.link0, r"^%mem=")
+        memory = self._getl0("mem")
         return memory
 
     def nproc(self):
         """Return processors"""
-        n = gauinput._srcsec(self.link0, r"^%nproc(shared)?=")
+        n = self._getl0("nprocshared")
         if n is None:
             return 1
         else:
             return int(n)
 
+    def cpu(self):
+        """Return CPU list"""
+        cpulist = self._getl0("cpu")
+        return cpulist
+
     def setmem(self, mem: str):
         """Set memory"""
-        self.link0[:] = [x for x in self.link0 if not re.match(r"%mem=", x.lower().lstrip())]
-        self.link0.append(f"%Mem={mem}\n")
+        self._setl0("mem", f"%Mem={mem}\n", str(mem))
         return None
 
     def setnproc(self, nproc: int):
         """Set processors"""
-        self.link0[:] = [x for x in self.link0 if not re.match(r"%nproc(shared)?=", x.lower().lstrip())]
-        self.link0.append(f"%NProcShared={nproc}\n")
+        self._setl0("nprocshared", f"%NProcShared={nproc}\n", str(nproc))
         return None
 
     def setcpu(self, cpulist: str):
         """Set CPU"""
-        self.link0[:] = [x for x in self.link0 if not re.match(r"%cpu=", x.lower().lstrip())]
-        self.link0.append(f"%CPU={cpulist}\n")
+        self._setl0("cpu", f"%CPU={cpulist}\n", str(cpulist))
         return None
 
     def addchk(self, chknam: str):
         """Add chk file if not already present"""
         if not self.chk():
-            self.link0.append(f"%Chk={chknam}\n")
+            self._setl0("chk", f"%Chk={chknam}\n", chknam)
             return True
         else:
             return False
@@ -190,7 +251,7 @@ class gauinput:
     def pembed(self):
         """Check if Route has PEmbed"""
         fullroute = " ".join(self.route)
-        if re.search(REGAUINP["pembed"], fullroute, flags=re.IGNORECASE):
+        if REGAUCMP["pembed"].search(fullroute):
             return True
         else:
             return False
@@ -213,12 +274,12 @@ class gauinput:
                 atnumber = int(words[0])
                 element = Z2SYMB[atnumber]
             except Exception:
-                elabel = re.match(REGAUINP["atom"], words[0], flags=re.ASCII)
+                elabel = REGAUCMP["atom"].match(words[0])
                 element = elabel.group("El")
                 if elabel.group("Type"):
                     atomprops["type"] = elabel.group("Type")
                 try:
-                    fragsrc = re.search(REGAUINP["frag"], elabel.group("Flags"), flags=re.ASCII | re.IGNORECASE)
+                    fragsrc = REGAUCMP["frag"].search(elabel.group("Flags"))
                     if fragsrc.group("frag"):
                         atomprops["frag"] = fragsrc.group("frag")
                 except Exception:
@@ -247,6 +308,30 @@ class gauinput:
 # =================
 #  BASIC FUNCTIONS
 # =================
+def memstring(nbytes: float) -> str:
+    """Format bytes as Gaussian memory string, never below default MEM"""
+    megabytes = int(nbytes) // 1024**2
+    if megabytes < int(MEM[:-2]) * 1024:
+        return MEM
+    if megabytes >= 10 * 1024:
+        return f"{megabytes // 1024}GB"
+    return f"{megabytes}MB"
+
+
+@functools.lru_cache(maxsize=None)
+def routekeys(route: str) -> dict:
+    """Keywords of route section with their set of options, lower case"""
+    keys = {}
+    for match in REGAUCMP["token"].finditer(route.lower()):
+        opts = match.group("opts") or match.group("opt") or ""
+        keys.setdefault(match.group("key"), set()).update(x for x in REGAUCMP["optsep"].split(opts) if x)
+    return keys
+
+
+def memshare(nproc) -> str:
+    """Default memory for a job: share of free memory proportional to its processors"""
+    nproc = int(nproc or 1)
+    return memstring(freemem() * MEMFRAC * min(nproc, cputot()) / cputot())
 
 
 # =================
@@ -293,7 +378,7 @@ def gauparser(parser):
         action="store",
         default=None,
         type=int_or_str,
-        help="Set memory in Words or Bytes",
+        help="Set memory in Words or Bytes, or free/halfree for (half) the free memory",
     )
     parser.add_argument(
         "-p", "--nproc", metavar="GAUSS_PDEF", dest="nproc", default=None, help="Set number of processors"
@@ -305,7 +390,7 @@ def gauparser(parser):
         metavar="GAUSS_SCRDIR",
         dest="gauscr",
         action="store",
-        default=gauscr(),
+        default=None,
         help="Set scratch directory",
     )
     parser.add_argument(
@@ -315,6 +400,14 @@ def gauparser(parser):
         "-fchk", dest="fchk", action="store_true", default=False, help="Generate a formatted checkpoint file"
     )
     parser.add_argument("-fq", dest="fq", action="store_true", default=False, help="Perform a FQ(Fmu) calculation")
+    parser.add_argument(
+        "--jobs",
+        metavar="NJOBS",
+        dest="njobs",
+        type=int,
+        default=1,
+        help="Run up to NJOBS inputs concurrently splitting processors among them",
+    )
     # parser.add_argument('-mail', '--verbose',
     #     dest='mail', action='store_true', default=False,
     #     help='Send the user an email at the end of the script')
@@ -340,21 +433,27 @@ def parseopt(args=None):
     if opts.fq:
         opts.wrkdir = GAUFQ["working"]
         opts.gauroot = GAUFQ["gauroot"]
-    if not os.path.isdir(opts.gauscr):
+    if opts.gauscr is None:
+        opts.gauscr = gauscr()
+    if opts.gauscr is None or not os.path.isdir(opts.gauscr):
         errore(f"Invalid Gaussian scratch directory {opts.gauscr}")
     if opts.gauroot in GAUDIR.keys():
         opts.gauroot = exepath(GAUDIR[opts.gauroot])
     if not os.path.isdir(opts.gauroot):
         errore(f"Invalid Gaussian directory {opts.gauroot}")
     if opts.nproc in ["all", "max"]:
-        opts.nproc = CPUTOT
+        opts.nproc = cputot()
     elif opts.nproc in ["half", "hlf"]:
-        opts.nproc = max(CPUTOT // 2, 1)
+        opts.nproc = max(cputot() // 2, 1)
     elif opts.nproc in ["free", "rest"]:
-        opts.nproc = max(CPUFREE, 1)
+        opts.nproc = max(nfreecpu(), 1)
     elif opts.nproc in ["halfree", "hlfree"]:
-        opts.nproc = max(CPUFREE // 2, 1)
-    if opts.mem:
+        opts.nproc = max(nfreecpu() // 2, 1)
+    if opts.mem in ["free", "rest"]:
+        opts.mem = memstring(freemem() * MEMFRAC)
+    elif opts.mem in ["halfree", "hlfree"]:
+        opts.mem = memstring(freemem() * MEMFRAC / 2)
+    elif opts.mem:
         if isinstance(opts.mem, int):
             if opts.mem <= 128:
                 opts.mem = f"{opts.mem}GB"
@@ -363,6 +462,23 @@ def parseopt(args=None):
     if opts.wrkdir is not None:
         if not os.path.isdir(opts.wrkdir):
             errore(f"Invalid Gaussian working directory {opts.wrkdir}")
+    if opts.njobs < 1:
+        errore("Number of concurrent jobs must be positive")
+    elif opts.njobs > 1:
+        if opts.procs:
+            errore("CPU list cannot be set when running concurrent jobs")
+        if opts.out is not None and len(opts.gjf) > 1:
+            errore("Output file cannot be set when running concurrent jobs")
+        opts.njobs = min(opts.njobs, len(opts.gjf))
+        # Concurrent jobs are pinned to one logical processor per physical core
+        ncore = cpupin.ncores()
+        nslot = ncore // opts.njobs
+        if nslot < 1:
+            errore(f"Too many concurrent jobs for {ncore} physical cores")
+        if opts.nproc is None:
+            opts.nproc = nslot
+        elif int(opts.nproc) > nslot:
+            errore(f"{opts.nproc} processors per job requested, but only {nslot} available for each of {opts.njobs} jobs")
     return opts
 
 
@@ -384,12 +500,12 @@ def gauscr() -> str:
     return None
 
 
-def add_source_gauprofile(basecmd: str, gauroot: str) -> str:
-    """Add sourcing of gaussian profile to command"""
-    gaucmd = basecmd
-    profile = gauroot + "/g16/bsd/g16.profile"
-    gaucmd = " ".join(["source", profile, ";", gaucmd])
-    return gaucmd
+def gauprofenv(gauroot: str) -> dict:
+    """Variables set or changed by the Gaussian profile in the login environment, cached on disk until it changes"""
+    profile = os.path.join(gauroot, "g16", "bsd", "g16.profile")
+    login = loginenv()
+    sourced = envsnapshot(scripts=[profile], preset={"g16root": gauroot})
+    return {var: val for var, val in sourced.items() if login.get(var) != val}
 
 
 def setgauenv(env, gauroot: str, gauscr: str, vrb: int = 0) -> str:
@@ -409,188 +525,240 @@ def setgauenv(env, gauroot: str, gauscr: str, vrb: int = 0) -> str:
     return env
 
 
-def modgaujob(joblist, gauinp_nam, opts):
+def modgaujob(joblist, gauinp_nam, opts, chk=False, cpulist=None):
     """Modify Gaussian jobs according to options in opts"""
-    # If we want a fchk we need at least one chk
-    if opts.fchk:
-        try:
-            for gjf in joblist:
-                if gjf.chk():
-                    raise Exception
-            opts.chk = True
-        except:
-            pass
     for gjf in joblist:
-        if opts.chk:
+        if opts.chk or chk:
             gjf.addchk(f"{gauinp_nam}.chk")
         if opts.nproc:
             gjf.setnproc(opts.nproc)
-        if opts.procs:
+        if cpulist:
+            gjf.setcpu(cpulist)
+        elif opts.procs:
             gjf.setcpu(opts.procs)
         if opts.mem:
             gjf.setmem(opts.mem)
         for add in opts.add:
             gjf.route.append(f"{add}\n")
         if not gjf.mem():
-            gjf.setmem(MEM)
-        if gjf.nproc() > CPUTOT:
-            errore(f"{gjf.nproc()} processors requested, but only {CPUFREE} available")
-    return joblist
+            gjf.setmem(memshare(gjf.nproc()))
+        if gjf.nproc() > cputot():
+            errore(f"{gjf.nproc()} processors requested, but only {cputot()} available")
+        yield gjf
 
 
 def wrtgauinp(joblist, scrdir: typing.Optional[str], gauinp: str, vrb=0) -> str:
-    """Write list of Gaussian input file objects into file"""
+    """Write Gaussian input file objects into file as they come"""
     gauinp_nam, gauinp_ext = os.path.splitext(gauinp)
     tmpinp = tempfile.NamedTemporaryFile(mode="w+t", suffix=gauinp_ext, prefix=gauinp_nam, dir=scrdir, delete=False)
     with tmpinp as fileout:
-        fileout.write(str(joblist[0]))
-        for gjf in joblist[1:]:
-            fileout.write("--Link1--\n")
+        for njob, gjf in enumerate(joblist):
+            if njob > 0:
+                fileout.write("--Link1--\n")
             fileout.write(str(gjf))
     if vrb >= 1:
         print(f"Written file {tmpinp.name}")
     return tmpinp.name
 
 
-def parsegau(lines, joblist):
-    """Parse single Gaussian job"""
-    newjob = gauinput()
-    Route = False
-    for nline, line in enumerate(lines):
-        if not line.strip():
-            # Skip unnecessary empty lines at the beginning
-            continue
-        elif re.match(REGAUINP["link0"], line.lstrip()):
-            # Link0 line found
-            newjob.link0.append(line.lstrip())
-        elif re.match(REGAUINP["route"], line.lstrip()):
-            # Route section found
-            nroute = nline
-            Route = True
-            break
-    # Read Route section
-    if not Route:
-        errore("Route section not found")
-    nstart = nroute + readsection(lines[nroute:], newjob.route)
-    # Possibly read Title and Molecule
-    fullroute = " ".join(newjob.route)
-    if not re.search(REGAUINP["allchk"], fullroute, flags=re.IGNORECASE):
-        nstart = nstart + readsection(lines[nstart:], newjob.title)
-        nstart = nstart + readsection(lines[nstart:], newjob.mol)
-    # Read Tail
-    lempty = 0
-    for nline, line in enumerate(lines[nstart:]):
-        if re.match(REGAUINP["link1"], line.lower()):
-            # Read next job
-            joblist = parsegau(lines[nstart + nline + 1 :], joblist)
-            break
-        newjob.tail.append(line)
-        if not line.strip():
-            # Gaussian reads nothing after two consecutive empty lines
-            lempty = lempty + 1
-            if lempty == 2:
+def gaujobs(gauinp: str):
+    """Stream Gaussian jobs from input file or from the default test input"""
+    gauinp_nam, gauinp_ext = os.path.splitext(gauinp)
+    if os.path.isfile(gauinp):
+        return iter_jobs(gauinp)
+    elif gauinp_nam == TESTGAU:
+        newjob = gauinput()
+        newjob.default()
+        return iter([newjob])
+    else:
+        errore(f"File {gauinp} not found")
+
+
+def itergau(filein):
+    """Iterate over the Gaussian jobs of an input one job at a time"""
+    lines = iter(filein)
+    while True:
+        newjob = gauinput()
+        for line in lines:
+            if not line.strip():
+                # Skip unnecessary empty lines at the beginning
+                continue
+            elif REGAUCMP["link0"].match(line.lstrip()):
+                # Link0 line found
+                newjob.link0.append(line.lstrip())
+            elif REGAUCMP["route"].match(line.lstrip()):
+                # Route section found
+                newjob.route.append(line)
                 break
         else:
-            lempty = 0
-    # Add newly generated gjf object to list
-    joblist = [newjob] + joblist
-    return joblist
+            errore("Route section not found")
+        # Read Route section
+        readsection(lines, newjob.route)
+        # Possibly read Title and Molecule
+        fullroute = " ".join(newjob.route)
+        if not REGAUCMP["allchk"].search(fullroute):
+            readsection(lines, newjob.title)
+            readsection(lines, newjob.mol)
+        # Read Tail
+        link1 = False
+        lempty = 0
+        for line in lines:
+            if REGAUCMP["link1"].match(line):
+                link1 = True
+                break
+            newjob.tail.append(line)
+            if not line.strip():
+                # Gaussian reads nothing after two consecutive empty lines
+                lempty = lempty + 1
+                if lempty == 2:
+                    break
+            else:
+                lempty = 0
+        yield newjob
+        if not link1:
+            return
+
+
+def iter_jobs(path: str):
+    """Stream Gaussian input file objects from file"""
+    with open(path, "r") as filein:
+        yield from itergau(filein)
+
+
+def parsegau(lines, joblist):
+    """Parse Gaussian jobs and prepend them to joblist"""
+    return list(itergau(lines)) + joblist
 
 
 def readsection(lines, toadd):
     """Read section terminated by empty line"""
-    nline = 0
-    for nline, line in enumerate(lines):
+    for line in lines:
         if not line.strip():
             break
         toadd.append(line)
-    return nline + 1
+    return None
+
+
+def gaujob(gauinp: str, gaucmd: str, gauout: str, opts, ad: str = ">", cpulist: typing.Optional[str] = None):
+    """Run Gaussian calculation on single input file and return exit status and wall time"""
+    gauinp_nam, gauinp_ext = os.path.splitext(gauinp)
+    # If we want a fchk we need at least one chk
+    addchk = opts.fchk and not any(gjf.chk() for gjf in gaujobs(gauinp))
+    # Stream Gaussian input file objects, modify them according to options and write temporary file
+    joblist = modgaujob(gaujobs(gauinp), gauinp_nam, opts, chk=addchk, cpulist=cpulist)
+    _gauinp = wrtgauinp(joblist, opts.gauscr, gauinp, opts.vrb)
+    # RUN COMMAND
+    comando = " ".join([gaucmd, "<", _gauinp, ad, gauout])
+    if opts.vrb >= 1:
+        print(comando)
+    status = 0
+    walltime = 0.0
+    if not opts.dry:
+        start = time.perf_counter()
+        status = bashcall(comando, env=os.environ, vrb=opts.vrb)
+        walltime = time.perf_counter() - start
+        if status != 0:
+            print(f"WARNING: Calculation on {gauinp} failed")
+        elif opts.fchk:
+            # POSSIBLY GENERATE FORMATTED CHECKPOINT FILE
+            chkset = set()
+            for gjf in iter_jobs(_gauinp):
+                chk = gjf.chk()
+                if chk:
+                    chkset.add(chk)
+            for chk in chkset:
+                fchk = os.path.splitext(chk)[0] + ".fchk"
+                formchk = f"formchk {chk} {fchk}"
+                if bashcall(formchk, env=os.environ, vrb=opts.vrb) != 0:
+                    print(f"WARNING: formchk {chk} {fchk} failed")
+    # This is the patch for the fluorescence calculations
+    for tocopy in {"fluo.com", "points.off"}:
+        if os.path.isfile(f"{tocopy}"):
+            print(f"File {tocopy} is here")
+            if os.getenv("PBS_ENVIRONMENT") == "PBS_BATCH" and os.getenv("PBS_O_WORKDIR", default=""):
+                import shutil
+
+                shutil.copyfile(f"{tocopy}", os.path.join(os.getenv("PBS_O_WORKDIR"), tocopy))
+    if _gauinp != gauinp:
+        os.remove(_gauinp)
+        if opts.vrb >= 1:
+            print(f"File {_gauinp} removed")
+    # LOG CALCULATION
+    if not opts.dry and telemetry.USETELEMETRY and os.path.isfile(gauout):
+        try:
+            telemetry.record(gauout, gauinp, status)
+        except Exception as err:
+            # Never fail a calculation because of its record
+            print(f"WARNING: Calculation on {gauinp} not recorded: {err}")
+    return status, walltime
+
+
+def gaupool(opts, gaucmd: str):
+    """Run input files concurrently on disjoint processor slots"""
+    slots = queue.Queue()
+    try:
+        cpulists = cpupin.cpuslots(opts.njobs, int(opts.nproc))
+    except ValueError as err:
+        errore(err)
+    for cpulist in cpulists:
+        slots.put(cpulist)
+
+    def slotjob(gauinp):
+        """Run input file on the first free slot"""
+        cpulist = slots.get()
+        try:
+            if opts.vrb >= 1:
+                print(f"Running {gauinp} on processors {cpulist}")
+            gauout = os.path.splitext(gauinp)[0] + ".log"
+            return gaujob(gauinp, gaucmd, gauout, opts, cpulist=cpulist)
+        finally:
+            slots.put(cpulist)
+
+    with ThreadPoolExecutor(max_workers=opts.njobs) as pool:
+        results = list(pool.map(slotjob, opts.gjf))
+    return results
 
 
 def gaurun(opts):
     """Run Gaussian calculation with given options"""
     # DEFINE GAUSSIAN ENVIRONMENT AND SUBMISSION COMMAND
     os.environ = cleanenv(os.environ)
+    os.environ = mergeenv(os.environ, gauprofenv(opts.gauroot))
     os.environ = setgauenv(os.environ, opts.gauroot, opts.gauscr, opts.vrb)
-    gaucmd = add_source_gauprofile(BASECMD, opts.gauroot)
+    gaucmd = BASECMD
     # ASSEMBLE GAUSSIAN COMMAND
     if opts.wrkdir is not None:
         # Add {wrkdir} and {wrkdir/exe-dir} to executable paths
-        tmpcmd = add_source_gauprofile("echo $GAUSS_EXEDIR", opts.gauroot)
-        exedir = bashrun(tmpcmd, env=os.environ)
+        exedir = os.environ.get("GAUSS_EXEDIR", "")
         exedir = ":".join([opts.wrkdir, exedir])
         srcexe = os.path.join(opts.wrkdir, "exe-dir")
         if os.path.isdir(srcexe):
             exedir = ":".join([srcexe, exedir])
         gaucmd = " ".join([gaucmd, f'-exedir="{exedir}"'])
-    da = "<"
-    ad = ">"
-    # LOOP OVER INPUT FILES ONE BY ONE
-    for num, gauinp in enumerate(opts.gjf, start=1):
-        # CREATE NEW TEMPORARY INPUT FILE
-        gauinp_nam, gauinp_ext = os.path.splitext(gauinp)
-        # Parse input file to generate Gaussian input file objects
-        joblist = []
-        try:
-            with open(gauinp, "r") as filein:
-                lines = filein.readlines()
-                joblist = parsegau(lines, joblist)
-        except FileNotFoundError:
-            if gauinp_nam == TESTGAU:
-                newjob = gauinput()
-                newjob.default()
-                joblist = [newjob] + joblist
-            else:
-                errore(f"File {gauinp} not found")
-        # Modify jobs according to options and write temporary file
-        joblist = modgaujob(joblist, gauinp_nam, opts)
-        _gauinp = wrtgauinp(joblist, opts.gauscr, gauinp, opts.vrb)
-        # SET OUTPUT FILE
-        if opts.out is None:
-            gauout = gauinp_nam + ".log"
-        else:
-            gauout = opts.out
-            if num > 1:
-                # if there are multiple inputs but the output filename is set then append output
-                ad = ">>"
-        # RUN COMMAND
-        comando = " ".join([gaucmd, da, _gauinp, ad, gauout])
-        if opts.vrb >= 1:
-            print(comando)
-        if not opts.dry:
-            try:
-                gaurun = bashrun(comando, env=os.environ, vrb=opts.vrb)
-            except:
-                print(f"WARNING: Calculation on {gauinp} failed")
+    if opts.njobs > 1:
+        # RUN INPUT FILES CONCURRENTLY
+        results = gaupool(opts, gaucmd)
+    else:
+        # LOOP OVER INPUT FILES ONE BY ONE
+        results = []
+        ad = ">"
+        for num, gauinp in enumerate(opts.gjf, start=1):
+            # SET OUTPUT FILE
+            if opts.out is None:
+                gauout = os.path.splitext(gauinp)[0] + ".log"
             else:
-                # POSSIBLY GENERATE FORMATTED CHECKPOINT FILE
-                if opts.fchk:
-                    chkset = set()
-                    for gjf in joblist:
-                        chk = gjf.chk()
-                        if chk:
-                            chkset.add(chk)
-                    for chk in chkset:
-                        fchk = os.path.splitext(chk)[0] + ".fchk"
-                        formchk = add_source_gauprofile(f"formchk {chk} {fchk}", opts.gauroot)
-                        try:
-                            dofchk = bashrun(formchk, env=os.environ, vrb=opts.vrb)
-                        except:
-                            print(f"WARNING: formchk {chk} {fchk} failed")
-        # This is the patch for the fluorescence calculations
-        for tocopy in {"fluo.com", "points.off"}:
-            if os.path.isfile(f"{tocopy}"):
-                print(f"File {tocopy} is here")
-                if os.getenv("PBS_ENVIRONMENT") == "PBS_BATCH" and os.getenv("PBS_O_WORKDIR", default=""):
-                    import shutil
-
-                    shutil.copyfile(f"{tocopy}", f"{PBS_O_WORKDIR}/{tocopy}")
-        if _gauinp != gauinp:
-            os.remove(_gauinp)
-            if opts.vrb >= 1:
-                print(f"File {_gauinp} removed")
-        # LOG CALCULATION: TOBEDONE
-    return None
+                gauout = opts.out
+                if num > 1:
+                    # if there are multiple inputs but the output filename is set then append output
+                    ad = ">>"
+            results.append(gaujob(gauinp, gaucmd, gauout, opts, ad=ad))
+    # SUMMARY OF CALCULATIONS
+    if len(opts.gjf) > 1 and not opts.dry:
+        width = max(len(gauinp) for gauinp in opts.gjf)
+        print(f"{'Input':<{width}}  Status  Wall/s")
+        for gauinp, (status, walltime) in zip(opts.gjf, results):
+            print(f"{gauinp:<{width}}  {status:>6}  {walltime:.1f}")
+    return results
 
 
 # ==============
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+#
+# Estimate processors and memory of Gaussian jobs from route and molecule, calibrated on past logs
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import re  # Regex
+import argparse  # commandline argument parsers
+import json  # Model file format
+import math  # C library float functions
+import tempfile  # To write the model atomically
+import numpy  # Scientific computing
+import gau  # Gaussian input files
+import gaulog  # Indexed Gaussian log parser
+import telemetry  # Store of finished jobs
+from feutils import cachedir, errore, wide_help  # My generic functions
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+
+# ==========
+#  DEFAULTS
+# ==========
+RESTART = re.compile(r"^\s*#[pnt]?", flags=re.IGNORECASE)
+# Job kinds from the most to the least demanding
+KINDS = ("anharm", "vibronic", "freq", "td", "opt", "sp")
+# Method classes, first match wins, SCF (HF and DFT) otherwise
+METHODS = {
+    "post": re.compile(r"(?:r|u|ro)?(?:mp[2-5]|ccsd|qcisd|cisd|cc2|casscf|cas|eom)"),
+    "semi": re.compile(r"(?:am1|pm[3-7]|pddg|mndo|dftb|zindo|xtb)"),
+    "mm": re.compile(r"(?:amber|uff|dreiding)"),
+}
+# Basis functions of H-He, Li-Ne and heavier atoms (approximate, spherical d functions)
+BASISFN = {
+    "sto-3g": (1, 5, 9),
+    "3-21g": (2, 9, 13),
+    "6-31g": (2, 9, 13),
+    "6-31g*": (2, 14, 18),
+    "6-31g**": (5, 14, 18),
+    "6-31+g*": (2, 18, 22),
+    "6-31+g**": (5, 18, 22),
+    "6-31++g**": (6, 18, 22),
+    "6-311g": (3, 13, 21),
+    "6-311g*": (3, 18, 26),
+    "6-311g**": (6, 18, 26),
+    "6-311+g**": (6, 22, 30),
+    "6-311++g**": (7, 22, 30),
+    "cc-pvdz": (5, 14, 18),
+    "aug-cc-pvdz": (9, 23, 27),
+    "cc-pvtz": (14, 30, 34),
+    "aug-cc-pvtz": (23, 46, 50),
+    "def2svp": (5, 14, 18),
+    "def2tzvp": (6, 31, 37),
+    "def2tzvpp": (14, 31, 37),
+    "n07d": (5, 18, 22),
+}
+# Unknown, general or ECP basis sets
+DEFAULTFN = (5, 18, 26)
+# Basis functions per processor below which adding processors does not pay
+BASISPERCORE = {"sp": 30, "opt": 30, "td": 25, "freq": 20, "vibronic": 20, "anharm": 15}
+# Memory in words per processor per squared basis function
+MEMWORDS = {"sp": 4, "opt": 4, "td": 8, "freq": 12, "vibronic": 12, "anharm": 24}
+METHODMEM = {"scf": 1.0, "post": 4.0, "semi": 0.25, "mm": 0.25}
+WORDBYTES = 8
+# Memory of the program and integral buffers, smallest request
+MEMBASE = 512 * 1024**2
+MEMMIN = 1024**3
+# Calibration: efficiency cpu/(wall*nproc) of a run that scales well, shortest runs and samples considered
+EFFMIN = 0.7
+MINWALL = 60.0
+MINSAMPLES = 3
+# Percentile of the basis functions per processor of efficient runs
+PERCENTILE = 10
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+def modelfile() -> str:
+    """Default calibrated model file"""
+    return os.path.join(cachedir("gauest"), "model.json")
+
+
+def routekeys(route: str) -> dict:
+    """Keywords of route section with their set of options, lower case"""
+    return gau.routekeys(RESTART.sub("", route))
+
+
+def jobkind(keys: dict) -> str:
+    """Kind of job from route keywords"""
+    if "freq" in keys:
+        if keys["freq"] & {"anharm", "anharmonic"}:
+            return "anharm"
+        if keys["freq"] & {"fc", "fcht", "ht"}:
+            return "vibronic"
+        return "freq"
+    if keys.keys() & {"td", "tda", "cis"}:
+        return "td"
+    if "opt" in keys:
+        return "opt"
+    return "sp"
+
+
+def methodbasis(keys: dict) -> tuple:
+    """Method class and basis set from route keywords"""
+    method, basis = "scf", None
+    for key, opts in keys.items():
+        words = key.split("/")
+        # Polarization functions as 6-31G(d,p) are read as options
+        polar = "({})".format(",".join(sorted(opts))) if opts and (len(words) > 1 or key.endswith("g")) else ""
+        if len(words) > 1 and basis is None:
+            basis = words[1] + polar
+        elif normbasis(key + polar) in BASISFN:
+            basis = key + polar
+        for name, pattern in METHODS.items():
+            if pattern.fullmatch(words[0]):
+                method = name
+    return method, basis
+
+
+def normbasis(basis: str) -> str:
+    """Basis set name in BASISFN notation"""
+    return basis.lower().replace("(d,p)", "**").replace("(d)", "*").replace("def2-", "def2")
+
+
+def atomrow(word: str) -> int:
+    """Row of periodic table of atom label or atomic number, 0 for dummy atoms"""
+    try:
+        number = int(word)
+    except ValueError:
+        match = gau.REGAUCMP["atom"].match(word)
+        if match is None:
+            return 0
+        element = match.group("El")
+        if element == "X":
+            return 0
+        if element in ("H", "He"):
+            return 1
+        return 2 if element in ("Li", "Be", "B", "C", "N", "O", "F", "Ne") else 3
+    if number <= 0:
+        return 0
+    return 1 if number <= 2 else 2 if number <= 10 else 3
+
+
+def atomrows(mol: list) -> list:
+    """Rows of atoms of the Molecule section of an input"""
+    rows = []
+    for line in mol[1:]:
+        words = line.split()
+        if not words or words[0].lower().startswith("variables"):
+            break
+        row = atomrow(words[0])
+        if row:
+            rows.append(row)
+    return rows
+
+
+# =================
+#  PARSING OPTIONS
+# =================
+def parseopt(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(
+        prog=PROGNAME,
+        formatter_class=wide_help(argparse.HelpFormatter, w=140, h=40),
+        description="Estimate processors and memory of Gaussian inputs, or calibrate the estimate on logs",
+    )
+    parser.add_argument("files", nargs="*", metavar="FILE", help="Gaussian input files, or logs with --calibrate")
+    parser.add_argument("-c", "--calibrate", dest="calibrate", action="store_true", help="Calibrate model on logs")
+    parser.add_argument(
+        "-t",
+        "--telemetry",
+        metavar="DB",
+        dest="telemetry",
+        nargs="?",
+        const=telemetry.DBFILE,
+        default=None,
+        help=f"Calibrate model also on the jobs of the telemetry store (default: {telemetry.DBFILE})",
+    )
+    parser.add_argument("-p", "--nproc", metavar="NPROC", dest="nproc", type=int, default=None, help="Max processors")
+    parser.add_argument("--model", metavar="FILE", dest="model", default=None, help="Model file (default: cache)")
+    opts = parser.parse_args(args)
+    if opts.telemetry is not None:
+        opts.calibrate = True
+    if not opts.files and opts.telemetry is None:
+        errore("No input file")
+    if opts.model is None:
+        opts.model = modelfile()
+    return opts
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+def loadmodel(path=None) -> dict:
+    """Calibrated model, defaults for what was never calibrated"""
+    model = {"basispercore": dict(BASISPERCORE), "cost": {}, "samples": {}}
+    try:
+        with open(path or modelfile(), "r") as fil:
+            saved = json.load(fil)
+        for key in model:
+            model[key].update(saved.get(key, {}))
+    except (OSError, ValueError):
+        pass
+    return model
+
+
+def savemodel(model: dict, path=None):
+    """Write model atomically"""
+    path = path or modelfile()
+    tmpdir = os.path.dirname(os.path.abspath(path))
+    tmpfil = tempfile.NamedTemporaryFile(mode="w", dir=tmpdir, suffix=".tmp", delete=False)
+    with tmpfil as fil:
+        json.dump(model, fil, indent=1)
+    os.replace(tmpfil.name, path)
+
+
+def features(path: str) -> list:
+    """Kind, method, basis, atoms and estimated basis functions of each job of an input"""
+    jobs = []
+    rows = []
+    for gjf in gau.iter_jobs(path):
+        keys = routekeys(" ".join(line.strip() for line in gjf.route))
+        method, basis = methodbasis(keys)
+        # Geometry read from checkpoint, only charge and multiplicity given: same molecule as the previous job
+        rows = atomrows(gjf.mol) or rows
+        perrow = BASISFN.get(normbasis(basis or ""), DEFAULTFN)
+        jobs.append(
+            {
+                "kind": jobkind(keys),
+                "method": method,
+                "basis": basis,
+                "natoms": len(rows),
+                "nbasis": sum(perrow[row - 1] for row in rows),
+            }
+        )
+    return jobs
+
+
+def jobsize(job: dict, model: dict, maxproc=None) -> tuple:
+    """Processors, memory in bytes and CPU seconds (NaN if not calibrated) of a job"""
+    kind, nbasis = job["kind"], job["nbasis"]
+    nproc = max(round(nbasis / model["basispercore"][kind]), 1)
+    if maxproc is not None:
+        nproc = min(nproc, maxproc)
+    mem = MEMBASE + nproc * nbasis**2 * WORDBYTES * MEMWORDS[kind] * METHODMEM[job["method"]]
+    cpu = math.nan
+    if kind in model["cost"] and nbasis > 0:
+        slope, icept = model["cost"][kind]
+        cpu = math.exp(icept + slope * math.log(nbasis))
+    return nproc, int(mem), cpu
+
+
+def estimate(path: str, maxproc=None, maxmem=None, model=None) -> dict:
+    """Processors and memory for the most demanding job of an input, total CPU seconds"""
+    if model is None:
+        model = loadmodel()
+    result = {"natoms": 0, "nbasis": 0, "kind": "sp", "nproc": 1, "mem": 0, "cpu": 0.0}
+    for job in features(path):
+        nproc, mem, cpu = jobsize(job, model, maxproc)
+        if (nproc, mem) > (result["nproc"], result["mem"]):
+            result.update(natoms=job["natoms"], nbasis=job["nbasis"], kind=job["kind"])
+        result["nproc"] = max(result["nproc"], nproc)
+        result["mem"] = max(result["mem"], mem)
+        result["cpu"] = result["cpu"] + cpu
+    result["mem"] = max(result["mem"], MEMMIN)
+    if maxmem is not None:
+        result["mem"] = min(result["mem"], maxmem)
+    return result
+
+
+def logjobs(logs: list):
+    """Summaries of the jobs in logs"""
+    for log in logs:
+        try:
+            yield from gaulog.summaries(log)
+        except (OSError, ValueError) as err:
+            print(f"WARNING: skipping {log}: {err}")
+
+
+def dbjobs(path: str):
+    """Jobs of the telemetry store"""
+    if not os.path.isfile(path):
+        errore(f"No telemetry store {path}")
+    conn = telemetry.connect(path)
+    jobs = telemetry.runs(conn, "wall IS NOT NULL AND cpu IS NOT NULL")
+    conn.close()
+    return jobs
+
+
+def samples(jobs) -> dict:
+    """Basis functions, processors, CPU and wall seconds of finished jobs, by kind"""
+    data = {kind: [] for kind in KINDS}
+    for job in jobs:
+        nbasis, wall = int(job["nbasis"]), float(job["wall"])
+        if str(job["status"]) != "normal" or nbasis <= 0 or not wall >= MINWALL:
+            continue
+        kind = jobkind(routekeys(str(job["route"])))
+        data[kind].append((nbasis, int(job["nproc"]), float(job["cpu"]), wall))
+    return data
+
+
+def calibrate(jobs, model: dict) -> dict:
+    """Fit basis functions per processor of efficient runs and CPU time against basis functions"""
+    for kind, runs in samples(jobs).items():
+        if len(runs) < MINSAMPLES:
+            continue
+        runs = numpy.array(runs)
+        nbasis, nproc, cpu, wall = runs.T
+        efficient = cpu / (wall * nproc) >= EFFMIN
+        # Parallel runs that scaled well show how few basis functions per processor are enough
+        ratios = (nbasis / nproc)[efficient & (nproc > 1)]
+        if len(ratios) >= MINSAMPLES:
+            model["basispercore"][kind] = float(numpy.percentile(ratios, PERCENTILE))
+        if len(set(nbasis)) >= 2:
+            slope, icept = numpy.polyfit(numpy.log(nbasis), numpy.log(cpu), 1)
+            model["cost"][kind] = [float(slope), float(icept)]
+        model["samples"][kind] = len(runs)
+    return model
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main(args=None):
+    opts = parseopt(args)
+    model = loadmodel(opts.model)
+    if opts.calibrate:
+        jobs = list(logjobs(opts.files))
+        if opts.telemetry is not None:
+            jobs = jobs + dbjobs(opts.telemetry)
+        model = calibrate(jobs, model)
+        try:
+            savemodel(model, opts.model)
+        except OSError as err:
+            errore(f"Cannot write model {opts.model}: {err}")
+        print(f"{'Kind':<10} {'Runs':>6} {'NBasis/proc':>12} {'CPU ~ NBasis^':>14}")
+        for kind in KINDS:
+            slope = model["cost"].get(kind, [math.nan])[0]
+            print(f"{kind:<10} {model['samples'].get(kind, 0):>6} {model['basispercore'][kind]:>12.1f} {slope:>14.2f}")
+        print(f"Model written in {opts.model}")
+        sys.exit()
+    width = max(len(fname) for fname in opts.files)
+    print(f"{'Input':<{width}} {'Kind':<9} {'NAtoms':>6} {'NBasis':>6} {'NProc':>5} {'Mem':>6} {'CPU/h':>7}")
+    for fname in opts.files:
+        if not os.path.isfile(fname):
+            errore(f"File {fname} not found")
+        est = estimate(fname, opts.nproc, model=model)
+        cpu = "-" if math.isnan(est["cpu"]) else f"{est['cpu'] / 3600:.1f}"
+        line = f"{fname:<{width}} {est['kind']:<9} {est['natoms']:>6} {est['nbasis']:>6} {est['nproc']:>5}"
+        print(f"{line} {gau.memstring(est['mem']):>6} {cpu:>7}")
+    sys.exit()
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()
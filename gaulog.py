@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+
+#
+# Indexed parser of Gaussian log files
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import re  # Regex
+import mmap  # To scan large files without reading them
+import hashlib  # To key cache files
+import tempfile  # To write cache files atomically
+import functools  # To wrap parsers with the cache
+import bisect  # To locate sections between offsets
+import numpy  # Scientific computing
+from feutils import cachedir  # My generic functions
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+
+# ==========
+#  DEFAULTS
+# ==========
+# Section markers, always at the beginning of a line
+MARKERS = {
+    "start": rb" Initial command:",
+    "freq": rb" Frequencies -- ",
+    "excited": rb" Excited State ",
+    "orient": rb" +(?:Standard|Input) orientation:",
+}
+# Markers of excited state properties, indexed only when asked for
+TDMARKERS = {
+    "start": MARKERS["start"],
+    "tdstep": rb" Excitation energies and oscillator strengths:",
+    "excited": MARKERS["excited"],
+    "tddip": rb" Ground to excited state transition electric dipole moments",
+    "tdrot": rb" +state +XX +YY +ZZ +R\((?:length|velocity)\)",
+    "tdct": rb"[^\n]*D\(Ang\)",
+    "tdspaz": rb"[^\n]*spaziali",
+}
+# Markers of the size, resources, timings and termination of jobs
+SUMMARYMARKERS = {
+    "start": MARKERS["start"],
+    "version": rb" Gaussian \d\d: ",
+    "route": rb" #[PNTpnt]? ",
+    "natoms": rb" NAtoms= ",
+    "nbasis": rb" +\d+ basis functions,",
+    "nproc": rb" Will use up to ",
+    "leave": rb" Leave Link ",
+    "jobcpu": rb" Job cpu time:",
+    "elapsed": rb" Elapsed time:",
+    "normal": rb" Normal termination",
+    "error": rb" Error termination",
+}
+# Bytes of the words of MaxMem
+WORDBYTES = 8
+# Seconds of the units of job times
+TIMEUNITS = {"days": 86400, "hours": 3600, "minutes": 60, "seconds": 1}
+# Excited state properties: marker of table, text required in its header, word with the value
+TDCOLS = {
+    "dipS": ("tddip", "", 4),
+    "angle": ("tdrot", "E-M Angle", 5),
+    "Rlen": ("tdrot", "R(length)", 4),
+    "Rvel": ("tdrot", "R(velocity)", 4),
+    "dAng": ("tdct", "", 8),
+}
+# Word with the value in spaziali lines
+SPAZWORD = 6
+NAN = float("nan")
+# Lines allowed between a table header and its first row
+TABSKIP = 2
+# Labels of the lines of a frequency block and their names
+FREQLINES = {
+    "Frequencies": "Freq",
+    "Red. masses": "redmas",
+    "Frc consts": "frcons",
+    "IR Inten": "IR",
+    "Raman Activ": "Raman",
+    "Depolar (P)": "depolP",
+    "Depolar (U)": "depolU",
+}
+# Lines of an orientation block before coordinates
+ORIENTSKIP = 5
+# Change whenever a parser returns something different, to discard old cache entries
+PARSER = 3
+# Maximum size in bytes of cached results, least recently used are removed first
+CACHEMAX = 256 * 1024**2
+# Set GAULOG_NOCACHE to parse logs again every time
+USECACHE = not os.getenv("GAULOG_NOCACHE")
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+@functools.lru_cache(maxsize=None)
+def reindex(markers) -> re.Pattern:
+    """Regex finding in one pass all (name, pattern) markers at the beginning of a line"""
+    return re.compile(rb"\n(?:" + rb"|".join(rb"(?P<%s>%s)" % (k.encode(), v) for k, v in markers) + rb")")
+
+
+def seconds(text: str) -> float:
+    """Seconds of a job time such as '0 days  1 hours 12 minutes 3.5 seconds.', NaN if none"""
+    words = text.rstrip(".").split()
+    total, found = 0.0, False
+    for value, unit in zip(words[:-1], words[1:]):
+        if unit in TIMEUNITS:
+            total = total + tofloat(value) * TIMEUNITS[unit]
+            found = True
+    return total if found else NAN
+
+
+def tofloat(word: str) -> float:
+    """Convert Fortran number, NaN if not a number"""
+    try:
+        return float(word.replace("D", "E"))
+    except ValueError:
+        return NAN
+
+
+# =========
+#  CLASSES
+# =========
+class gaulog:
+    """Gaussian log file with byte offsets of its sections, one dictionary per job"""
+
+    def __init__(self, path: str, markers=None):
+        self.path = path
+        self.markers = MARKERS if markers is None else markers
+        self._fil = open(path, "rb")
+        try:
+            self.mm = mmap.mmap(self._fil.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self.mm = b""
+        self.jobs = []
+        self._index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self._fil.close()
+
+    def _index(self):
+        """Scan the file once recording where each section starts"""
+        pattern = reindex(tuple(self.markers.items()))
+        # The first line has no newline before it
+        first = pattern.match(b"\n" + self.mm[: self.mm.find(b"\n") + 1])
+        matches = pattern.finditer(self.mm)
+        for kind, offset in ([(first.lastgroup, 0)] if first else []) + [(m.lastgroup, m.start() + 1) for m in matches]:
+            if kind == "start":
+                self.jobs.append({key: [] for key in self.markers})
+            elif not self.jobs:
+                # Nothing before the first job
+                continue
+            self.jobs[-1][kind].append(offset)
+
+    def offsets(self, kind: str, job: int):
+        """Offsets of sections of a kind in a job"""
+        return self.jobs[job][kind]
+
+    def line(self, offset: int):
+        """Return line starting at offset and offset of next line"""
+        end = self.mm.find(b"\n", offset)
+        if end < 0:
+            end = len(self.mm)
+        return self.mm[offset:end].decode(errors="replace"), end + 1
+
+    def lines(self, offset: int):
+        """Iterate over lines from offset"""
+        while offset < len(self.mm):
+            text, offset = self.line(offset)
+            yield text
+
+    def prevlines(self, offset: int, count: int):
+        """Return count lines preceding the line starting at offset"""
+        beg = offset - 1
+        for _ in range(count):
+            beg = self.mm.rfind(b"\n", 0, beg) if beg > 0 else -1
+        return self.mm[beg + 1 : offset - 1].decode(errors="replace").split("\n")
+
+    def vibrations(self, job: int) -> dict:
+        """Harmonic normal modes of a job as arrays"""
+        modes, syms, data = [], [], {}
+        for offset in self.offsets("freq", job):
+            # Mode numbers and symmetries are the two lines before frequencies
+            modeline, symline = self.prevlines(offset, 2)
+            block = [int(x) for x in modeline.split()]
+            modes.extend(block)
+            syms.extend(symline.split())
+            for text in self.lines(offset):
+                if "--" not in text:
+                    break
+                label, values = text.split("--", 1)
+                name = FREQLINES.get(label.strip())
+                if name is None:
+                    continue
+                values = values.split()
+                if len(values) != len(block):
+                    raise ValueError(f"Incompatibility between number of modes and {name} data in {self.path}")
+                data.setdefault(name, []).extend(values)
+        vib = {"Mode": numpy.array(modes, dtype=int), "Sym": numpy.array(syms, dtype=str)}
+        for name, values in data.items():
+            if len(values) == len(modes):
+                vib[name] = numpy.array([float(x.replace("D", "E")) for x in values])
+        return vib
+
+    def geometry(self, job: int, which: int = -1):
+        """Atomic numbers and coordinates in Angstrom of an orientation block of a job"""
+        offsets = self.offsets("orient", job)
+        if not offsets:
+            return None
+        numbers, coords = [], []
+        for nline, text in enumerate(self.lines(offsets[which])):
+            if nline < ORIENTSKIP:
+                continue
+            words = text.split()
+            if len(words) != 6:
+                break
+            numbers.append(int(words[1]))
+            coords.append([float(x) for x in words[3:6]])
+        return numpy.array(numbers, dtype=int), numpy.array(coords).reshape(-1, 3)
+
+    def table(self, offset: int) -> dict:
+        """Rows of a table after the header line at offset, by integer in the first column"""
+        rows = {}
+        lines = self.lines(offset)
+        next(lines, None)
+        for nline, text in enumerate(lines):
+            words = text.split()
+            if words and words[0].isdigit():
+                rows[int(words[0])] = words
+            elif rows or nline >= TABSKIP:
+                break
+        return rows
+
+    def excitations(self) -> list:
+        """Excited states of every step of TD calculations in the file, one dictionary of arrays per step.
+        The n-th table of each property belongs to the n-th step, as the log is read"""
+        offsets = {kind: sorted(sum((job[kind] for job in self.jobs), [])) for kind in self.markers}
+        # Excited states are listed after the header of their step, until the next step
+        steps = []
+        bounds = offsets["tdstep"] + [len(self.mm)]
+        for beg, end in zip(bounds[:-1], bounds[1:]):
+            states = {}
+            first = bisect.bisect_right(offsets["excited"], beg)
+            for offset in offsets["excited"][first : bisect.bisect_left(offsets["excited"], end)]:
+                words = self.line(offset)[0].replace(":", " ").split()
+                if int(words[2]) in states:
+                    break
+                states[int(words[2])] = words
+            steps.append(states)
+        tables = {name: [] for name in TDCOLS}
+        for name, (kind, header, word) in TDCOLS.items():
+            for offset in offsets[kind]:
+                if header in self.line(offset)[0]:
+                    rows = self.table(offset)
+                    tables[name].append({n: tofloat(w[word]) if len(w) > word else NAN for n, w in rows.items()})
+        spaz = []
+        for offset in offsets["tdspaz"]:
+            words = self.line(offset)[0].split()
+            spaz.append(tofloat(words[SPAZWORD]) if len(words) > SPAZWORD else NAN)
+        results = []
+        for nstep, states in enumerate(steps):
+            numbers = sorted(states)
+            step = {
+                "State": numpy.array(numbers, dtype=int),
+                "Sym": numpy.array([states[n][3].replace("Singlet-", "").replace("Sym", "") for n in numbers], dtype=str),
+                "eV": numpy.array([tofloat(states[n][4]) for n in numbers]),
+                "nm": numpy.array([tofloat(states[n][6]) for n in numbers]),
+                "f": numpy.array([tofloat(states[n][8].replace("f=", "")) for n in numbers]),
+            }
+            for name in TDCOLS:
+                values = tables[name][nstep] if nstep < len(tables[name]) else {}
+                step[name] = numpy.array([values.get(n, NAN) for n in numbers])
+            # spaziali lines of the file in order, one per state of the first step
+            if nstep == 0:
+                step["spaz"] = numpy.array([spaz[n - 1] if n <= len(spaz) else NAN for n in numbers])
+            else:
+                step["spaz"] = numpy.full(len(numbers), NAN)
+            results.append(step)
+        return results
+
+    def summary(self, job: int) -> dict:
+        """Route, size, resources, time spent in each link, total times and termination line of a job"""
+        offsets = self.jobs[job]
+
+        def first(kind: str, nword: int, default):
+            """Word of the first line of a kind in the job"""
+            if not offsets[kind]:
+                return default
+            words = self.line(offsets[kind][0])[0].split()
+            return words[nword] if len(words) > nword else default
+
+        # Route lines are cut at fixed width, even inside keywords
+        route = []
+        if offsets["route"]:
+            for text in self.lines(offsets["route"][0]):
+                if text.startswith(" --"):
+                    break
+                route.append(text[1:])
+        links, linkcpu, linkwall, maxmem = [], [], [], 0
+        for offset in offsets["leave"]:
+            words = self.line(offset)[0].split()
+            links.append(int(words[2]))
+            after = dict(zip(words[:-1], words[1:]))
+            linkcpu.append(tofloat(after.get("cpu:", "nan")))
+            linkwall.append(tofloat(after.get("elap:", "nan")))
+            maxmem = max(maxmem, int(tofloat(after.get("MaxMem=", "0").rstrip(",")) * WORDBYTES))
+        cpu = seconds(self.line(offsets["jobcpu"][-1])[0].split(":", 1)[1]) if offsets["jobcpu"] else NAN
+        wall = seconds(self.line(offsets["elapsed"][-1])[0].split(":", 1)[1]) if offsets["elapsed"] else NAN
+        ended = ""
+        if offsets["normal"]:
+            status = "normal"
+            ended = self.line(offsets["normal"][-1])[0].strip()
+        elif offsets["error"]:
+            status = "error"
+            ended = self.line(offsets["error"][-1])[0].strip()
+        else:
+            status = "incomplete"
+        # The banner is printed once, in the first job
+        banners = offsets["version"] or self.jobs[0]["version"]
+        version = self.line(banners[0])[0].split()[2] if banners else ""
+        return {
+            "route": "".join(route).strip(),
+            "version": version,
+            "natoms": int(first("natoms", 1, 0)),
+            "nbasis": int(first("nbasis", 0, 0)),
+            "nproc": int(first("nproc", 4, 1)),
+            "maxmem": maxmem,
+            "link": numpy.array(links, dtype=int),
+            "linkcpu": numpy.array(linkcpu),
+            "linkwall": numpy.array(linkwall),
+            "cpu": cpu,
+            "wall": wall,
+            "status": status,
+            "ended": ended,
+        }
+
+    def __len__(self):
+        return len(self.jobs)
+
+
+# =================
+#  CACHE FUNCTIONS
+# =================
+def cachefile(path: str, name: str):
+    """Cache file of results of parser name for log path or None if missing"""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), info.st_size, info.st_mtime_ns, PARSER, name)
+    keyhash = hashlib.sha1(repr(key).encode()).hexdigest()
+    try:
+        return os.path.join(cachedir("gaulog"), f"{keyhash}.npz")
+    except OSError:
+        return None
+
+
+def cacheload(cache: str):
+    """Load list of dictionaries of arrays from cache or None"""
+    try:
+        with numpy.load(cache, allow_pickle=False) as data:
+            results = [{} for _ in range(int(data["njobs"]))]
+            for key in data.files:
+                if key != "njobs":
+                    job, name = key.split("/", 1)
+                    results[int(job)][name] = data[key]
+        # Mark as recently used
+        os.utime(cache)
+    except (OSError, ValueError, KeyError):
+        return None
+    return results
+
+
+def cachesave(cache: str, results: list):
+    """Save list of dictionaries of arrays in cache, then trim cache"""
+    arrays = {"njobs": numpy.array(len(results))}
+    for job, result in enumerate(results):
+        for name, value in result.items():
+            arrays[f"{job}/{name}"] = numpy.asarray(value)
+    try:
+        tmpfil = tempfile.NamedTemporaryFile(dir=os.path.dirname(cache), suffix=".tmp", delete=False)
+        with tmpfil as fil:
+            numpy.savez(fil, **arrays)
+        os.replace(tmpfil.name, cache)
+    except OSError:
+        return
+    cachetrim()
+
+
+def cachetrim(maxsize: int = CACHEMAX):
+    """Remove least recently used cache files until their total size is below maxsize"""
+    entries = []
+    with os.scandir(cachedir("gaulog")) as scan:
+        for entry in scan:
+            try:
+                info = entry.stat()
+            except OSError:
+                continue
+            entries.append((info.st_mtime_ns, info.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= maxsize:
+            break
+        try:
+            os.remove(path)
+            total = total - size
+        except OSError:
+            pass
+
+
+def cached(parser):
+    """Store results of parser(path), a list of dictionaries of arrays, on disk"""
+
+    @functools.wraps(parser)
+    def wrapper(path: str):
+        cache = cachefile(path, parser.__name__) if USECACHE else None
+        if cache is not None:
+            results = cacheload(cache)
+            if results is not None:
+                return results
+        results = parser(path)
+        if cache is not None:
+            cachesave(cache, results)
+        return results
+
+    return wrapper
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+@cached
+def vibrations(path: str):
+    """Harmonic normal modes of every job in a log file"""
+    with gaulog(path) as log:
+        return [log.vibrations(job) for job in range(len(log))]
+
+
+@cached
+def summaries(path: str):
+    """Route, size, resources, timings and termination of every job in a log file"""
+    with gaulog(path, SUMMARYMARKERS) as log:
+        return [log.summary(job) for job in range(len(log))]
+
+
+@cached
+def excitations(path: str):
+    """Excited states of every TD step in a log file"""
+    with gaulog(path, TDMARKERS) as log:
+        return log.excitations()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+#
+# Benchmark input validation and PBS script assembly of gxx_qsub.py without submitting anything
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import argparse  # commandline argument parsers
+import contextlib  # To silence gxx_qsub messages
+import hashlib  # Revision of gxx_qsub.py outside git
+import io  # Sink of silenced messages
+import json  # History file format
+import platform  # Python version in history
+import subprocess  # Git revision in history
+import tempfile  # To create fixtures and the qsub stub
+import time  # To time the submission path
+import tracemalloc  # Peak memory of the submission path
+import gxx_qsub  # Submission script under test
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+
+# ==========
+#  DEFAULTS
+# ==========
+HISTORY = os.path.join(gxx_qsub.CATALOGUE_CACHE, "bench.jsonl")
+# Slowdown with respect to the previous run on the same fixtures reported as regression
+TOLERANCE = 0.2
+QSUB_STUB = """#!/bin/sh
+cat > /dev/null
+echo "$$.stub"
+"""
+# Polarizable embedding model replacing "pempar"
+PEM = "epr"
+GEOMETRY = "".join(f"C {0.1 * i:.4f} 0.0000 0.0000\n" for i in range(30))
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+def gjfblock(route: str, tail: str = "", link0: str = "%mem=2GB\n%nprocshared=4\n") -> str:
+    """One Gaussian job step"""
+    return f"{link0}{route}\n\nBenchmark\n\n0 1\n{GEOMETRY}\n{tail}\n"
+
+
+def fixtures(path: str, nsmall: int, nlink: int) -> dict:
+    """Write the benchmark inputs in path, return lists of files by corpus"""
+    corpora = {"small": [], "link1": [], "vibronic": [], "pembed": []}
+    for i in range(nsmall):
+        fname = os.path.join(path, f"small{i:05d}.gjf")
+        with open(fname, "w") as fobj:
+            fobj.write(gjfblock("#p B3LYP/6-31G* opt freq"))
+        corpora["small"].append(fname)
+    fname = os.path.join(path, "chain.gjf")
+    with open(fname, "w") as fobj:
+        fobj.write("--Link1--\n".join(gjfblock("#p B3LYP/6-31G* freq geom=check guess=read") for _ in range(nlink)))
+    corpora["link1"].append(fname)
+    for i, route in enumerate(("freq=(fcht,readfcht)", "freq=(readanharm,anharmonic)", "freq=(fc,readfcht) fchk")):
+        extra = os.path.join(path, f"vib{i}.dat")
+        with open(extra, "w") as fobj:
+            fobj.write("0.0\n")
+        fname = os.path.join(path, f"vib{i}.gjf")
+        with open(fname, "w") as fobj:
+            fobj.write(gjfblock(f"#p B3LYP/6-31G* {route}", f"{os.path.basename(extra)}\n"))
+        corpora["vibronic"].append(fname)
+    for i, model in enumerate(("rick", "ivan", "epr", "pempar")):
+        fname = os.path.join(path, f"pem{i}.gjf")
+        with open(fname, "w") as fobj:
+            fobj.write(gjfblock("#p B3LYP/6-31G* pembed(fq) geomview", f"{model}\n"))
+        corpora["pembed"].append(fname)
+    return corpora
+
+
+def revision() -> str:
+    """Git commit of gxx_qsub.py, with the hash of the file if modified or outside git"""
+    source = os.path.abspath(gxx_qsub.__file__)
+    with open(source, "rb") as fobj:
+        digest = hashlib.sha1(fobj.read()).hexdigest()[:10]
+    gitcmd = ["git", "-C", os.path.dirname(source)]
+    try:
+        commit = subprocess.run(gitcmd + ["rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        status = subprocess.run(gitcmd + ["status", "--porcelain", source], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return digest
+    if status.stdout.strip():
+        return f"{commit.stdout.strip()}+{digest}"
+    return commit.stdout.strip()
+
+
+def measure(func, *args):
+    """Return result and wall time of func(*args)"""
+    time0 = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - time0
+
+
+def peakmem(func, *args) -> int:
+    """Peak traced memory of func(*args), tracing slows it down too much to be timed"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# =================
+#  PARSING OPTIONS
+# =================
+def parseopt(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(prog=PROGNAME, description="Benchmark the gxx_qsub.py submission path")
+    parser.add_argument("-q", "--queue", metavar="QUEUE", dest="queue", default=None, help="Queue (default: first one)")
+    parser.add_argument("-n", "--nsmall", metavar="N", dest="nsmall", type=int, default=500, help="Small inputs")
+    parser.add_argument("-l", "--nlink", metavar="N", dest="nlink", type=int, default=1000, help="Steps of Link1 chain")
+    parser.add_argument("-r", "--repeat", metavar="N", dest="repeat", type=int, default=3, help="Best of N runs")
+    parser.add_argument("--history", metavar="FILE", dest="history", default=HISTORY, help="JSONL history file")
+    parser.add_argument("--nosave", dest="nosave", action="store_true", help="Do not add this run to the history")
+    opts = parser.parse_args(args)
+    if opts.queue is None:
+        opts.queue = sorted(gxx_qsub.catalogue()[1])[0]
+    return opts
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+def bench_check(files: list, outdir: str):
+    """Validate and rewrite inputs with check_gjf"""
+    for index, fname in enumerate(files):
+        gxx_qsub.check_gjf(fname, os.path.join(outdir, f"new{index}.gjf"), None, None, None, False, outdir, None, PEM)
+    return len(files)
+
+
+def bench_queue(queue: str, count: int):
+    """Resolve the queue specification count times"""
+    for _ in range(count):
+        gxx_qsub.get_queue_data(queue)
+    return count
+
+
+def bench_assembly(gopts, files: list, qspec: tuple):
+    """Build PBS script and qsub command of each input"""
+    qname, qnode, nprocs, nodeid, _, qsub_args = qspec
+    scripts = []
+    for index, fname in enumerate(files):
+        qjobname, nproc, mem, header, cmds = gxx_qsub.build_job(gopts, [fname], qnode, nprocs, "g16", [], f"b{index}")
+        qsub_cmd = gxx_qsub.build_qsub(gopts, qname, qnode, nodeid, qjobname, nproc, mem, "/g16", qsub_args)
+        scripts.append((qsub_cmd, gxx_qsub.pbs_script(header, cmds)))
+    return scripts
+
+
+def bench_subdir(gopts, qspec: tuple, startdir: str, files: list):
+    """Build one job per input given relative to startdir, one after the other as --batch does"""
+    qname, qnode, nprocs, nodeid, _, qsub_args = qspec
+    saved = gxx_qsub.STARTDIR
+    gxx_qsub.STARTDIR = startdir
+    try:
+        os.chdir(startdir)
+        for index, fname in enumerate(files):
+            gxx_qsub.build_job(gopts, [fname], qnode, nprocs, "g16", [], f"s{index}")
+    finally:
+        gxx_qsub.STARTDIR = saved
+    return len(files)
+
+
+def bench_submit(scripts: list):
+    """Pipe scripts to the qsub stub"""
+    for qsub_cmd, script in scripts:
+        gxx_qsub.submit(qsub_cmd, script)
+    return len(scripts)
+
+
+def run(opts, workdir: str) -> dict:
+    """Run all benchmarks, best of opts.repeat, and return their results"""
+    fixdir = os.path.join(workdir, "fixtures")
+    outdir = os.path.join(workdir, "out")
+    bindir = os.path.join(workdir, "bin")
+    for path in (fixdir, outdir, bindir):
+        os.makedirs(path)
+    with open(os.path.join(bindir, "qsub"), "w") as fobj:
+        fobj.write(QSUB_STUB)
+    os.chmod(os.path.join(bindir, "qsub"), 0o755)
+    corpora = fixtures(fixdir, opts.nsmall, opts.nlink)
+    gopts = gxx_qsub.build_parser().parse_args(["-q", opts.queue, "-t", outdir, "-pe", PEM])
+    gopts.multi = "no"
+    # Same layout as setup_queue, without architecture and group checks
+    qspec = gxx_qsub.get_queue_data(opts.queue) + (None, [])
+    allfiles = sum(corpora.values(), [])
+    cases = {f"check_gjf[{name}]": (bench_check, files, outdir) for name, files in corpora.items()}
+    cases["get_queue_data"] = (bench_queue, opts.queue, 10000)
+    cases["assembly"] = (bench_assembly, gopts, allfiles, qspec)
+    # Inputs in a subdirectory, relative to the submission directory
+    relfiles = [os.path.relpath(fname, workdir) for fname in corpora["small"]]
+    cases["assembly[subdir]"] = (bench_subdir, gopts, qspec, workdir, relfiles)
+    results = {}
+    environ = dict(os.environ)
+    try:
+        os.environ["PATH"] = bindir + os.pathsep + os.environ.get("PATH", "")
+        for name, (func, *args) in cases.items():
+            results[name] = best(opts.repeat, func, *args)
+        with contextlib.redirect_stdout(io.StringIO()):
+            scripts = bench_assembly(gopts, allfiles, qspec)
+        results["qsub_stub"] = best(opts.repeat, bench_submit, scripts)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        os.chdir(gxx_qsub.STARTDIR)
+    return results
+
+
+def best(repeat: int, func, *args) -> dict:
+    """Shortest time over repeat runs and peak memory of one more traced run"""
+    timings = []
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            for _ in range(max(repeat, 1)):
+                result, elapsed = measure(func, *args)
+                timings.append(elapsed)
+            peak = peakmem(func, *args)
+    except SystemExit:
+        lines = output.getvalue().strip().split("\n")
+        print(f"ERROR: {func.__name__} stopped with: {lines[-1]}")
+        sys.exit(2)
+    elapsed = min(timings)
+    count = result if isinstance(result, int) else len(result)
+    return {"items": count, "seconds": elapsed, "rate": count / max(elapsed, 1e-9), "peak": peak}
+
+
+def previous(history: str, fixture: dict):
+    """Last record in history with the same fixtures"""
+    last = None
+    try:
+        with open(history, "r") as fobj:
+            for line in fobj:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("fixture") == fixture:
+                    last = record
+    except OSError:
+        pass
+    return last
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main(args=None):
+    opts = parseopt(args)
+    fixture = {"queue": opts.queue, "nsmall": opts.nsmall, "nlink": opts.nlink}
+    with tempfile.TemporaryDirectory(prefix="gxxbench") as workdir:
+        results = run(opts, workdir)
+    last = previous(opts.history, fixture)
+    rev = revision()
+    print(f"gxx_qsub {rev}, {opts.nsmall} small inputs, {opts.nlink} Link1 steps, best of {opts.repeat}")
+    print(f"{'Case':<24} {'Items':>7} {'Time/s':>9} {'Items/s':>11} {'Peak/kB':>9} {'Change':>8}")
+    regressions = []
+    for name, res in results.items():
+        change = ""
+        if last is not None and name in last["results"]:
+            ratio = res["seconds"] / max(last["results"][name]["seconds"], 1e-9) - 1
+            change = f"{100 * ratio:+.0f}%"
+            if ratio > TOLERANCE:
+                regressions.append(name)
+        line = f"{name:<24} {res['items']:>7} {res['seconds']:>9.4f} {res['rate']:>11.1f} {res['peak'] / 1024:>9.0f}"
+        print(f"{line} {change:>8}")
+    if last is not None:
+        print(f"Compared with gxx_qsub {last.get('revision', last.get('version'))} run on {last['date']}")
+    if regressions:
+        print(f"WARNING: slower by more than {100 * TOLERANCE:.0f}%: {', '.join(regressions)}")
+    if not opts.nosave:
+        record = {
+            "revision": rev,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "fixture": fixture,
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(opts.history)), exist_ok=True)
+        with open(opts.history, "a") as fobj:
+            fobj.write(json.dumps(record) + "\n")
+    sys.exit(1 if regressions else 0)
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,12 @@
 import os
 import sys
 import re
+import glob
+import time
+import shlex
+import json
 import argparse
+import importlib.util
 from math import inf
 import socket  # module for the fully qualified named of the headnode
 from subprocess import Popen, PIPE
@@ -55,12 +60,22 @@ if not os.path.exists(HPCINIPATH):
 
 #  Queue definitions
 # -------------------
-if not os.path.exists(HPCINIPATH):
-    print("ERROR: Incorrect path to HPC nodes specification files.")
-    sys.exit()
-
-HPCNODES = hpc.parse_ini(HPCINIPATH)
-HPCQUEUES = hpc.list_queues_nodes(HPCNODES)
+# Node families and queues are compiled from the INI file into a catalogue
+#   the first time they are needed, and kept until the INI file changes.
+CATALOGUE_VERSION = 1
+CATALOGUE_CACHE = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(os.getenv("HOME"), ".cache"), "gxx_qsub")
+# Attributes of `hpc.NodeFamily` stored in the catalogue
+CATALOGUE_ATTRS = (
+    "ncores",
+    "cpu_arch",
+    "cpu_limits",
+    "mem_limits",
+    "size_mem",
+    "path_tmpdir",
+    "queue_name",
+    "user_groups",
+)
+_CATALOGUE = {}
 
 HELP_QUEUES = """Sets the queues.
 Available queues:
@@ -76,9 +91,7 @@ with:
         - "0" : auto (same as empty)
         - positive integer: total number of cores to use.
         - negative integer: number of CPUs to use
-""".format(
-    ", ".join(sorted(HPCQUEUES.keys()))
-)
+"""
 
 
 #  Gaussian-related definitions
@@ -114,6 +127,60 @@ GXX_ARCHS = {
 }
 # Maximum occupation of the total memory on a given node
 MEM_OCCUPATION = 0.9
+# Parallel jobs are pinned on the node by the core allocator shipped with this script
+CPUPIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cpupin.py")
+CPUSLOT = "@CPUSLOT@"
+# Files are staged in and out of the local scratch by the concurrent copier shipped with this script
+STAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stage.py")
+# Finished jobs are recorded from their logs by the telemetry store shipped with this script,
+# unless GAU_NOTELEMETRY is set at submission
+TELEMETRY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry.py")
+# Extensions of the compressed copies written back by the copier, uncompressed on stage-in
+STAGE_EXTS = (".zst", ".gz")
+# Background write-back during the run, started out of the job shell so that "wait" ignores it
+STAGE_SYNC = "({cmd} & echo $! >> .stage_sync.pid)\n"
+# Lowest CPU and I/O priority for the background write-back, which compresses on a single thread,
+# ionice is looked for on the node
+STAGE_NICE = "nice -n 19 $(command -v ionice > /dev/null && echo ionice -c3) "
+STAGE_STOP = """\
+mapfile -t SYNC_PIDS < .stage_sync.pid; kill ${SYNC_PIDS[@]} 2> /dev/null
+while kill -0 ${SYNC_PIDS[@]} 2> /dev/null; do sleep 1; done
+"""
+# Vibronic (Link 718) and anharmonic (Link 717) options of Freq
+FREQ_718 = frozenset(("fc", "fcht", "ht"))
+FREQ_717 = frozenset(("anharm", "anharmonic"))
+FCHK_KEYS = frozenset(("fchk", "fcheck", "formcheck"))
+# Job array: each subjob runs its own script, the last one to end removes the scripts directory
+BATCH_ARRAY = """\
+#PBS -S /bin/bash
+bash "{batchdir}/job_$PBS_ARRAY_INDEX.sh"
+STATUS=$?
+touch "{batchdir}/done_$PBS_ARRAY_INDEX"
+if [ $(ls "{batchdir}" | grep -c '^done_') -ge {njobs} ]; then rm -rf "{batchdir}"; fi
+exit $STATUS
+"""
+# Worker loop of packed jobs: a job starts when enough processors and memory (MB) are free
+PACK_WORKER = """\
+declare -A SLOT_P SLOT_M
+FREE_P={nprocs}
+FREE_M={mem}
+release() {{
+  for pid in "${{!SLOT_P[@]}}"; do
+    if ! kill -0 $pid 2> /dev/null; then
+      FREE_P=$((FREE_P + SLOT_P[$pid])); FREE_M=$((FREE_M + SLOT_M[$pid]))
+      unset SLOT_P[$pid] SLOT_M[$pid]
+    fi
+  done
+}}
+launch() {{
+  local nproc=$1 mem=$2
+  shift 2
+  while (( ${{#SLOT_P[@]}} > 0 && (nproc > FREE_P || mem > FREE_M) )); do wait -n; release; done
+  "$@" &
+  SLOT_P[$!]=$nproc; SLOT_M[$!]=$mem
+  FREE_P=$((FREE_P - nproc)); FREE_M=$((FREE_M - mem))
+}}
+"""
 
 HELP_GXX = """\
 It can be given as an absolute path or with the following keywords:
@@ -174,6 +241,14 @@ def build_parser():
     queue.add_argument("-j", "--job", dest="job", help="Sets the job name. (NOTE: PBS truncates after 15 characaters")
     queue.add_argument("-m", "--mail", dest="mail", action="store_true", help="Sends notification emails")
     queue.add_argument("--mailto", dest="mailto", help="Sends notification emails")
+    queue.add_argument(
+        "--watch",
+        dest="watch",
+        action="store_true",
+        help="""\
+Registers the jobs with jobwatch.py, which mails digests of finished jobs
+instead of PBS emails (-m). Recipient set with --mailto.""",
+    )
     queue.add_argument(
         "-M",
         "--mach",
@@ -181,7 +256,46 @@ def build_parser():
         action="store_true",
         help="Prints technical info on the machines available in the cluster",
     )
-    queue.add_argument("--multi", choices=("parallel", "serial"), help="Runs multiple jobs in a single submission")
+    queue.add_argument(
+        "--multi",
+        choices=("parallel", "serial", "pack"),
+        help="""\
+Runs multiple jobs in a single submission
++ parallel: all jobs at once, sharing the processors equally
++ serial  : one job after the other
++ pack    : packs jobs on whole nodes using their %%NProcShared and %%Mem,
+            each node starts the next job as soon as resources are free""",
+    )
+    queue.add_argument(
+        "--autosize",
+        dest="autosize",
+        action="store_true",
+        help="""\
+Sets processors and memory of each input from its route and molecule size
+(see gauest.py), within the limits of the queue.
+With --multi pack, only for inputs without %%NProcShared or %%Mem""",
+    )
+    queue.add_argument(
+        "--nnodes",
+        dest="nnodes",
+        type=int,
+        help="Maximum number of node submissions with --multi pack (default: all jobs start at once)",
+    )
+    queue.add_argument(
+        "--batch",
+        choices=("array", "serial"),
+        help="""\
+Submits each input as a separate job, after checking all of them.
+Input files can be given as quoted glob patterns or with --manifest.
++ array : one PBS job array (-J), one generated script per index
++ serial: one qsub per input, all from this process""",
+    )
+    queue.add_argument(
+        "--manifest",
+        dest="manifest",
+        metavar="FILE",
+        help='File listing input files or glob patterns, one per line ("-" for stdin). Requires --batch',
+    )
     queue.add_argument("--node", dest="node", type=int, help="Name of a specific node (ex: curie01)")
     queue.add_argument("--group", dest="group", type=str, help="User group")
     queue.add_argument(
@@ -195,7 +309,7 @@ def build_parser():
         "--queue",
         dest="queue",
         default="q02zewail",
-        help="{}\n{}".format("Sets the queue type.", HELP_QUEUES),
+        help="{}\n{}".format("Sets the queue type.", HELP_QUEUES.format(", ".join(sorted(catalogue()[1])))),
         metavar="QUEUE",
     )
     queue.add_argument(
@@ -216,6 +330,27 @@ WARNING: The consequence will be a loss of these outputs""",
     expert.add_argument(
         "--cpfrom", dest="cpfrom", nargs="+", help="Files to be copied from the local scratch (dumb copy, no check)"
     )
+    expert.add_argument(
+        "--compress",
+        dest="compress",
+        metavar="MINSIZE",
+        nargs="?",
+        const="256MB",
+        help="""\
+Write back checkpoint and read-write files larger than MINSIZE (default: 256MB)
+compressed (zstd, or gzip if not available). Compressed files are uncompressed
+when copied to the local scratch, the newest copy is used. An existing plain file
+is kept, but no longer updated.""",
+    )
+    expert.add_argument(
+        "--sync",
+        dest="sync",
+        metavar="INTERVAL",
+        type=float,
+        help="""\
+Copy modified checkpoint files back every INTERVAL seconds during the run,
+so that they survive a walltime kill.""",
+    )
     expert.add_argument(
         "--nojob", dest="nojob", action="store_true", help="Do not run job. Simply generate the input sequence."
     )
@@ -480,6 +615,80 @@ def set_gxx_env(gxxroot: str) -> typing.List[str]:
     return ["PATH", "LD_LIBRARY_PATH", "GAUSS_EXEDIR", "GAU_ARCHDIR"]
 
 
+def staged_exists(fname: str) -> bool:
+    """Checks if a file or a compressed copy of it exists."""
+    return any(os.path.exists(fname + ext) for ext in ("",) + STAGE_EXTS)
+
+
+def parse_route(route: str) -> typing.Dict[str, typing.Set[str]]:
+    """Tokenizes a route specification.
+
+    Parameters
+    ----------
+    route : str
+        Route specification, on a single line
+
+    Returns
+    -------
+    dict
+        Options of each keyword, all in lower case.
+        Method/basis and the leading "#" are kept as keywords.
+    """
+    import gau  # Route tokenizer shared with gauest.py, slow to import
+
+    return gau.routekeys(route)
+
+
+def process_route(route: str) -> typing.Tuple[bool, bool, bool, bool, bool, typing.List[typing.List[str]]]:
+    """Processes Gaussian's route specification section.
+
+    Parses a route specification and checks relevant parameters.
+
+    Parameters
+    ----------
+    route : str
+        Route specification
+
+    Returns
+    -------
+    tuple
+        The following information are returned:
+        - bool if PEmbed  will be used
+        - bool if Link717 will be used
+        - bool if Link717 option section present in input
+        - bool if Link718 will be used
+        - bool if Link718 option section present in input
+        - list of files to copy from/to the computing node
+    """
+    keywords = parse_route(route)
+    freq = set()
+    words = set(keywords)
+    usepem = False
+    for key, options in keywords.items():
+        words.update(options)
+        if key.startswith("freq"):
+            freq.update(options)
+        elif key.startswith("pembed"):
+            usepem = True
+    extra_cp = []
+    # Check if we need to copy back
+    if "geomview" in words:
+        extra_cp.append(["cpfrom", "points.off", None])
+    if words & FCHK_KEYS:
+        extra_cp.append(["cpfrom", "Test.FChk", None])
+    use718 = bool(freq & FREQ_718)
+    opt718 = "readfcht" in freq
+    if opt718:
+        if not use718:
+            s = "WARNING: It is not yet possible to run FCHT " + "calculations with ReadFCHT only"
+            print(s)
+        use718 = True
+    opt717 = bool(freq & FREQ_717)
+    use717 = opt717 or any(option.startswith("readanh") for option in freq)
+
+    return usepem, use717, opt717, use718, opt718, extra_cp
+
+
 def check_gjf(
     gjf_ref: str,
     gjf_new: str,
@@ -488,6 +697,8 @@ def check_gjf(
     file_chk: typing.Optional[typing.Union[str, bool]] = None,
     file_rwf: typing.Optional[typing.Union[str, bool]] = None,
     rootdir: typing.Optional[str] = None,
+    dat_C: typing.Optional[str] = None,
+    pem: typing.Optional[str] = None,
 ) -> typing.Tuple[int, str, typing.List[typing.List[str]]]:
     """Analyses and completes Gaussian input.
 
@@ -516,6 +727,11 @@ def check_gjf(
         If None, do not specify it in input
     rootdir : str, optional
         Root directory to look for files
+    dat_C : str, optional
+        List of processors to pin the Gaussian job to.
+        Replaces any list in reference input file.
+    pem : str, optional
+        Polarizable embedding model replacing "pempar" in input.
 
     Returns
     -------
@@ -563,6 +779,7 @@ def check_gjf(
         dat_M: typing.Optional[str] = None,
         file_chk: typing.Optional[typing.Union[str, bool]] = None,
         file_rwf: typing.Optional[typing.Union[str, bool]] = None,
+        dat_C: typing.Optional[str] = None,
     ) -> None:
         """Small function to write Link0 header.
 
@@ -576,75 +793,20 @@ def check_gjf(
             Checkpoint file to use.
         file_rwf : str or bool, optional
             Checkpoint file to use
+        dat_C : str, optional
+            List of processors.
         """
         if dat_M is not None:
             fobj.write("%Mem={}\n".format(dat_M))
         if dat_P is not None:
             fobj.write("%NProcShared={}\n".format(dat_P))
+        if dat_C is not None:
+            fobj.write("%CPU={}\n".format(dat_C))
         if file_chk is not None and file_chk:
             fobj.write("%Chk={}\n".format(file_chk))
         if file_rwf is not None and file_rwf:
             fobj.write("%Rwf={}\n".format(file_rwf))
 
-    def process_route(route: str) -> typing.Union[bool, bool, bool, bool, bool, typing.List[str]]:
-        """Processes Gaussian's route specification section.
-
-        Parses a route specification and checks relevant parameters.
-
-        Parameters
-        ----------
-        route : str
-            Route specification
-
-        Returns
-        -------
-        tuple
-            The following information are returned:
-            - bool if PEmbed  will be used
-            - bool if Link717 will be used
-            - bool if Link717 option section present in input
-            - bool if Link718 will be used
-            - bool if Link718 option section present in input
-            - list of files to copy from/to the computing node
-        """
-        fmt_frq = r"\bfreq\w*=?(?P<delim>\()?\S*{}\S*(?(delim)\))\b"
-        # ! fmt_geom = r'\bgeom\w*=?(?P<delim>\()?\S*{}\S*(?(delim)\))\b'
-        # ! key_FC = re.compile(str_FC, re.I)
-        str_FC = r"\b(fc|fcht|ht)\b"
-        key_718 = re.compile(fmt_frq.format(str_FC), re.I)
-        key_718o = re.compile(fmt_frq.format(r"\breadfcht\b"), re.I)
-        key_717 = re.compile(fmt_frq.format(r"\breadanh"), re.I)
-        key_717o = re.compile(fmt_frq.format(r"\banharm(|onic)\b"), re.I)
-        use717, use718, opt717, opt718 = False, False, False, False
-        usepem = False
-        extra_cp = []
-        # Check if we need to copy back
-        keyGeomView = re.compile(r"\bgeomview\b")
-        # Fra    #I'm adding the check for PEmbed which can call FQ
-        key_pem = re.compile(r"\bpembed", re.I)
-        if key_pem.search(route):
-            usepem = True
-        if keyGeomView.search(route):
-            extra_cp.append(["cpfrom", "points.off"])
-        key_fchk = re.compile(r"\b(FChk|FCheck|FormCheck)\b")
-        if key_fchk.search(route):
-            extra_cp.append(["cpfrom", "Test.FChk"])
-        if key_718.search(route):
-            use718 = True
-        if key_718o.search(route):
-            use718 = True
-            opt718 = True
-            if not key_718:
-                s = "WARNING: It is not yet possible to run FCHT " + "calculations with ReadFCHT only"
-                print(s)
-        if key_717.search(route):
-            use717 = True
-        if key_717o.search(route):
-            use717 = True
-            opt717 = True
-
-        return usepem, use717, opt717, use718, opt718, extra_cp
-
     nprocs = dat_P
     mem = dat_M
     ops_copy = []
@@ -673,12 +835,12 @@ def check_gjf(
     route = [""]
 
     with open(gjf_new, "w") as fobjw:
-        write_hdr(fobjw, dat_P, dat_M, file_chk, file_rwf)
+        write_hdr(fobjw, dat_P, dat_M, file_chk, file_rwf, dat_C)
         with open(gjf_ref, "r") as fobjr:
             for line in fobjr:
-                line_lo = line.strip().lower()
+                line_st = line.strip()
                 # END-OF-BLOCK
-                if not line_lo:
+                if not line_st:
                     fobjw.write(line)
                     if inroute:
                         usepem[-1], use717[-1], opt717[-1], use718[-1], opt718[-1], dat = process_route(route[-1])
@@ -686,8 +848,9 @@ def check_gjf(
                             ops_copy.extend(dat)
                         inroute = False
                     continue
+                first = line_st[0]
                 # NEW BLOCK
-                if line_lo == "--link1--":
+                if first == "-" and line_st.lower() == "--link1--":
                     fobjw.write(line)
                     newlnk = True
                     route.append("")
@@ -696,10 +859,11 @@ def check_gjf(
                     use718.append(None)
                     opt717.append(None)
                     opt718.append(None)
-                    write_hdr(fobjw, dat_P, dat_M, file_chk, file_rwf)
+                    write_hdr(fobjw, dat_P, dat_M, file_chk, file_rwf, dat_C)
                 # INSTRUCTIONS
                 else:
-                    if line_lo.startswith(r"%"):
+                    if first == "%":
+                        line_lo = line_st.lower()
                         if line_lo != "%nosave":
                             keyval = line.split("=")[1].strip()
                             # LINK0 INSTRUCTION
@@ -725,43 +889,47 @@ def check_gjf(
                                     nprocs = int(keyval)
                                 else:
                                     line = ""
-                    elif (line_lo.startswith("#") and newlnk) or inroute:
+                            elif line_lo.startswith("%cpu"):
+                                if dat_C is not None:
+                                    line = ""
+                    elif (first == "#" and newlnk) or inroute:
                         # ROUTE SECTION
                         newlnk = False
                         inroute = True
-                        route[-1] += " " + line.strip()
+                        route[-1] += " " + line_st
                     else:
                         # REST OF INPUT
                         # The input files should not contain any spaces
                         # We assume that extensions are provided
                         if use717[-1] or use718[-1]:
-                            if len(line_lo.split()) == 1 and line_lo.find(".") > 0:
-                                ext = os.path.splitext(line.strip())[1]
-                                if ext[:4] in ls_exts:
-                                    ls_files.append(line.strip())
+                            if line_st.find(".") > 0 and len(line_st.split()) == 1:
+                                ext = os.path.splitext(line_st)[1]
+                                if ext[:4].lower() in ls_exts:
+                                    ls_files.append(line_st)
                         if usepem[-1]:
+                            line_lo = line_st.lower()
                             if line_lo == "rick":
                                 line = add_fq("rick")
                             if line_lo == "ivan":
                                 line = add_fq("ivan")
                             if line_lo in ("barone", "epr", "fqc", "tommaso"):
                                 line = add_fq("epr")
-                            if opts.pem and line_lo == "pempar":
-                                line = add_fq(opts.pem)
+                            if pem and line_lo == "pempar":
+                                line = add_fq(pem)
                     fobjw.write(line)
 
     # Copy files for CHK
     if ls_chks:
         # set is there to remove duplicate files
         for oper, chk in set(ls_chks):
-            if oper in [0, 1] and os.path.exists(chk):
+            if oper in [0, 1] and staged_exists(chk):
                 ops_copy.append(["cpto", chk, rootdir])
             if oper in [0, 2]:
                 ops_copy.append(["cpfrom", chk, rootdir])
     if ls_rwfs:
         # set is there to remove duplicate files
         for rwf in set(ls_rwfs):
-            if os.path.exists(rwf):
+            if staged_exists(rwf):
                 ops_copy.append(["cpto", rwf, rootdir])
             ops_copy.append(["cpfrom", rwf, rootdir])
     if ls_files:
@@ -781,12 +949,129 @@ def check_gjf(
     return nprocs, mem, ops_copy
 
 
+# ===============================
+#   CATALOGUE-RELATED FUNCTIONS
+# ===============================
+class NodeSpec:
+    """Node family specification read from the catalogue.
+
+    Provides the data of `hpc.NodeFamily` used in this script, without
+        building the family from the INI file.
+    """
+
+    def __init__(self, data: typing.Dict[str, typing.Any]) -> None:
+        self.__dict__.update(data)
+
+    def nprocs(self, all: bool = True) -> int:
+        """Returns the number of processing units (logical ones if all)."""
+        return self.nprocs_all if all else self.nprocs_phys
+
+    def __str__(self) -> str:
+        return self.text
+
+
+def catalogue_files(inipath: str) -> typing.List[str]:
+    """Returns the possible locations of the catalogue of an INI file.
+
+    The catalogue is stored next to the INI file, or in the user cache
+        directory if the former is not writable.
+    """
+    inipath = os.path.abspath(inipath)
+    key = re.sub(r"\W", "_", inipath.strip(os.path.sep))
+    return [
+        os.path.splitext(inipath)[0] + ".catalogue.json",
+        os.path.join(CATALOGUE_CACHE, key + ".catalogue.json"),
+    ]
+
+
+def compile_catalogue(inipath: str) -> typing.Dict[str, typing.Any]:
+    """Parses the INI file and returns the catalogue.
+
+    Parameters
+    ----------
+    inipath : str
+        Path to the HPC nodes specification file
+
+    Returns
+    -------
+    dict
+        Catalogue with node families and queue-to-family map
+    """
+    nodes = hpc.parse_ini(inipath)
+    queues = hpc.list_queues_nodes(nodes)
+    families = {}
+    for name, family in nodes.items():
+        data = {attr: getattr(family, attr) for attr in CATALOGUE_ATTRS}
+        data["nprocs_all"] = family.nprocs(all=True)
+        data["nprocs_phys"] = family.nprocs(all=False)
+        data["text"] = str(family)
+        families[name] = data
+    return {"version": CATALOGUE_VERSION, "families": families, "queues": dict(queues)}
+
+
+def catalogue(
+    inipath: typing.Optional[str] = None,
+) -> typing.Tuple[typing.Dict[str, NodeSpec], typing.Dict[str, str]]:
+    """Returns the node families and the queue-to-family map.
+
+    The catalogue is read once per process, from its cache if not older
+        than the INI file, otherwise it is compiled and saved.
+
+    Parameters
+    ----------
+    inipath : str, optional
+        Path to the HPC nodes specification file (default: `HPCINIPATH`)
+
+    Returns
+    -------
+    tuple
+        Dictionary of `NodeSpec` objects and dictionary of queues
+    """
+    if inipath is None:
+        inipath = HPCINIPATH
+    if inipath in _CATALOGUE:
+        return _CATALOGUE[inipath]
+    try:
+        ini_mtime = os.stat(inipath).st_mtime_ns
+    except OSError:
+        print("ERROR: Incorrect path to HPC nodes specification files.")
+        sys.exit()
+    data = None
+    files = catalogue_files(inipath)
+    for fname in files:
+        try:
+            if os.stat(fname).st_mtime_ns < ini_mtime:
+                continue
+            with open(fname, "r") as fobj:
+                data = json.load(fobj)
+            if data.get("version") == CATALOGUE_VERSION:
+                break
+            data = None
+        except (OSError, ValueError):
+            data = None
+    if data is None:
+        data = compile_catalogue(inipath)
+        for fname in files:
+            try:
+                os.makedirs(os.path.dirname(fname), exist_ok=True)
+                tmpfile = "{}.{}.tmp".format(fname, jobPID)
+                with open(tmpfile, "w") as fobj:
+                    json.dump(data, fobj)
+                os.replace(tmpfile, fname)
+                break
+            except OSError:
+                continue
+    nodes = {name: NodeSpec(family) for name, family in data["families"].items()}
+    _CATALOGUE[inipath] = (nodes, data["queues"])
+    return _CATALOGUE[inipath]
+
+
 # ============================
 #   QUEUES-RELATED FUNCTIONS
 # ============================
 def get_queue_data(
     full_queue: str,
-) -> typing.Tuple[str, hpc.NodeFamily, int, typing.Union[str, None]]:
+) -> typing.Tuple[str, NodeSpec, int, typing.Union[str, None]]:
     """Returns the queue specification and node-specific information.
 
     Based on the full_queue specification, defines and returns:
@@ -805,7 +1090,7 @@ def get_queue_data(
     tuple
         Tuple containing the following information
         - actual queue (same as full_queue if not latter not virtual)
-        - node family specification (as a `NodeFamily` object)
+        - node family specification (as a `NodeSpec` object)
         - number of processors actually requested
         - name of a specific node
 
@@ -834,8 +1119,9 @@ def get_queue_data(
     else:
         raise ValueError("Too many section in full queue specification.")
 
+    nodes, queues = catalogue()
     try:
-        family = HPCNODES[HPCQUEUES[queue]]
+        family = nodes[queues[queue]]
     except KeyError:
         raise KeyError("Unsupported queue.")
 
@@ -887,45 +1173,72 @@ def get_queue_data(
     return (queue, family, nprocs, nodeid)
 
 
-# ================
-#   MAIN PROGRAM
-# ================
+# ================================
+#   SUBMISSION-RELATED FUNCTIONS
+# ================================
+def list_inputs(infiles: typing.List[str], manifest: typing.Optional[str] = None) -> typing.List[str]:
+    """Builds the list of input files.
 
+    Expands glob patterns given on the commandline (quoted to avoid the
+        shell limits on arguments) and in a manifest file.
 
-if __name__ == "__main__":
-    #  Option Parsing
-    # ----------------
-    parser = build_parser()
-    opts = parser.parse_args()
-    # Printing cases
-    # ^^^^^^^^^^^^^^
-    if opts.mach:
-        print(
-            """\
-List of available HPC Nodes
----------------------------
-"""
-        )
-        for family in sorted(HPCNODES):
-            print(HPCNODES[family])
-        sys.exit()
-    # Check multiple/single input file(s)
-    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
-    num_infiles = len(opts.infile)
-    # We need at least 1 input file
-    if num_infiles == 0:
-        print("ERROR: Missing Gaussian input file")
-        sys.exit()
-    multi_gjf = num_infiles > 1
-    if multi_gjf and not opts.multi:
-        opts.multi = "serial"
-    if not opts.multi:
-        opts.multi = "no"
-    # Initialization qsub arguments structure
-    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+    Parameters
+    ----------
+    infiles : list
+        Input files or glob patterns.
+    manifest : str, optional
+        File with one input file or glob pattern per line.
+        "-" reads the standard input.
+        Empty lines and lines starting with "#" are ignored.
+
+    Returns
+    -------
+    list
+        Input files, in the order given.
+    """
+    patterns = list(infiles)
+    if manifest is not None:
+        if manifest == "-":
+            lines = sys.stdin.readlines()
+        else:
+            with open(manifest, "r") as fobj:
+                lines = fobj.readlines()
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                patterns.append(line)
+    files = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                print('WARNING: No file matches "{}"'.format(pattern))
+            files.extend(matches)
+        else:
+            files.append(pattern)
+    return files
+
+
+def setup_queue(opts: argparse.Namespace) -> typing.Tuple[str, NodeSpec, int, typing.Any, str, typing.List[str]]:
+    """Checks the queue and group options.
+
+    Parameters
+    ----------
+    opts : :obj:`argparse.Namespace`
+        Commandline options
+
+    Returns
+    -------
+    tuple
+        Tuple containing the following information
+        - actual queue
+        - node family specification (as a `NodeSpec` object)
+        - number of processors requested
+        - name of a specific node
+        - Gaussian compilation architecture
+        - qsub arguments related to the queue
+    """
     qsub_args = []
-    # Queue data
-    # ^^^^^^^^^^
     try:
         qname, qnode, nprocs, nodeid = get_queue_data(opts.queue)
     except KeyError:
@@ -962,8 +1275,28 @@ List of available HPC Nodes
             if len(qnode.user_groups) > 1:
                 print('Multiple groups authorized. "{}" chosen.'.format(group))
         qsub_args.append("-W group_list={} ".format(opts.group))
-    # Definition of Gaussian executable
-    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    return qname, qnode, nprocs, nodeid, gxx_arch, qsub_args
+
+
+def setup_gaussian(opts: argparse.Namespace, gxx_arch: str) -> typing.Tuple[str, str, typing.List[str]]:
+    """Checks the Gaussian version and working trees.
+
+    Parameters
+    ----------
+    opts : :obj:`argparse.Namespace`
+        Commandline options
+    gxx_arch : str
+        Gaussian compilation architecture (see `GXX_ARCHS`)
+
+    Returns
+    -------
+    tuple
+        Tuple containing the following information
+        - Gaussian executable (g09, g16 or gdv)
+        - Gaussian root directory
+        - list of working directories
+    """
     gxxroot, gxxwork = set_gxxroot(opts.gxxver, gxx_arch)
     # Check if executable given in gxxroot instead of root directory
     if len(set(gxxroot.split(os.path.sep)[-2:])) == 1:
@@ -985,11 +1318,61 @@ List of available HPC Nodes
                 fmt = 'ERROR: working tree directory "{}" does not exits'
                 print(fmt.format(workdir))
                 sys.exit()
+
+    return gxx, gxxroot, gxx_works
+
+
+def build_job(
+    opts: argparse.Namespace,
+    infiles: typing.List[str],
+    qnode: NodeSpec,
+    nprocs: int,
+    gxx: str,
+    gxx_works: typing.List[str],
+    tag: str = jobPID,
+    resources: typing.Optional[typing.List[typing.Tuple[int, str]]] = None,
+) -> typing.Tuple[str, int, str, str, str]:
+    """Checks the input files and builds the commands of one PBS job.
+
+    Parameters
+    ----------
+    opts : :obj:`argparse.Namespace`
+        Commandline options
+    infiles : list
+        Gaussian input files run in the job
+    qnode : :obj:`NodeSpec`
+        Node family specification
+    nprocs : int
+        Number of processors available from the queue
+    gxx : str
+        Gaussian executable
+    gxx_works : list
+        Working directories
+    tag : str, optional
+        Unique tag of temporary files and directory
+    resources : list, optional
+        Number of processors and memory of each input for packed jobs
+
+    Returns
+    -------
+    tuple
+        Tuple containing the following information
+        - job name
+        - number of processors
+        - memory
+        - header of PBS script
+        - commands of PBS script
+    """
+    # Check multiple/single input file(s)
+    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+    num_infiles = len(infiles)
+    multi_gjf = num_infiles > 1
     # Definition of Gaussian input file
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     filebases = []
-    for infile in opts.infile:
-        if not os.path.exists(infile):
+    for infile in infiles:
+        # Earlier jobs moved to the directory of their input
+        if not os.path.exists(os.path.join(STARTDIR, infile)):
             fmt = 'ERROR: Cannot find Gaussian input file "{}"'
             print(fmt.format(infile))
             sys.exit()
@@ -1061,7 +1444,9 @@ List of available HPC Nodes
     # Resources definition
     # ^^^^^^^^^^^^^^^^^^^^
     # Define NProcs and Mem
-    if set(["p", "proc", "a", "all"]) & set(opts.gxxl0K):
+    if resources is not None:
+        nprocs, mem = None, None
+    elif set(["p", "proc", "a", "all"]) & set(opts.gxxl0K):
         nprocs = None
     elif multi_gjf and opts.multi == "parallel":
         nprocs = nprocs // num_infiles
@@ -1069,7 +1454,9 @@ List of available HPC Nodes
             msg = "ERROR: Too many parallel jobs for the number of " + "processing units"
             print(msg)
             sys.exit()
-    if set(["m", "mem", "a", "all"]) & set(opts.gxxl0K):
+    if resources is not None:
+        pass
+    elif set(["m", "mem", "a", "all"]) & set(opts.gxxl0K):
         mem = None
     else:
         if nprocs is None:
@@ -1092,8 +1479,13 @@ List of available HPC Nodes
     gjf_files = []
     ops_copy = []
     full_P, full_M = 0, 0
-    for index, infile in enumerate(opts.infile):
-        outfile = glog_files[index]
+    # Parallel jobs get disjoint cores, allocated on the node once topology is known
+    pin_cpus = multi_gjf and opts.multi == "parallel" and nprocs is not None and os.path.exists(CPUPIN)
+    # Right-sized resources of each input, within those of the queue
+    sizes = None
+    if opts.autosize and resources is None and nprocs is not None and mem is not None:
+        sizes = [autosize(os.path.join(STARTDIR, infile), nprocs, mem) for infile in infiles]
+    for index, infile in enumerate(infiles):
         filebase = filebases[index]
         if gchk_files:
             chkfile = gchk_files[index]
@@ -1104,14 +1496,20 @@ List of available HPC Nodes
         else:
             rwffile = grwf_files
         reldir, ginfile = os.path.split(infile)
-        rootdir = os.path.abspath(reldir)
+        rootdir = os.path.normpath(os.path.join(STARTDIR, reldir))
         # A new, temporary input is created
-        gjf_new = ".{}_{}.gjf".format(filebase, jobPID)
+        gjf_new = ".{}_{}.gjf".format(filebase, tag)
         # The script works in the directory where the input file is stored
         os.chdir(rootdir)
+        data = []
         if not opts.expert:
-            dat_P, dat_M, data = check_gjf(ginfile, gjf_new, nprocs, mem, chkfile, rwffile, rootdir)
-            if opts.multi == "parallel":
+            dat_C = CPUSLOT if pin_cpus else None
+            if resources is not None:
+                nprocs, mem = resources[index]
+            elif sizes is not None:
+                nprocs, mem = sizes[index]
+            dat_P, dat_M, data = check_gjf(ginfile, gjf_new, nprocs, mem, chkfile, rwffile, rootdir, dat_C, opts.pem)
+            if opts.multi in ("parallel", "pack"):
                 full_P += dat_P
                 full_M += hpc.convert_storage(dat_M)
             else:
@@ -1124,6 +1522,10 @@ List of available HPC Nodes
         rootdirs.append(rootdir)
         gjf_files.append(gjf_new)
     if not opts.expert:
+        if opts.multi == "pack":
+            # Packed jobs wait for free resources, the node is never overbooked
+            full_P = min(full_P, pack_capacity(qnode)[0])
+            full_M = min(full_M, pack_capacity(qnode)[1])
         if full_P > qnode.nprocs(all=USE_LOGICAL_CORE):
             print("ERROR: Too many processors required for the chosen queue")
             sys.exit()
@@ -1153,10 +1555,11 @@ WARNING: No local storage available to store working files.
         value = STARTDIR
     else:
         value = qnode.path_tmpdir.format(username=USERNAME)
-    tmpdir = os.path.join(value, "gaurun" + jobPID)
+    tmpdir = os.path.join(value, "gaurun" + tag)
     # Header
     # ^^^^^^
-    pbs_header = """
+    # Bash is required by the packing worker, the staging commands and the processor binding
+    pbs_header = """#PBS -S /bin/bash
 echo "----------------------------------------"
 echo "PBS queue:     "$PBS_O_QUEUE
 echo "PBS host:      "$PBS_O_HOST
@@ -1167,7 +1570,7 @@ echo "PBS jobname:   "$PBS_JOBNAME
 echo "PBS inputfile: {input}"
 echo "----------------------------------------"
   """.format(
-        scrdir=tmpdir, input=", ".join(opts.infile)
+        scrdir=tmpdir, input=", ".join(infiles)
     )
 
     # Shell commands
@@ -1180,17 +1583,39 @@ echo "----------------------------------------"
     for index, gjf_file in enumerate(gjf_files):
         rootdir = rootdirs[index]
         pbs_cmds += "mv {} ./\n".format(os.path.join(rootdir, gjf_file))
+    # Pin parallel jobs to disjoint NUMA-local physical cores, or leave placement to the OS
+    if pin_cpus and not opts.expert:
+        fmt = 'CPUS=$(python3 {pin} -n {njobs} -p {nproc} -i {index}) && sed -i "s/{slot}/$CPUS/" {gjf}'
+        fmt += ' || sed -i "/^%CPU={slot}/d" {gjf}\n'
+        for index, gjf_file in enumerate(gjf_files):
+            pbs_cmds += fmt.format(
+                pin=CPUPIN, njobs=num_infiles, nproc=nprocs // num_infiles, index=index, slot=CPUSLOT, gjf=gjf_file
+            )
     # Copy files listed in input file(s) or given by user if available
-    fmt = "(cp {} ./) >& /dev/null\n"
+    files = []
     for cmd, what, where in ops_copy:
         if cmd == "cpto":
             if where:
-                pbs_cmds += fmt.format(os.path.join(where, what))
+                files.append(os.path.join(where, what))
             else:
-                pbs_cmds += fmt.format(data[1])
+                files.append(what)
     if opts.cpto:
         for data in opts.cpto:
-            pbs_cmds += fmt.format(os.path.join(STARTDIR, data))
+            files.append(os.path.join(STARTDIR, data))
+    pbs_cmds += copy_cmds(files, "./")
+    # Files written by Gaussian only for some jobs may be missing
+    dests = {}
+    for cmd, what, where in ops_copy:
+        if cmd == "cpfrom":
+            dests.setdefault(where or DEFAULTDIR, []).append(what)
+    # Read-write files are rewritten all the time and are not synchronized
+    sync = opts.sync is not None and os.path.exists(STAGE)
+    if sync:
+        for where, files in dests.items():
+            files = [fname for fname in files if not fname.lower().endswith(".rwf")]
+            if files:
+                cmd = copy_cmds(files, where, optional=True, compress=opts.compress, watch=opts.sync)
+                pbs_cmds += STAGE_SYNC.format(cmd=STAGE_NICE + cmd.strip())
     # Generate Gaussian command(s)
     gxx_args = ""
     if gxx_works:
@@ -1203,31 +1628,87 @@ echo "----------------------------------------"
     fmt = "{gexe} {gargs} {gin} {gout}"
     if multi_gjf and opts.multi == "parallel":
         fmt += " &"
+    elif resources is not None:
+        pbs_cmds += PACK_WORKER.format(nprocs=nprocs, mem=hpc.convert_storage(mem) // 1024**2)
+        fmt = "launch {nproc} {mem} " + fmt
     fmt += "\n"
     for index, gjf_file in enumerate(gjf_files):
         log_file = glog_files[index]
         rootdir = rootdirs[index]
-        pbs_cmds += fmt.format(gexe=gxx, gargs=gxx_args.strip(), gin=gjf_file, gout=os.path.join(rootdir, log_file))
-    if multi_gjf and opts.multi == "parallel":
+        nproc, mem_job = resources[index] if resources is not None else (None, None)
+        pbs_cmds += fmt.format(
+            gexe=gxx,
+            gargs=gxx_args.strip(),
+            gin=gjf_file,
+            gout=os.path.join(rootdir, log_file),
+            nproc=nproc,
+            mem=hpc.convert_storage(mem_job) // 1024**2 if mem_job else 0,
+        )
+    if (multi_gjf and opts.multi == "parallel") or resources is not None:
         pbs_cmds += "wait\n"
+    if sync:
+        pbs_cmds += "[ -f .stage_sync.pid ] && {\n" + STAGE_STOP + "}\n"
     # Copy back relevant file(s)
-    fmt = "(cp {} {}) >& /dev/null\n"
-    for cmd, what, where in ops_copy:
-        if cmd == "cpfrom":
-            if where:
-                pbs_cmds += fmt.format(what, where)
-            else:
-                pbs_cmds += fmt.format(what, DEFAULTDIR)
+    for where, files in dests.items():
+        pbs_cmds += copy_cmds(files, where, optional=True, compress=opts.compress)
     if opts.cpfrom:
-        for data in opts.cpfrom:
-            pbs_cmds += fmt.format(data, STARTDIR)
+        pbs_cmds += copy_cmds(opts.cpfrom, STARTDIR)
     # TODO (ugly patch) Get any cube which may have been generated
     pbs_cmds += "(cp *.{{cub,cube,dat,out,off}} {}) >& /dev/null\n".format(STARTDIR)
+    # Record finished jobs, once results are safe: a busy store must not delay or fail the job
+    if os.path.exists(TELEMETRY) and not os.getenv("GAU_NOTELEMETRY"):
+        gjfs = [os.path.join(rootdirs[i], os.path.basename(infile)) for i, infile in enumerate(infiles)]
+        logs = [os.path.join(rootdirs[i], log) for i, log in enumerate(glog_files)]
+        fmt = "python3 {} -r --family {} {} {} || true\n"
+        pbs_cmds += fmt.format(
+            TELEMETRY, qnode.queue_name, " ".join("-i {}".format(gjf) for gjf in gjfs), " ".join(logs)
+        )
     # Cleaning
     pbs_cmds += "cd .. \nrm -rf {}\n".format(tmpdir)
 
-    #  SUBMISSION JOB
-    # ----------------
+    return qjobname, nprocs, mem, pbs_header, pbs_cmds
+
+
+def build_qsub(
+    opts: argparse.Namespace,
+    qname: str,
+    qnode: NodeSpec,
+    nodeid: typing.Any,
+    qjobname: str,
+    nprocs: int,
+    mem: str,
+    gxxroot: str,
+    qsub_args: typing.List[str],
+) -> str:
+    """Builds the qsub commandline.
+
+    Parameters
+    ----------
+    opts : :obj:`argparse.Namespace`
+        Commandline options
+    qname : str
+        Actual queue
+    qnode : :obj:`NodeSpec`
+        Node family specification
+    nodeid : str
+        Name of a specific node
+    qjobname : str
+        Job name
+    nprocs : int
+        Number of processors
+    mem : str
+        Memory
+    gxxroot : str
+        Gaussian root directory
+    qsub_args : list
+        qsub arguments already defined
+
+    Returns
+    -------
+    str
+        qsub commandline reading the script from standard input
+    """
+    qsub_args = list(qsub_args)
     ls_env = []
     qsub_cmd = "qsub "  # QSub is used to send the job
     # Prevent automatic rerun of the job if it fails due to some internal PBS
@@ -1269,16 +1750,478 @@ echo "----------------------------------------"
     # Build full commandline
     qsub_cmd += " ".join(qsub_args) + " - "
 
+    return qsub_cmd
+
+
+def autosize(infile: str, nprocs: int, mem: str) -> typing.Tuple[int, str]:
+    """Estimates processors and memory of an input.
+
+    Parameters
+    ----------
+    infile : str
+        Gaussian input file
+    nprocs : int
+        Maximum number of processors
+    mem : str
+        Maximum memory
+
+    Returns
+    -------
+    tuple
+        Number of processors and memory
+    """
+    # Resource estimator shipped with this script, slow to import and only needed by --autosize
+    try:
+        import gauest
+    except ImportError:
+        print("ERROR: Resource estimator gauest.py not available")
+        sys.exit()
+    est = gauest.estimate(infile, nprocs, hpc.convert_storage(mem))
+    value = hpc.bytes_units(est["mem"], 0, False, "g")
+    if value.startswith("0"):
+        value = hpc.bytes_units(est["mem"], 0, False, "m")
+    return est["nproc"], value
+
+
+def watch_job(opts: argparse.Namespace, jobid: str, jobname: str):
+    """Registers a submitted job with the job watcher.
+
+    Parameters
+    ----------
+    opts : :obj:`argparse.Namespace`
+        Commandline options
+    jobid : str
+        Job identifier returned by qsub
+    jobname : str
+        Name of the job
+    """
+    if not opts.watch or not jobid:
+        return
+    import jobwatch  # Job watcher shipped with this script, only needed by --watch
+
+    try:
+        jobwatch.register(jobid, name=jobname, to=[opts.mailto] if opts.mailto else None)
+    except OSError as err:
+        print("WARNING: Job {} not registered with the watcher: {}".format(jobid, err))
+
+
+def pack_capacity(qnode: NodeSpec) -> typing.Tuple[int, int]:
+    """Returns the processors and memory (in bytes) usable on one node."""
+    nprocs = qnode.nprocs(all=USE_LOGICAL_CORE)
+    if qnode.cpu_limits["hard"] is not None:
+        nprocs = min(nprocs, qnode.cpu_limits["hard"])
+    mem = qnode.size_mem
+    if qnode.mem_limits["hard"] is not None:
+        mem = min(mem, qnode.mem_limits["hard"])
+    return nprocs, int(mem * MEM_OCCUPATION)
+
+
+def read_link0(gjf: str) -> typing.Tuple[typing.Optional[int], typing.Optional[str]]:
+    """Returns the largest %NProcShared and %Mem over the Link1 blocks of an input.
+
+    None is returned for a directive never given.
+    """
+    nprocs, mem = None, None
+    with open(gjf, "r") as fobj:
+        for line in fobj:
+            if not line.startswith("%"):
+                continue
+            key, _, val = line[1:].partition("=")
+            key = key.strip().lower()
+            val = val.split("!")[0].strip()
+            if key in ("nprocshared", "nproc"):
+                try:
+                    nprocs = max(nprocs or 0, int(val))
+                except ValueError:
+                    print("ERROR: Invalid number of processors in {}: %{}={}".format(gjf, key, val))
+                    sys.exit()
+            elif key == "mem":
+                if mem is None or hpc.convert_storage(val) > hpc.convert_storage(mem):
+                    mem = val
+    return nprocs, mem
+
+
+def pack_inputs(
+    resources: typing.List[typing.Tuple[int, str]],
+    capacity: typing.Tuple[int, int],
+    nnodes: typing.Optional[int] = None,
+) -> typing.List[typing.List[int]]:
+    """Distributes jobs on nodes.
+
+    Without a number of nodes, jobs are packed first-fit decreasing so
+        that all jobs of a node run at the same time on as few nodes as
+        possible.
+    Otherwise, each job goes to the least loaded of the nnodes nodes
+        (largest first) and waits on the node for free resources.
+
+    Parameters
+    ----------
+    resources : list
+        Number of processors and memory of each job
+    capacity : tuple
+        Number of processors and memory (in bytes) of one node
+    nnodes : int, optional
+        Number of nodes
+
+    Returns
+    -------
+    list
+        Indexes of jobs on each node, largest jobs first
+    """
+    cap_P, cap_M = capacity
+    needs = [(nproc, hpc.convert_storage(mem)) for nproc, mem in resources]
+    order = sorted(range(len(needs)), key=lambda i: (needs[i][0] / cap_P + needs[i][1] / cap_M), reverse=True)
+    bins, loads = [], []
+    for index in order:
+        nproc, mem = needs[index]
+        if nnodes is None:
+            for ibin, (load_P, load_M) in enumerate(loads):
+                if load_P + nproc <= cap_P and load_M + mem <= cap_M:
+                    break
+            else:
+                ibin = len(bins)
+        elif len(bins) < nnodes:
+            ibin = len(bins)
+        else:
+            ibin = min(range(len(bins)), key=lambda i: loads[i][0] / cap_P + loads[i][1] / cap_M)
+        if ibin == len(bins):
+            bins.append([])
+            loads.append((0, 0))
+        bins[ibin].append(index)
+        loads[ibin] = (loads[ibin][0] + nproc, loads[ibin][1] + mem)
+    return bins
+
+
+def copy_cmds(
+    files: typing.List[str],
+    dest: str,
+    optional: bool = False,
+    compress: typing.Optional[str] = None,
+    watch: typing.Optional[float] = None,
+) -> str:
+    """Builds the shell commands copying files to a directory.
+
+    Files are copied concurrently by `STAGE`, which skips unchanged
+        files, verifies the copies and reports throughput and failures
+        in the job output.
+    Without `STAGE`, each file is copied by `cp`.
+
+    Parameters
+    ----------
+    files : list
+        Files to copy
+    dest : str
+        Destination directory
+    optional : bool, optional
+        Missing files are not reported as failures
+    compress : str, optional
+        Minimum size of files copied compressed
+    watch : float, optional
+        Copy modified files every `watch` seconds until terminated
+        (`STAGE` only)
+
+    Returns
+    -------
+    str
+        Shell commands
+    """
+    if not files:
+        return ""
+    if os.path.exists(STAGE):
+        opts = " --optional" if optional else ""
+        if compress is not None:
+            opts += " --compress {}".format(compress)
+        if watch is not None:
+            opts += " --watch {:g}".format(watch)
+            if compress is not None:
+                opts += " --threads 1"
+        return "python3 {} -d {}{} {}\n".format(STAGE, dest, opts, " ".join(files))
+    return "".join("(cp {} {}) >& /dev/null\n".format(fname, dest) for fname in files)
+
+
+def pbs_script(pbs_header: str, pbs_cmds: str) -> str:
+    """Returns the PBS script, which also echoes the list of commands."""
+    pbs_header += 'echo "\n   === LIST OF COMMANDS ===\n"\necho "' + pbs_cmds.replace("\n", '"\necho "') + '"\n'
+    return pbs_header + pbs_cmds
+
+
+def submit(qsub_cmd: str, script: str) -> str:
+    """Submits a script through qsub and returns the job identifier.
+
+    The commandline is split and run without a shell.
+    """
+    process = Popen(args=shlex.split(qsub_cmd), stdin=PIPE, stdout=PIPE)
+    output, _ = process.communicate(script.encode())
+    return output.decode().strip()
+
+
+def submit_batch(
+    opts: argparse.Namespace,
+    infiles: typing.List[str],
+    qspec: typing.Tuple[str, NodeSpec, int, typing.Any, str, typing.List[str]],
+    gspec: typing.Tuple[str, str, typing.List[str]],
+) -> None:
+    """Validates many inputs in one go and submits each as a separate job.
+
+    All inputs are checked before anything is submitted.
+    With "array", a single PBS job array runs one generated script per
+        index. With "serial", the scripts are streamed to qsub one after
+        the other from this process, sharing the queue and Gaussian setup.
+
+    Parameters
+    ----------
+    opts : :obj:`argparse.Namespace`
+        Commandline options
+    infiles : list
+        Gaussian input files
+    qspec : tuple
+        Queue data as returned by `setup_queue`
+    gspec : tuple
+        Gaussian data as returned by `setup_gaussian`
+    """
+    qname, qnode, nprocs, nodeid, _, qsub_args = qspec
+    gxx, gxxroot, gxx_works = gspec
+    # Validation of all inputs
+    # ^^^^^^^^^^^^^^^^^^^^^^^^
+    time0 = time.perf_counter()
+    jobs = []
+    failed = []
+    for index, infile in enumerate(infiles):
+        try:
+            jobs.append(build_job(opts, [infile], qnode, nprocs, gxx, gxx_works, "{}_{}".format(jobPID, index)))
+        except SystemExit:
+            failed.append(infile)
+    time1 = time.perf_counter()
+    fmt = "Validated {} inputs in {:.2f} s ({:.1f} inputs/s)"
+    print(fmt.format(len(infiles), time1 - time0, len(infiles) / max(time1 - time0, 1e-9)))
+    if failed:
+        print("ERROR: Invalid input files, nothing submitted:")
+        for infile in failed:
+            print("  {}".format(infile))
+        # Remove the temporary inputs already generated
+        for rootdir in set(os.path.dirname(os.path.join(STARTDIR, infile)) for infile in infiles):
+            for gjf_new in glob.glob(os.path.join(rootdir, ".*_{}_*.gjf".format(jobPID))):
+                os.remove(gjf_new)
+        sys.exit()
+    # Submission
+    # ^^^^^^^^^^
+    if opts.batch == "array" and len(jobs) > 1:
+        # Same resources for all subjobs: the largest request
+        nprocs_max = max(job[1] for job in jobs)
+        mem_max = max((job[2] for job in jobs), key=hpc.convert_storage)
+        qjobname = opts.job or "batch-job"
+        qsub_cmd = build_qsub(opts, qname, qnode, nodeid, qjobname, nprocs_max, mem_max, gxxroot, qsub_args)
+        # PBS only accepts rerunnable job arrays
+        qsub_cmd = qsub_cmd.replace("qsub -r n ", "qsub -r y -J 0-{} ".format(len(jobs) - 1), 1)
+        batchdir = os.path.join(STARTDIR, ".gxxbatch_{}".format(jobPID))
+        # The last subjob to end removes the scripts
+        script = BATCH_ARRAY.format(batchdir=batchdir, njobs=len(jobs))
+        if opts.prtinfo:
+            print(qsub_cmd)
+            print(script)
+        if not opts.nojob:
+            os.chdir(STARTDIR)
+            os.makedirs(batchdir, exist_ok=True)
+            for index, (_, _, _, pbs_header, pbs_cmds) in enumerate(jobs):
+                with open(os.path.join(batchdir, "job_{}.sh".format(index)), "w") as fobj:
+                    fobj.write(pbs_script(pbs_header, pbs_cmds))
+            time0 = time.perf_counter()
+            fmt = 'QSub submission job array: "{}" ({} subjobs, scripts in {})'
+            jobid = submit(qsub_cmd, script)
+            print(fmt.format(jobid, len(jobs), batchdir))
+            watch_job(opts, jobid, qjobname)
+            time1 = time.perf_counter()
+    else:
+        time0 = time.perf_counter()
+        for infile, (qjobname, nprocs_job, mem_job, pbs_header, pbs_cmds) in zip(infiles, jobs):
+            # Submitted from the directory of the input, as for a single job
+            os.chdir(os.path.dirname(os.path.join(STARTDIR, infile)) or STARTDIR)
+            qsub_cmd = build_qsub(opts, qname, qnode, nodeid, qjobname, nprocs_job, mem_job, gxxroot, qsub_args)
+            if opts.prtinfo:
+                print(qsub_cmd)
+                print(pbs_header)
+                print(pbs_cmds)
+            if not opts.nojob:
+                fmt = 'QSub submission job: "{}"'
+                jobid = submit(qsub_cmd, pbs_script(pbs_header, pbs_cmds))
+                print(fmt.format(jobid))
+                watch_job(opts, jobid, qjobname)
+        time1 = time.perf_counter()
+    if not opts.nojob:
+        fmt = "Submitted {} jobs in {:.2f} s ({:.1f} jobs/s)"
+        print(fmt.format(len(jobs), time1 - time0, len(jobs) / max(time1 - time0, 1e-9)))
+
+
+def submit_pack(
+    opts: argparse.Namespace,
+    infiles: typing.List[str],
+    qspec: typing.Tuple[str, NodeSpec, int, typing.Any, str, typing.List[str]],
+    gspec: typing.Tuple[str, str, typing.List[str]],
+) -> None:
+    """Packs inputs on whole nodes and submits one job per node.
+
+    Each input keeps its %NProcShared and %Mem. Missing values default
+        to 1 processor and to the share of the node memory of its
+        processors.
+
+    Parameters
+    ----------
+    opts : :obj:`argparse.Namespace`
+        Commandline options
+    infiles : list
+        Gaussian input files
+    qspec : tuple
+        Queue data as returned by `setup_queue`
+    gspec : tuple
+        Gaussian data as returned by `setup_gaussian`
+    """
+    qname, qnode, _, nodeid, _, qsub_args = qspec
+    gxx, gxxroot, gxx_works = gspec
+    cap_P, cap_M = pack_capacity(qnode)
+    resources = []
+    for infile in infiles:
+        path = os.path.join(STARTDIR, infile)
+        if not os.path.exists(path):
+            fmt = 'ERROR: Cannot find Gaussian input file "{}"'
+            print(fmt.format(infile))
+            sys.exit()
+        nproc, mem = read_link0(path)
+        if opts.autosize and (nproc is None or mem is None):
+            est_P, est_M = autosize(path, cap_P, hpc.bytes_units(cap_M, 0, False, "m"))
+            nproc = nproc or est_P
+            mem = mem or est_M
+        nproc = nproc or 1
+        if mem is None:
+            mem = hpc.bytes_units(cap_M * nproc // cap_P, 0, False, "m")
+        if nproc > cap_P or hpc.convert_storage(mem) > cap_M:
+            fmt = 'ERROR: "{}" needs {} processors and {} of memory, more than one node'
+            print(fmt.format(infile, nproc, mem))
+            sys.exit()
+        resources.append((nproc, mem))
+    bins = pack_inputs(resources, (cap_P, cap_M), opts.nnodes)
+    print("Packing {} jobs on {} nodes".format(len(infiles), len(bins)))
+    # All nodes are built before anything is submitted
+    jobs = []
+    try:
+        for ibin, indexes in enumerate(bins):
+            job = build_job(
+                opts,
+                [infiles[i] for i in indexes],
+                qnode,
+                cap_P,
+                gxx,
+                gxx_works,
+                "{}_{}".format(jobPID, ibin),
+                [resources[i] for i in indexes],
+            )
+            # Submitted from where build_job left, as for a single job
+            jobs.append((os.getcwd(), job))
+    except SystemExit:
+        print("ERROR: Invalid input files, nothing submitted")
+        # Remove the temporary inputs already generated
+        for rootdir in set(os.path.dirname(os.path.join(STARTDIR, infile)) for infile in infiles):
+            for gjf_new in glob.glob(os.path.join(rootdir, ".*_{}_*.gjf".format(jobPID))):
+                os.remove(gjf_new)
+        sys.exit()
+    for workdir, (qjobname, nprocs, mem, pbs_header, pbs_cmds) in jobs:
+        os.chdir(workdir)
+        qsub_cmd = build_qsub(opts, qname, qnode, nodeid, qjobname, nprocs, mem, gxxroot, qsub_args)
+        if opts.prtinfo:
+            print(qsub_cmd)
+            print(pbs_header)
+            print(pbs_cmds)
+        if not opts.nojob:
+            fmt = 'QSub submission job: "{}"'
+            jobid = submit(qsub_cmd, pbs_script(pbs_header, pbs_cmds))
+            print(fmt.format(jobid))
+            watch_job(opts, jobid, qjobname)
+
+
+# ================
+#   MAIN PROGRAM
+# ================
+def main() -> None:
+    """Main program."""
+    #  Option Parsing
+    # ----------------
+    parser = build_parser()
+    opts = parser.parse_args()
+    # Printing cases
+    # ^^^^^^^^^^^^^^
+    if opts.mach:
+        print(
+            """\
+List of available HPC Nodes
+---------------------------
+"""
+        )
+        nodes, _ = catalogue()
+        for family in sorted(nodes):
+            print(nodes[family])
+        sys.exit()
+    # Check multiple/single input file(s)
+    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+    if opts.batch:
+        infiles = list_inputs(opts.infile, opts.manifest)
+    elif opts.manifest:
+        print("ERROR: Manifest only supported in batch mode")
+        sys.exit()
+    else:
+        infiles = opts.infile
+    num_infiles = len(infiles)
+    # We need at least 1 input file
+    if num_infiles == 0:
+        print("ERROR: Missing Gaussian input file")
+        sys.exit()
+    multi_gjf = num_infiles > 1
+    if opts.watch and opts.mail:
+        print("ERROR: Choose between PBS emails and the job watcher")
+        sys.exit()
+    if opts.watch and importlib.util.find_spec("jobwatch") is None:
+        print("ERROR: Job watcher jobwatch.py not available")
+        sys.exit()
+    if opts.multi == "pack" and (opts.batch or opts.expert):
+        print("ERROR: Packing jobs is not compatible with batch or expert mode")
+        sys.exit()
+    if opts.batch:
+        opts.multi = "no"
+    elif multi_gjf and not opts.multi:
+        opts.multi = "serial"
+    if not opts.multi:
+        opts.multi = "no"
+    # Queue data
+    # ^^^^^^^^^^
+    qspec = setup_queue(opts)
+    qname, qnode, nprocs, nodeid, gxx_arch, qsub_args = qspec
+    # Definition of Gaussian executable
+    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+    gspec = setup_gaussian(opts, gxx_arch)
+    gxx, gxxroot, gxx_works = gspec
+    if opts.batch:
+        submit_batch(opts, infiles, qspec, gspec)
+        return
+    if opts.multi == "pack":
+        submit_pack(opts, infiles, qspec, gspec)
+        return
+
+    qjobname, nprocs, mem, pbs_header, pbs_cmds = build_job(opts, infiles, qnode, nprocs, gxx, gxx_works)
+
+    #  SUBMISSION JOB
+    # ----------------
+    qsub_cmd = build_qsub(opts, qname, qnode, nodeid, qjobname, nprocs, mem, gxxroot, qsub_args)
+
     if opts.prtinfo:
         print(qsub_cmd)
         print(pbs_header)
         print(pbs_cmds)
     if not opts.nojob:
-        pbs_header += 'echo "\n   === LIST OF COMMANDS ===\n"\necho "' + pbs_cmds.replace("\n", '"\necho "') + '"\n'
-        process = Popen(args=qsub_cmd, shell=True, stdin=PIPE, stdout=PIPE)
-        result = (pbs_header + pbs_cmds).encode()
-        output, _ = process.communicate(result)
         fmt = 'QSub submission job: "{}"'
-        print(fmt.format(output.decode().strip()))
+        jobid = submit(qsub_cmd, pbs_script(pbs_header, pbs_cmds))
+        print(fmt.format(jobid))
+        watch_job(opts, jobid, qjobname)
+
+
+if __name__ == "__main__":
+    main()
 
 # vim: ft=python foldmethod=indent
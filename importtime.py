@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+#
+# Check that importing the job scripts stays fast and free of side effects
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import argparse  # commandline argument parsers
+import subprocess  # Each import in a fresh interpreter
+from feutils import errore, wide_help  # My generic functions
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+
+# ==========
+#  DEFAULTS
+# ==========
+MODULES = ("feutils", "gau", "ams", "submit")
+# Milliseconds allowed for each import, about as long as importing numpy alone
+BUDGET = 100.0
+REPEAT = 5
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+def importtime(module: str) -> float:
+    """Milliseconds taken by importing module in a fresh interpreter, as reported by -X importtime"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if process.returncode != 0:
+        errore(f"Cannot import {module}: {process.stderr.strip().splitlines()[-1]}")
+    # Last line is the module itself, cumulative time in microseconds
+    for line in reversed(process.stderr.splitlines()):
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    errore(f"No import time reported for {module}")
+
+
+# =================
+#  PARSING OPTIONS
+# =================
+def parseopt(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(
+        prog=PROGNAME,
+        formatter_class=wide_help(argparse.HelpFormatter, w=140, h=40),
+        description="Check the import time of modules against a budget, exit with 1 if any is over",
+    )
+    parser.add_argument("modules", nargs="*", metavar="MODULE", default=MODULES, help=f"Modules (default: {MODULES})")
+    parser.add_argument(
+        "-b", "--budget", metavar="MS", dest="budget", type=float, default=BUDGET, help="Milliseconds per import"
+    )
+    parser.add_argument("-r", "--repeat", metavar="N", dest="repeat", type=int, default=REPEAT, help="Best of N runs")
+    opts = parser.parse_args(args)
+    if opts.budget <= 0:
+        errore("Budget must be positive")
+    return opts
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main(args=None):
+    opts = parseopt(args)
+    over = []
+    print(f"{'Module':<12} {'Import/ms':>10}")
+    for module in opts.modules:
+        elapsed = min(importtime(module) for _ in range(max(opts.repeat, 1)))
+        print(f"{module:<12} {elapsed:>10.1f}")
+        if elapsed > opts.budget:
+            over.append(module)
+    if over:
+        print(f"ERROR: over {opts.budget:g} ms: {', '.join(over)}")
+    sys.exit(1 if over else 0)
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()
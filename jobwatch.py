@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+
+#
+# Watch submitted jobs and mail digests of the finished ones over a single SMTP connection
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import re  # Regex
+import argparse  # commandline argument parsers
+import asyncio  # Concurrent polling, mailing and SMTP stand-in
+import contextlib  # Lock of the job list
+import fcntl  # File locks
+import json  # Job list format
+import shutil  # To find the scheduler
+import signal  # To stop watching
+import socket  # Just to get hostname
+import tempfile  # To rewrite the job list atomically
+import time  # Dates of events
+import mail  # Message building and SMTP connection
+from feutils import errore, wide_help  # My generic functions
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+HOME = os.getenv("HOME")
+USER = os.getenv("USER", "unknown")
+
+# ==========
+#  DEFAULTS
+# ==========
+DATADIR = os.getenv("XDG_DATA_HOME") or os.path.join(HOME, ".local", "share")
+JOBSFILE = os.getenv("JOBWATCH_FILE") or os.path.join(DATADIR, "jobwatch", "jobs.jsonl")
+# Seconds between polls
+INTERVAL = 60
+# Seconds a finished job waits for others to share its digest
+DIGEST = 300
+# Job identifiers per qstat/squeue call
+BATCH = 200
+# Bytes read from the end of output files
+TAILBYTES = 8192
+# Last lines of finished Gaussian and AMS outputs, Gaussian timings may follow
+RETERM = re.compile(rb"(Normal|Error) termination|NORMAL TERMINATION|ERROR DETECTED")
+RETIMING = re.compile(rb"^\s*(Job cpu time|Elapsed time|File lengths)")
+REUNKNOWN = re.compile(r"Unknown Job Id (\S+)")
+PBSDONE = {"F": "finished", "X": "finished", "C": "finished"}
+SLURMDONE = {"COMPLETED", "FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY", "NODE_FAIL", "PREEMPTED", "BOOT_FAIL"}
+# States of jobs ending as expected
+DONEWELL = ("finished", "normal", "completed")
+SINKPORT = 8025
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+def shortid(jobid: str) -> str:
+    """Job number without server name, as schedulers print it in different forms"""
+    return jobid.split(".", 1)[0]
+
+
+def jobkey(job: dict) -> str:
+    """Identifier of a watched job"""
+    return job["id"] or os.path.abspath(job["out"])
+
+
+@contextlib.contextmanager
+def lockjobs(path: str = JOBSFILE):
+    """Exclusive lock of the job list, shared by submission scripts and the watcher"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def readjobs(path: str = JOBSFILE) -> list:
+    """Watched jobs, skipping damaged lines"""
+    jobs = []
+    try:
+        with open(path, "r") as fil:
+            for line in fil:
+                try:
+                    jobs.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return jobs
+
+
+def register(jobid=None, out=None, name=None, to=None, path: str = JOBSFILE) -> dict:
+    """Add a job to the watched ones, polled by scheduler identifier or by the end of its output"""
+    if not jobid and not out:
+        raise ValueError("Job identifier or output file needed")
+    job = {
+        "id": jobid or None,
+        "out": os.path.abspath(out) if out else None,
+        "name": name or (os.path.basename(out) if out else jobid),
+        "to": list(to) if to else None,
+        "host": socket.gethostname(),
+        "submitted": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with lockjobs(path):
+        with open(path, "a") as fil:
+            fil.write(json.dumps(job) + "\n")
+    return job
+
+
+def dropjobs(keys, path: str = JOBSFILE):
+    """Stop watching jobs, keeping those registered meanwhile"""
+    keys = set(keys)
+    if not keys:
+        return
+    with lockjobs(path):
+        jobs = [job for job in readjobs(path) if jobkey(job) not in keys]
+        tmpfil = tempfile.NamedTemporaryFile(mode="w", dir=os.path.dirname(os.path.abspath(path)), delete=False)
+        with tmpfil as fil:
+            fil.writelines(json.dumps(job) + "\n" for job in jobs)
+        os.replace(tmpfil.name, path)
+
+
+def scheduler() -> str:
+    """Batch system available on this machine"""
+    if shutil.which("qstat"):
+        return "pbs"
+    if shutil.which("squeue"):
+        return "slurm"
+    return None
+
+
+def hostport(text: str, default: int) -> tuple:
+    """Host and port from [HOST:]PORT"""
+    host, sep, port = text.rpartition(":")
+    try:
+        return host or "localhost", int(port) if port else default
+    except ValueError:
+        errore(f"Invalid address {text}")
+
+
+def parsepbs(text: str) -> dict:
+    """State and exit status of each job in qstat -f output"""
+    jobs, current = {}, None
+    for line in text.splitlines():
+        if line.startswith("Job Id:"):
+            current = shortid(line.split(":", 1)[1].strip())
+            jobs[current] = {"state": None, "exit": None}
+        elif current is not None and " = " in line:
+            key, _, value = line.strip().partition(" = ")
+            if key == "job_state":
+                jobs[current]["state"] = value.strip()
+            elif key == "Exit_status":
+                jobs[current]["exit"] = int(value) if value.strip().lstrip("-").isdigit() else None
+    return jobs
+
+
+def tailstate(path: str, last=None, quiet: float = INTERVAL) -> tuple:
+    """Termination ending an output file that stopped growing, or None if still running, and file size"""
+    try:
+        with open(path, "rb") as fil:
+            size = os.fstat(fil.fileno()).st_size
+            age = time.time() - os.fstat(fil.fileno()).st_mtime
+            fil.seek(max(size - TAILBYTES, 0))
+            tail = fil.read()
+    except OSError:
+        return None, None
+    # Gaussian prints a termination after every Link1 step, only the last line counts
+    lines = [line for line in tail.splitlines() if line.strip() and not RETIMING.match(line)]
+    match = RETERM.search(lines[-1]) if lines else None
+    if match is None or (size != last and age < quiet):
+        return None, size
+    return ("error" if match.group(0).lower().startswith(b"error") else "normal"), size
+
+
+def digest(events: list) -> tuple:
+    """Subject and body of the notification of finished jobs"""
+    host = socket.gethostname()
+    if len(events) == 1:
+        subject = f"Job {events[0]['name']} {events[0]['state']} on {host}"
+    else:
+        failed = sum(1 for event in events if event["state"] not in DONEWELL or event["exit"] not in (None, 0))
+        subject = f"{len(events)} jobs ended on {host}" + (f", {failed} not normally" if failed else "")
+    width = max(len(str(event["name"])) for event in events)
+    lines = [f"{'Job':<{width}}  {'State':<10} {'Exit':>5}  {'Ended':<19}  Identifier"]
+    for event in events:
+        code = "-" if event["exit"] is None else event["exit"]
+        line = f"{str(event['name']):<{width}}  {event['state']:<10} {code:>5}  {event['ended']:<19}"
+        lines.append(f"{line}  {event['id'] or event['out']}")
+    return subject, "\n".join(lines) + "\n"
+
+
+# =================
+#  PARSING OPTIONS
+# =================
+def parseopt(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(
+        prog=PROGNAME,
+        formatter_class=wide_help(argparse.HelpFormatter, w=140, h=40),
+        description="Watch submitted jobs and mail digests of the finished ones",
+    )
+    parser.add_argument("jobs", nargs="*", metavar="JOBID", help="Scheduler identifiers of jobs to register")
+    parser.add_argument("--jobfile", metavar="FILE", dest="jobfile", default=JOBSFILE, help=f"Default: {JOBSFILE}")
+    add = parser.add_argument_group("registration")
+    add.add_argument("-a", "--add", dest="add", action="store_true", help="Register JOBIDs and/or output file")
+    add.add_argument("-o", "--out", metavar="FILE", dest="out", default=None, help="Output file, tailed without JOBID")
+    add.add_argument("-n", "--name", metavar="NAME", dest="name", default=None, help="Job name in notifications")
+    add.add_argument("--to", metavar="ADDR", dest="to", action="append", help="Recipient (default: yourself)")
+    add.add_argument("-l", "--list", dest="list", action="store_true", help="List watched jobs")
+    watch = parser.add_argument_group("watching")
+    watch.add_argument(
+        "-i", "--interval", metavar="SEC", dest="interval", type=float, default=INTERVAL, help="Seconds between polls"
+    )
+    watch.add_argument(
+        "-d", "--digest", metavar="SEC", dest="digest", type=float, default=DIGEST, help="Seconds to gather events"
+    )
+    watch.add_argument("--once", dest="once", action="store_true", help="Poll once, mail and exit")
+    watch.add_argument("--smtp", metavar="HOST:PORT", dest="smtp", default=None, help="Plain SMTP stand-in server")
+    watch.add_argument("--dry", dest="dry", action="store_true", help="Print notifications instead of mailing")
+    watch.add_argument("--nodrain", dest="nodrain", action="store_true", help="Do not send messages queued by mail.py")
+    sink = parser.add_argument_group("SMTP stand-in")
+    sink.add_argument(
+        "--sink", metavar="[HOST:]PORT", dest="sink", nargs="?", const=str(SINKPORT), default=None, help="Run it"
+    )
+    sink.add_argument("--sinkdir", metavar="DIR", dest="sinkdir", default=None, help="Store messages (default: print)")
+    opts = parser.parse_args(args)
+    if opts.add and not opts.jobs and not opts.out:
+        errore("No job to register")
+    if opts.interval <= 0:
+        errore("Interval must be positive")
+    return opts
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+async def command(*argv) -> tuple:
+    """Exit status, output and error of a command"""
+    process = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    out, err = await process.communicate()
+    return process.returncode, out.decode(errors="replace"), err.decode(errors="replace")
+
+
+async def pollpbs(ids: list) -> dict:
+    """Finished jobs among ids, polled with one qstat call"""
+    _, out, err = await command("qstat", "-x", "-f", *ids)
+    states = parsepbs(out)
+    # Purged from the history, other jobs missing from the output are polled again
+    unknown = {shortid(jobid) for jobid in REUNKNOWN.findall(err)}
+    ended = {}
+    for jobid in ids:
+        found = states.get(shortid(jobid))
+        if found is not None and found["state"] in PBSDONE:
+            ended[jobid] = (PBSDONE[found["state"]], found["exit"])
+        elif found is None and shortid(jobid) in unknown:
+            ended[jobid] = ("gone", None)
+    return ended
+
+
+async def pollslurm(ids: list) -> dict:
+    """Finished jobs among ids, polled with one squeue call"""
+    status, out, err = await command("squeue", "-h", "-t", "all", "-o", "%i %T", "-j", ",".join(ids))
+    if status != 0 and "Invalid job id" not in err:
+        return {}
+    states = dict(line.split(None, 1) for line in out.splitlines() if len(line.split()) == 2)
+    ended = {}
+    for jobid in ids:
+        state = states.get(shortid(jobid))
+        if state is None:
+            ended[jobid] = ("gone", None)
+        elif state in SLURMDONE:
+            ended[jobid] = (state.lower(), None)
+    return ended
+
+
+async def polltail(outs: list, sizes: dict, quiet: float = INTERVAL) -> dict:
+    """Finished jobs among output files, sizes of the previous poll are updated"""
+    found = await asyncio.gather(*(asyncio.to_thread(tailstate, out, sizes.get(out), quiet) for out in outs))
+    ended = {}
+    for out, (state, size) in zip(outs, found):
+        sizes[out] = size
+        if state is not None:
+            ended[out] = (state, None)
+            del sizes[out]
+    return ended
+
+
+async def pollall(jobs: list, batchsys: str, sizes: dict, quiet: float = INTERVAL) -> list:
+    """Events of the finished jobs, polling schedulers in batches and outputs concurrently"""
+    ids = [job["id"] for job in jobs if job["id"]]
+    outs = [job["out"] for job in jobs if not job["id"]]
+    polls = [polltail(outs, sizes, quiet)]
+    if ids and batchsys is not None:
+        poll = pollpbs if batchsys == "pbs" else pollslurm
+        polls.extend(poll(ids[start : start + BATCH]) for start in range(0, len(ids), BATCH))
+    ended = {}
+    for result in await asyncio.gather(*polls, return_exceptions=True):
+        if isinstance(result, BaseException):
+            print(f"WARNING: Poll failed: {result}")
+        else:
+            ended.update(result)
+    events = []
+    for job in jobs:
+        key = job["id"] or job["out"]
+        if key in ended:
+            state, code = ended[key]
+            event = dict(job, state=state, exit=code, ended=time.strftime("%Y-%m-%d %H:%M:%S"))
+            events.append(event)
+    return events
+
+
+async def poller(opts, queue: asyncio.Queue, stop: asyncio.Event, mailer: mail.Sender):
+    """Put finished jobs in queue until stopped, then None, and send queued messages"""
+    batchsys = scheduler()
+    # Output sizes, a file still growing is not finished
+    sizes = {}
+    while not stop.is_set():
+        jobs = readjobs(opts.jobfile)
+        if jobs:
+            events = await pollall(jobs, batchsys, sizes, opts.interval)
+            for event in events:
+                await queue.put((time.monotonic(), event))
+            dropjobs((jobkey(event) for event in events), opts.jobfile)
+        # Messages queued by jobs, e.g. ams.py, share the connection
+        if not opts.dry and not opts.nodrain:
+            try:
+                await asyncio.to_thread(mail.drain, mailer, block=False)
+            except OSError as err:
+                print(f"WARNING: Queued messages not sent: {err}")
+        if opts.once:
+            break
+        try:
+            await asyncio.wait_for(stop.wait(), opts.interval)
+        except asyncio.TimeoutError:
+            pass
+    # Tells the notifier to send what is left
+    await queue.put(None)
+
+
+async def notify(opts, mailer: mail.Sender, events: list):
+    """Mail one digest per recipient list"""
+    groups = {}
+    for event in events:
+        groups.setdefault(tuple(event["to"] or [mailer.fro]), []).append(event)
+    for recipients, group in groups.items():
+        subject, body = digest(group)
+        emsg = mail.build_message(sbj=subject, msg=body, fro=mailer.fro, to=list(recipients))
+        if opts.dry:
+            print(emsg)
+            continue
+        try:
+            await asyncio.to_thread(mailer.send, emsg, list(recipients))
+        except OSError as err:
+            print(f"WARNING: Digest of {len(group)} jobs not sent: {err}")
+        else:
+            print(f"Digest of {len(group)} jobs sent to {', '.join(recipients)}")
+
+
+async def notifier(opts, queue: asyncio.Queue, mailer: mail.Sender):
+    """Gather finished jobs and mail them together once the oldest waited opts.digest seconds"""
+    pending = []
+    while True:
+        timeout = max(opts.digest - (time.monotonic() - pending[0][0]), 0) if pending else None
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            await notify(opts, mailer, [event for _, event in pending])
+            pending = []
+            continue
+        if item is None:
+            break
+        pending.append(item)
+    if pending:
+        await notify(opts, mailer, [event for _, event in pending])
+    await asyncio.to_thread(mailer.close)
+
+
+async def watch(opts, mailer: mail.Sender):
+    """Poll and mail concurrently until SIGTERM/SIGINT, or once"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    queue = asyncio.Queue()
+    await asyncio.gather(poller(opts, queue, stop, mailer), notifier(opts, queue, mailer))
+
+
+def store(data: bytes, sinkdir=None):
+    """Keep a message received by the SMTP stand-in"""
+    if sinkdir is None:
+        print(data.decode(errors="replace"))
+        return
+    os.makedirs(sinkdir, exist_ok=True)
+    prefix = time.strftime("%Y%m%d%H%M%S.")
+    with tempfile.NamedTemporaryFile(dir=sinkdir, prefix=prefix, suffix=".eml", delete=False) as fil:
+        fil.write(data)
+
+
+async def sinksession(reader, writer, sinkdir=None):
+    """Minimal SMTP dialogue accepting every message"""
+
+    def reply(text: str):
+        writer.write(f"{text}\r\n".encode())
+
+    reply(f"220 {socket.gethostname()} {PROGNAME} SMTP stand-in")
+    await writer.drain()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        verb = line[:4].decode(errors="replace").upper()
+        if verb in ("HELO", "EHLO"):
+            reply(f"250 {socket.gethostname()}")
+        elif verb == "DATA":
+            reply("354 End data with <CR><LF>.<CR><LF>")
+            await writer.drain()
+            data = []
+            async for line in reader:
+                if line.rstrip(b"\r\n") == b".":
+                    break
+                data.append(line[1:] if line.startswith(b".") else line)
+            store(b"".join(data), sinkdir)
+            reply("250 OK")
+        elif verb == "QUIT":
+            reply("221 Bye")
+            await writer.drain()
+            break
+        elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+            reply("250 OK")
+        else:
+            reply("502 Command not implemented")
+        await writer.drain()
+    writer.close()
+
+
+async def sink(host: str, port: int, sinkdir=None):
+    """Run the SMTP stand-in until SIGTERM/SIGINT"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    server = await asyncio.start_server(lambda r, w: sinksession(r, w, sinkdir), host, port)
+    print(f"SMTP stand-in listening on {host}:{port}")
+    async with server:
+        await stop.wait()
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main(args=None):
+    opts = parseopt(args)
+    if opts.sink is not None:
+        asyncio.run(sink(*hostport(opts.sink, SINKPORT), opts.sinkdir))
+        sys.exit()
+    if opts.add:
+        for jobid in opts.jobs or [None]:
+            job = register(jobid, opts.out, opts.name, opts.to, opts.jobfile)
+            print(f"Watching {job['name']} ({job['id'] or job['out']})")
+        sys.exit()
+    if opts.list:
+        for job in readjobs(opts.jobfile):
+            print(f"{job['submitted']}  {job['name']}  {job['id'] or job['out']}")
+        sys.exit()
+    # Credentials are asked once, the connection is opened at the first digest
+    if opts.smtp is not None:
+        try:
+            fro = mail.load_email()
+        except (OSError, ValueError):
+            fro = f"{USER}@{socket.gethostname()}"
+        mailer = mail.Sender(fro, None, *hostport(opts.smtp, 25))
+    elif opts.dry:
+        mailer = mail.Sender(f"{USER}@{socket.gethostname()}")
+    else:
+        try:
+            mailer = mail.Sender(mail.load_email(), mail.load_passkey())
+        except Exception as err:
+            errore(f"Cannot load mail credentials: {err}")
+    asyncio.run(watch(opts, mailer))
+    sys.exit()
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()
@@ -12,11 +12,16 @@ import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
 import platform  # Computer info
 import sys  # System-specific functions: sys.argv(), sys.stderr.write()
 import argparse  # commandline argument parsers
+import time  # Spool file names and retry delays
+import fcntl  # Only one process drains the spool
+import threading  # Connection shared by threads
 
 # To send the email
 import smtplib  # To send emails
 from email.message import EmailMessage
 import mimetypes  # Handle file types over Internet
+import gzip  # Compression of large attachments
+import io  # Compressed attachments in memory
 
 # encryption
 from cryptography.fernet import Fernet, InvalidToken
@@ -40,6 +45,11 @@ USER = os.getenv("USER", "unknown")
 # ============
 SCRIPT_DIR = Path(__file__).resolve().parent
 SECRET_FILE = SCRIPT_DIR / ".config" / "mail" / "passkey.json"
+# Unlocked keys live until logout in the session runtime directory, if any
+RUNTIME_DIR = os.getenv("XDG_RUNTIME_DIR")
+KEY_CACHE = Path(RUNTIME_DIR) / "mail" / "keys.json" if RUNTIME_DIR else None
+# Unlocked keys of this process, by salt
+_KEYS = {}
 
 
 def derive_fernet_key(password: str, salt: bytes) -> bytes:
@@ -47,6 +57,42 @@ def derive_fernet_key(password: str, salt: bytes) -> bytes:
     key = kdf.derive(password.encode("utf-8"))
     return base64.urlsafe_b64encode(key)
 
+
+def cached_key(salt: bytes):
+    """Key unlocked earlier in this process or session, None if not found"""
+    tag = base64.b64encode(salt).decode("ascii")
+    if tag not in _KEYS and KEY_CACHE is not None:
+        try:
+            _KEYS[tag] = json.loads(KEY_CACHE.read_text(encoding="utf-8"))[tag].encode("ascii")
+        except (OSError, ValueError, KeyError):
+            return None
+    return _KEYS.get(tag)
+
+
+def cache_key(salt: bytes, key: bytes) -> None:
+    """Keep an unlocked key for this process and, readable only by the user, for the session"""
+    tag = base64.b64encode(salt).decode("ascii")
+    _KEYS[tag] = key
+    if KEY_CACHE is None:
+        return
+    # Keys of other secret files stay unlocked
+    try:
+        keys = json.loads(KEY_CACHE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        keys = {}
+    if not isinstance(keys, dict):
+        keys = {}
+    keys[tag] = key.decode("ascii")
+    tmpfil = KEY_CACHE.with_name(f"{KEY_CACHE.name}.{os.getpid()}.tmp")
+    try:
+        KEY_CACHE.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with os.fdopen(os.open(tmpfil, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as fil:
+            json.dump(keys, fil)
+        os.replace(tmpfil, KEY_CACHE)
+    except OSError:
+        pass
+
+
 def load_email(secret_file: Path = SECRET_FILE) -> str:
     if not secret_file.exists():
         raise FileNotFoundError(f"Secret file not found: {secret_file}")
@@ -60,7 +106,7 @@ def load_email(secret_file: Path = SECRET_FILE) -> str:
 
     return email
 
-def load_passkey(secret_file: Path = SECRET_FILE) -> str:
+def load_passkey(secret_file: Path = SECRET_FILE, interactive: bool = True) -> str:
     if not secret_file.exists():
         raise FileNotFoundError(f"Secret file not found: {secret_file}")
 
@@ -72,14 +118,20 @@ def load_passkey(secret_file: Path = SECRET_FILE) -> str:
     except KeyError as exc:
         raise ValueError(f"Missing field in secret file: {exc}") from exc
 
-    unlock_password = getpass.getpass("Unlock password: ")
-    fernet_key = derive_fernet_key(unlock_password, salt)
+    # The key derivation is slow on purpose: done once per session
+    fernet_key = cached_key(salt)
+    if fernet_key is None:
+        if not interactive or not sys.stdin.isatty():
+            raise RuntimeError("Mail key not unlocked in this session, run mail.py --drain from a terminal.")
+        unlock_password = getpass.getpass("Unlock password: ")
+        fernet_key = derive_fernet_key(unlock_password, salt)
 
     try:
         passkey = Fernet(fernet_key).decrypt(token).decode("utf-8")
     except InvalidToken as exc:
         raise RuntimeError("Wrong password or corrupted secret file.") from exc
 
+    cache_key(salt, fernet_key)
     return passkey
 
 
@@ -91,6 +143,73 @@ SMTP_DATA = {
     "PORT": 465,
 }
 SIGNED = f"Message from {USER}@{HOSTNAME}"
+DATA_DIR = Path(os.getenv("XDG_DATA_HOME") or Path.home() / ".local" / "share")
+# Messages are written in tmp/, moved to new/ when complete and to failed/ if rejected
+SPOOL_DIR = Path(os.getenv("MAIL_SPOOL") or DATA_DIR / "mail" / "spool")
+# Attachments above this total, once base64 encoded, are sent compressed, or as excerpts
+MAX_ATTACH = 10 * 1024**2
+# Text attachments up to this size are sent as they are
+RAW_ATTACH = 256 * 1024
+# Bytes at the start and end of excerpts
+EXCERPT = 64 * 1024
+BLOCK = 1024**2
+GZIP_LEVEL = 6
+SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3}
+SEND_ATTEMPTS = 5
+# Seconds before the first retry, doubled at each one
+BACKOFF = 2.0
+
+
+# =========
+#  CLASSES
+# =========
+class Sender:
+    """SMTP connection opened on first use, reused, and reopened when the server drops it"""
+
+    def __init__(self, fro: str, passkey: str = None, server: str = None, port: int = None):
+        self.fro = fro
+        self.passkey = passkey
+        self.server = server
+        self.port = port
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def _session(self, action):
+        with self.lock:
+            for attempt in (1, 2):
+                if self.conn is None:
+                    self.conn = connect(self.fro, self.passkey, self.server, self.port)
+                try:
+                    return action(self.conn)
+                except smtplib.SMTPServerDisconnected:
+                    self.conn = None
+                    if attempt == 2:
+                        raise
+                except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                    # Refused by a server still talking to us
+                    raise
+                except OSError:
+                    self.conn = None
+                    raise
+
+    def send(self, emsg: EmailMessage, recipients) -> None:
+        """Send a message object"""
+        self._session(lambda conn: conn.send_message(emsg, to_addrs=recipients))
+
+    def sendraw(self, fro: str, recipients, raw: bytes) -> None:
+        """Send an already formatted message"""
+        self._session(lambda conn: conn.sendmail(fro, recipients, raw))
+
+    def close(self) -> None:
+        """Say goodbye to the server"""
+        with self.lock:
+            if self.conn is not None:
+                try:
+                    self.conn.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self.conn = None
+
 
 # =================
 #  PARSING OPTIONS
@@ -107,13 +226,20 @@ def parseopt(args=None):
         "-m", "--msg", dest="msg", default="", help="Email body as text, or path to a text file",
     )
     parser.add_argument("-a", "--att", nargs="+", default=[], help="Attachments")
+    parser.add_argument(
+        "--maxatt", type=parse_size, default=MAX_ATTACH, help="Total size of attachments, beyond it files are cut"
+    )
     parser.add_argument("-v", "--verbose", dest="vrb", action="count", default=0, help="Verbose mode")
     parser.add_argument("--dry", action="store_true", default=False, help="Build message but do not send")
+    parser.add_argument("--spool", action="store_true", default=False, help="Queue message for a later --drain")
+    parser.add_argument("--drain", action="store_true", default=False, help="Send queued messages")
+    parser.add_argument("--spooldir", type=Path, default=SPOOL_DIR, help=f"Queue directory (default: {SPOOL_DIR})")
 
     opts = parser.parse_args(args)
     # Check options
     alladdr = opts.to + opts.cc + opts.bcc
-    if not alladdr and not opts.msg and not opts.att and not opts.sbj and not opts.dry:
+    opts.compose = bool(alladdr or opts.msg or opts.att or opts.sbj or opts.dry)
+    if not opts.compose and not opts.drain:
         parser.print_help()
         raise Exception("Must include at least one option")
     if not opts.sbj:
@@ -135,8 +261,52 @@ def resolve_body(msg: str) -> str:
 
     return msg
 
-def build_message(sbj="", msg="", fro="", to=None, cc=None, att=None):
-    """Create email message object"""
+
+def parse_size(text: str) -> int:
+    """Bytes from a size such as 500k, 10M or 10MB"""
+    value = text.strip().upper().removesuffix("B")
+    factor = SIZE_UNITS.get(value[-1:], 1) if value else 1
+    try:
+        return int(float(value.rstrip("".join(SIZE_UNITS))) * factor)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid size {text}") from exc
+
+
+def encoded(nbytes: int) -> int:
+    """Size of nbytes once base64 encoded in the message"""
+    return 4 * ((nbytes + 2) // 3)
+
+
+def gzip_file(path: Path, limit: int):
+    """Gzip file content block by block, None as soon as it exceeds limit bytes"""
+    out = io.BytesIO()
+    with path.open("rb") as fp, gzip.GzipFile(path.name, "wb", GZIP_LEVEL, out, path.stat().st_mtime) as gz:
+        for block in iter(lambda: fp.read(BLOCK), b""):
+            gz.write(block)
+            if out.tell() > limit:
+                return None
+    return out.getvalue() if out.tell() <= limit else None
+
+
+def excerpt(path: Path, size: int, nbytes: int = EXCERPT) -> str:
+    """First and last whole lines of a text file, with a reference to the full one"""
+    with path.open("rb") as fp:
+        head = fp.read(nbytes)
+        fp.seek(max(size - nbytes, len(head)))
+        tail = fp.read(nbytes)
+    head = head[: head.rfind(b"\n") + 1] or head
+    tail = tail[tail.find(b"\n") + 1 :] or tail
+    omitted = size - len(head) - len(tail)
+    return (
+        f"Excerpt of {HOSTNAME}:{path.resolve()} ({size} bytes)\n\n"
+        + head.decode("utf-8", errors="replace")
+        + f"\n[... {omitted} bytes omitted ...]\n\n"
+        + tail.decode("utf-8", errors="replace")
+    )
+
+
+def build_message(sbj="", msg="", fro="", to=None, cc=None, att=None, maxatt=MAX_ATTACH):
+    """Create email message object, with attachments up to maxatt bytes in total"""
     # Restore defaults to mutable empty lists
     if to is None:
         to = []
@@ -151,14 +321,10 @@ def build_message(sbj="", msg="", fro="", to=None, cc=None, att=None):
     emsg["To"] = ", ".join(to)
     emsg["From"] = fro
     if cc: emsg["Cc"] = ", ".join(cc)
-    # Body
-    body = resolve_body(msg)
-    # Subject
-    if sbj != SIGNED:
-        emsg.set_content(f"{body}\n{SIGNED}" if body else SIGNED)
-    else:
-        emsg.set_content(body)
-    # Attachments
+    # Attachments, prepared first to mention the ones cut in the body
+    parts = []
+    notes = []
+    budget = maxatt
     for attfil in att:
         path = Path(attfil).expanduser()
         if not path.is_file():
@@ -167,6 +333,9 @@ def build_message(sbj="", msg="", fro="", to=None, cc=None, att=None):
         # will be ignored, although we should check for simple things like
         # gzip'd or compressed files.
         ctype, encoding = mimetypes.guess_type(attfil)
+        size = path.stat().st_size
+        with path.open("rb") as fp:
+            binary = encoding is not None or b"\0" in fp.read(EXCERPT)
         if ctype is None or encoding is not None:
             # No guess could be made, or the file is encoded (compressed), so
             # use a generic bag-of-bits type.
@@ -174,15 +343,136 @@ def build_message(sbj="", msg="", fro="", to=None, cc=None, att=None):
 
         maintype, subtype = ctype.split("/", 1)
 
-        with path.open("rb") as fp:
-            emsg.add_attachment(fp.read(), maintype=maintype, subtype=subtype, filename=path.name)
+        if encoded(size) <= budget and (size <= RAW_ATTACH or binary):
+            with path.open("rb") as fp:
+                parts.append((fp.read(), maintype, subtype, path.name))
+            budget = budget - encoded(size)
+            continue
+        # Large text files shrink a lot, memory never exceeds the budget
+        data = None if binary else gzip_file(path, 3 * budget // 4)
+        if data is not None:
+            parts.append((data, "application", "gzip", f"{path.name}.gz"))
+            budget = budget - encoded(len(data))
+            continue
+        text = None if binary else excerpt(path, size).encode("utf-8")
+        if text is not None and encoded(len(text)) <= budget:
+            parts.append((text, "text", "plain", f"{path.name}.excerpt.txt"))
+            budget = budget - encoded(len(text))
+            notes.append(f"Attachment {path.name} cut ({size} bytes), full file: {HOSTNAME}:{path.resolve()}")
+        else:
+            notes.append(f"Attachment {path.name} not sent ({size} bytes): {HOSTNAME}:{path.resolve()}")
+    # Body
+    body = "\n".join([resolve_body(msg)] + notes).strip("\n")
+    # Subject
+    if sbj != SIGNED:
+        emsg.set_content(f"{body}\n{SIGNED}" if body else SIGNED)
+    else:
+        emsg.set_content(body)
+    for data, maintype, subtype, filename in parts:
+        emsg.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
 
     return emsg
 
 
+def connect(fro: str, passkey: str = None, server: str = None, port: int = None) -> smtplib.SMTP:
+    """Open an SMTP connection, over SSL and logged in unless passkey is None (local stand-in)"""
+    server = server or SMTP_DATA["SERVER"]
+    port = port or SMTP_DATA["PORT"]
+    if passkey is None:
+        return smtplib.SMTP(server, port)
+    conn = smtplib.SMTP_SSL(server, port)
+    try:
+        conn.login(fro, passkey)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def spool_message(emsg: EmailMessage, fro: str, recipients, spool_dir: Path = SPOOL_DIR) -> Path:
+    """Queue message with its envelope, visible to senders only once completely written"""
+    for sub in ("tmp", "new"):
+        (spool_dir / sub).mkdir(parents=True, exist_ok=True)
+    # Names sort by queueing time
+    name = f"{time.time():.6f}.{HOSTNAME}.{os.getpid()}.{os.urandom(4).hex()}"
+    tmp = spool_dir / "tmp" / name
+    with tmp.open("wb") as fp:
+        fp.write(json.dumps({"from": fro, "to": list(recipients)}).encode("utf-8") + b"\n")
+        fp.write(emsg.as_bytes())
+        fp.flush()
+        os.fsync(fp.fileno())
+    dest = spool_dir / "new" / name
+    os.rename(tmp, dest)
+    return dest
+
+
+def send_spooled(sender: Sender, path: Path, attempts: int = SEND_ATTEMPTS, backoff: float = BACKOFF) -> str:
+    """Send a queued message: "sent", "failed" if rejected for good, "deferred" if the server is unavailable"""
+    try:
+        with path.open("rb") as fp:
+            envelope = json.loads(fp.readline())
+            raw = fp.read()
+    except (OSError, ValueError):
+        return "failed"
+    delay = backoff
+    for attempt in range(1, attempts + 1):
+        try:
+            sender.sendraw(envelope["from"], envelope["to"], raw)
+            return "sent"
+        except smtplib.SMTPAuthenticationError:
+            raise
+        except smtplib.SMTPRecipientsRefused:
+            return "failed"
+        except smtplib.SMTPResponseException as exc:
+            if exc.smtp_code >= 500:
+                return "failed"
+        except OSError:
+            pass
+        if attempt < attempts:
+            time.sleep(delay)
+            delay = 2 * delay
+    return "deferred"
+
+
+def drain(sender: Sender, spool_dir: Path = SPOOL_DIR, block: bool = True, verbose: int = 0) -> int:
+    """Send queued messages in order over one connection, return how many were sent.
+    Only one process drains at a time, the others wait or, if not block, return at once"""
+    newdir = spool_dir / "new"
+    if not newdir.is_dir():
+        return 0
+    sent = 0
+    with (spool_dir / ".lock").open("a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX if block else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0
+        try:
+            # Messages queued while draining are sent as well
+            while True:
+                queued = sorted(path for path in newdir.iterdir() if path.is_file())
+                if not queued:
+                    break
+                for path in queued:
+                    result = send_spooled(sender, path)
+                    if result == "deferred":
+                        print(f"Error sending queued messages, {len(list(newdir.iterdir()))} left", file=sys.stderr)
+                        return sent
+                    if result == "failed":
+                        (spool_dir / "failed").mkdir(exist_ok=True)
+                        os.replace(path, spool_dir / "failed" / path.name)
+                        print(f"Queued message rejected, kept in {spool_dir / 'failed'}", file=sys.stderr)
+                        continue
+                    path.unlink()
+                    sent = sent + 1
+                    if verbose >= 1:
+                        print(f"Queued message {path.name} sent")
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return sent
+
+
 def send_message(emsg: EmailMessage, fro: str, recipients, passkey: str, verbose: int = 0) -> None:
-    with smtplib.SMTP_SSL(SMTP_DATA["SERVER"], SMTP_DATA["PORT"]) as server:
-        server.login(fro, passkey)
+    with connect(fro, passkey) as server:
         server.send_message(emsg, to_addrs=recipients)
 
     if verbose >= 1:
@@ -197,27 +487,59 @@ def main(args=None) -> int:
     opts = parseopt(args)
     # LOAD MAIL AND INCLUDE IT IN ADDRESSES
     email_addr = load_email()
-    alladdr = opts.to + opts.cc + opts.bcc
-    if not alladdr:
-        opts.to.append(email_addr)
-    elif email_addr not in alladdr:
-        opts.bcc.append(email_addr)
-    # CREATE MESSAGE
-    emsg = build_message(
-        sbj=opts.sbj, msg=opts.msg, fro=email_addr, to=opts.to, cc=opts.cc, att=opts.att
-    )
-    if opts.vrb >= 1:
-        print(emsg)
-    if opts.dry:
-        return 0
-    # SEND MESSAGE
-    recipients = opts.to + opts.cc + opts.bcc
+    if opts.compose:
+        alladdr = opts.to + opts.cc + opts.bcc
+        if not alladdr:
+            opts.to.append(email_addr)
+        elif email_addr not in alladdr:
+            opts.bcc.append(email_addr)
+        # CREATE MESSAGE
+        emsg = build_message(
+            sbj=opts.sbj, msg=opts.msg, fro=email_addr, to=opts.to, cc=opts.cc, att=opts.att, maxatt=opts.maxatt
+        )
+        if opts.vrb >= 1:
+            print(emsg)
+        if opts.dry:
+            return 0
+        recipients = opts.to + opts.cc + opts.bcc
+        # QUEUE MESSAGE, NO PASSWORD NEEDED, with --drain it is sent with the others
+        if opts.spool or opts.drain:
+            path = spool_message(emsg, email_addr, recipients, opts.spooldir)
+            if opts.vrb >= 1:
+                print(f"Message queued as {path}")
+            if not opts.drain:
+                # Sent now only if unlocked in this session and nobody else is sending
+                try:
+                    passkey = load_passkey(interactive=False)
+                except Exception:
+                    return 0
+                sender = Sender(email_addr, passkey)
+                try:
+                    drain(sender, opts.spooldir, block=False, verbose=opts.vrb)
+                except Exception as exc:
+                    print(f"Error sending queued messages: {exc}", file=sys.stderr)
+                sender.close()
+                return 0
     # RETRIEVE PASSWORD
     try:
         passkey = load_passkey()
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         return 1
+    # SEND QUEUED MESSAGES
+    if opts.drain:
+        sender = Sender(email_addr, passkey)
+        try:
+            sent = drain(sender, opts.spooldir, verbose=opts.vrb)
+        except Exception as exc:
+            print(f"Error sending queued messages: {exc}", file=sys.stderr)
+            return 1
+        finally:
+            sender.close()
+        if opts.vrb >= 1:
+            print(f"{sent} queued messages sent")
+        return 0
+    # SEND MESSAGE
     try:
         send_message(emsg, fro=email_addr, recipients=recipients, passkey=passkey, verbose=opts.vrb)
     except Exception as exc:
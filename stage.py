@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+
+#
+# Copy files between home and local scratch concurrently, skipping unchanged files and verifying copies
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import argparse  # commandline argument parsers
+import shutil  # To copy file metadata
+import time  # To measure throughput
+import zlib  # CRC32 checksum, releases the GIL on large buffers
+import gzip  # Fallback compression
+import subprocess  # zstd executable
+import contextlib  # Compressed file objects
+import signal  # To stop watching
+import threading  # To interrupt copies
+import concurrent.futures  # Concurrent copies
+from feutils import errore, wide_help  # My generic functions
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+
+# ==========
+#  DEFAULTS
+# ==========
+NJOBS = 4
+# Read/write block size
+BLOCK = 8 * 1024**2
+# Attempts for each file before reporting a failure
+ATTEMPTS = 2
+# Files written back compressed from this size with --compress
+MINSIZE = "256MB"
+ZSTD = shutil.which("zstd")
+# zstd level 1 is close to disk speed with all threads, gzip is single-threaded
+ZSTDLEVEL = 1
+# Compression threads, 0 for all processors
+THREADS = 0
+GZIPLEVEL = 1
+# Extension of compressed files and the codecs able to read them, best first
+EXTENSIONS = {".zst": ("zstandard", "zstd"), ".gz": ("gzip",)}
+SIZEUNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+# Set to interrupt copies in progress
+STOP = threading.Event()
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+def human(nbytes: float) -> str:
+    """Size in bytes as a human-readable string"""
+    for unit in ("B", "kB", "MB", "GB"):
+        if nbytes < 1024:
+            break
+        nbytes = nbytes / 1024
+    else:
+        unit = "TB"
+    return f"{nbytes:.1f} {unit}"
+
+
+def checksum(path: str, codec=None) -> int:
+    """CRC32 of file, uncompressed with codec if given"""
+    crc = 0
+    buf = bytearray(BLOCK)
+    view = memoryview(buf)
+    with fopen(path, "r", codec) as fin:
+        while True:
+            nread = fin.readinto(buf)
+            if not nread:
+                break
+            crc = zlib.crc32(view[:nread], crc)
+    return crc
+
+
+def unchanged(src: str, dest: str) -> bool:
+    """Destination has same modification time of source, and same size unless one is compressed"""
+    try:
+        sstat, dstat = os.stat(src), os.stat(dest)
+    except OSError:
+        return False
+    if sstat.st_mtime_ns != dstat.st_mtime_ns:
+        return False
+    return compressed(src) or compressed(dest) or sstat.st_size == dstat.st_size
+
+
+def sizebytes(size: str) -> int:
+    """Size such as 512MB, 2G or 1000 in bytes"""
+    value = size.strip().lower().rstrip("b")
+    unit = value[-1:] if value[-1:] in SIZEUNITS else ""
+    try:
+        return int(float(value[: len(value) - len(unit)]) * SIZEUNITS[unit])
+    except ValueError:
+        errore(f"Wrong size {size}")
+
+
+def compressed(path: str):
+    """Compression extension of path or empty string"""
+    ext = os.path.splitext(path)[1]
+    return ext if ext in EXTENSIONS else ""
+
+
+def available(codec: str) -> bool:
+    """Codec can be used"""
+    return {"zstandard": zstandard is not None, "zstd": ZSTD is not None}.get(codec, True)
+
+
+def bestcodec() -> tuple:
+    """Fastest available codec and its extension"""
+    for ext, codecs in EXTENSIONS.items():
+        for codec in codecs:
+            if available(codec):
+                return codec, ext
+
+
+def newest(src: str) -> str:
+    """Most recent of src and its compressed copies"""
+    if compressed(src):
+        return src
+    found = [path for path in [src] + [src + ext for ext in EXTENSIONS] if os.path.isfile(path)]
+    return max(found, key=os.path.getmtime) if found else src
+
+
+@contextlib.contextmanager
+def zopen(path: str, mode: str, codec: str, threads: int = THREADS):
+    """Binary file object reading (mode "r") or writing (mode "w") the uncompressed data of path"""
+    if codec == "zstandard":
+        with open(path, mode + "b") as raw:
+            if mode == "w":
+                # zstandard counts worker threads besides the caller, -1 for all processors
+                workers = -1 if threads == 0 else 0 if threads == 1 else threads
+                with zstandard.ZstdCompressor(level=ZSTDLEVEL, threads=workers).stream_writer(raw) as zfile:
+                    yield zfile
+            else:
+                with zstandard.ZstdDecompressor().stream_reader(raw) as zfile:
+                    yield zfile
+    elif codec == "zstd":
+        if mode == "w":
+            zcmd = [ZSTD, "-q", "-f", f"-T{threads}", f"-{ZSTDLEVEL}", "-o", path]
+            proc = subprocess.Popen(zcmd, stdin=subprocess.PIPE)
+            zfile = proc.stdin
+        else:
+            proc = subprocess.Popen([ZSTD, "-q", "-d", "-c", path], stdout=subprocess.PIPE)
+            zfile = proc.stdout
+        try:
+            yield zfile
+        finally:
+            zfile.close()
+            if proc.wait():
+                raise OSError(f"zstd failed on {path}")
+    else:
+        with gzip.open(path, mode + "b", compresslevel=GZIPLEVEL) as zfile:
+            yield zfile
+
+
+def fopen(path: str, mode: str, codec=None, threads: int = THREADS):
+    """Binary file object of plain file, or of compressed file with codec"""
+    if codec is None:
+        return open(path, mode + "b", buffering=0)
+    return zopen(path, mode, codec, threads)
+
+
+def readcodec(path: str):
+    """Available codec reading path or None for plain files"""
+    ext = compressed(path)
+    if not ext:
+        return None
+    for codec in EXTENSIONS[ext]:
+        if available(codec):
+            return codec
+    raise OSError(f"no codec available to read {path}")
+
+
+# =================
+#  PARSING OPTIONS
+# =================
+def parseopt(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(
+        prog=PROGNAME,
+        formatter_class=wide_help(argparse.HelpFormatter, w=140, h=40),
+        description="Copy files to a directory concurrently, verifying size and checksum",
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE", help="Files to copy")
+    parser.add_argument("-d", "--dest", metavar="DIR", dest="dest", required=True, help="Destination directory")
+    parser.add_argument("-j", "--jobs", metavar="N", dest="njobs", type=int, default=NJOBS, help="Concurrent copies")
+    parser.add_argument("-f", "--force", dest="force", action="store_true", help="Copy also unchanged files")
+    parser.add_argument("--noverify", dest="verify", action="store_false", help="Do not verify checksum of copies")
+    parser.add_argument("--optional", dest="optional", action="store_true", help="Missing files are not failures")
+    parser.add_argument(
+        "-w",
+        "--watch",
+        metavar="INTERVAL",
+        dest="watch",
+        type=float,
+        default=None,
+        help="Copy modified files every INTERVAL seconds until terminated, missing files are skipped",
+    )
+    parser.add_argument(
+        "-z",
+        "--compress",
+        metavar="MINSIZE",
+        dest="compress",
+        nargs="?",
+        const=MINSIZE,
+        default=None,
+        help=f"Compress copies of files larger than MINSIZE (default: {MINSIZE}), "
+        + "compressed files are always uncompressed",
+    )
+    parser.add_argument(
+        "-T",
+        "--threads",
+        metavar="N",
+        dest="threads",
+        type=int,
+        default=THREADS,
+        help="Compression threads per copy, 0 for all processors (zstd only)",
+    )
+    opts = parser.parse_args(args)
+    if opts.njobs < 1:
+        errore("Number of concurrent copies must be positive")
+    if opts.watch is not None and opts.watch <= 0:
+        errore("Interval must be positive")
+    if opts.threads < 0:
+        errore("Number of compression threads cannot be negative")
+    if opts.compress is not None:
+        opts.compress = sizebytes(opts.compress)
+    return opts
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+def copyfile(src: str, dest: str, verify: bool = True, codec=None, threads: int = THREADS) -> int:
+    """Copy src to dest through a temporary file, return number of uncompressed bytes copied
+
+    Compressed src is uncompressed, dest is compressed with codec if given"""
+    tmp = os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.stage{os.getpid()}")
+    incodec = readcodec(src)
+    before = os.stat(src).st_mtime_ns
+    crc, size = 0, 0
+    buf = bytearray(BLOCK)
+    view = memoryview(buf)
+    try:
+        with fopen(src, "r", incodec) as fin, fopen(tmp, "w", codec, threads) as fout:
+            while not STOP.is_set():
+                nread = fin.readinto(buf)
+                if not nread:
+                    break
+                crc = zlib.crc32(view[:nread], crc)
+                fout.write(view[:nread])
+                size += nread
+        if STOP.is_set():
+            raise OSError("interrupted")
+        # Files still being written are not copied half-way
+        if os.stat(src).st_mtime_ns != before:
+            raise OSError(f"{src} modified while copying")
+        shutil.copystat(src, tmp)
+        if (codec is None and os.path.getsize(tmp) != size) or (incodec is None and os.path.getsize(src) != size):
+            raise OSError(f"size mismatch copying {src}")
+        if verify and checksum(tmp, codec) != crc:
+            raise OSError(f"checksum mismatch copying {src}")
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return size
+
+
+def stage(
+    src: str, destdir: str, force: bool = False, verify: bool = True, minsize=None, threads: int = THREADS
+) -> tuple:
+    """Copy one file in destdir, return status, bytes copied, seconds and error message
+
+    The newest of src and its compressed copies is copied, uncompressed.
+    Files of at least minsize bytes are written compressed, replacing other compressed copies in destdir.
+    A plain file in destdir is never removed, the newest copy is the one read back"""
+    src = newest(src)
+    if not os.path.isfile(src):
+        return "missing", 0, 0.0, "no such file"
+    name = os.path.basename(src)
+    name = name[: len(name) - len(compressed(name))]
+    codec = None
+    if minsize is not None and not compressed(src) and os.path.getsize(src) >= minsize:
+        codec, ext = bestcodec()
+        name = name + ext
+    dest = os.path.join(destdir, name)
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        return "same", 0, 0.0, ""
+    if not force and unchanged(src, dest):
+        return "unchanged", 0, 0.0, ""
+    error = ""
+    for _ in range(ATTEMPTS):
+        if STOP.is_set():
+            break
+        time0 = time.perf_counter()
+        try:
+            size = copyfile(src, dest, verify, codec, threads)
+        except OSError as err:
+            error = str(err)
+            continue
+        elapsed = time.perf_counter() - time0
+        # Older compressed copies would be taken as newer than dest by mistake, plain files are left to their users
+        base = name[: len(name) - len(compressed(name))]
+        for stale in [base + ext for ext in EXTENSIONS]:
+            if stale != name and os.path.isfile(os.path.join(destdir, stale)):
+                os.remove(os.path.join(destdir, stale))
+        status = "packed" if codec else "unpacked" if compressed(src) else "copied"
+        return status, size, elapsed, ""
+    return "failed", 0, 0.0, error
+
+
+def stageall(
+    files: list,
+    destdir: str,
+    njobs: int = NJOBS,
+    force: bool = False,
+    verify: bool = True,
+    minsize=None,
+    threads: int = THREADS,
+) -> dict:
+    """Copy files in destdir concurrently, return results by file in the given order"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=njobs) as pool:
+        futures = {
+            src: pool.submit(stage, src, destdir, force, verify, minsize, threads) for src in dict.fromkeys(files)
+        }
+    return {src: future.result() for src, future in futures.items()}
+
+
+def report(results: dict, optional: bool = False, quiet: bool = False) -> int:
+    """Print outcome of each copy, only copies and failures if quiet, return number of failures"""
+    nfail, total = 0, 0
+    for src, (status, size, seconds, error) in results.items():
+        if status in ("copied", "packed", "unpacked"):
+            rate = human(size / max(seconds, 1e-6))
+            print(f" {PROGNAME}: {status:<9} {src}  {human(size)} in {seconds:.2f} s ({rate}/s)")
+            total += size
+        elif status == "missing" and optional:
+            continue
+        elif status in ("missing", "failed"):
+            print(f" {PROGNAME}: FAILED    {src}: {error}")
+            nfail += 1
+        elif not quiet:
+            print(f" {PROGNAME}: {status:<9} {src}")
+    if total:
+        print(f" {PROGNAME}: {human(total)} copied, {nfail} failures")
+    return nfail
+
+
+def watch(opts):
+    """Copy modified files every opts.watch seconds until SIGTERM or SIGINT"""
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: STOP.set())
+    while not STOP.wait(opts.watch):
+        results = stageall(opts.files, opts.dest, opts.njobs, opts.force, opts.verify, opts.compress, opts.threads)
+        if not STOP.is_set():
+            report(results, optional=True, quiet=True)
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main(args=None):
+    opts = parseopt(args)
+    if not os.path.isdir(opts.dest):
+        errore(f"Destination directory {opts.dest} does not exist")
+    if opts.watch is not None:
+        watch(opts)
+        sys.exit()
+    results = stageall(opts.files, opts.dest, opts.njobs, opts.force, opts.verify, opts.compress, opts.threads)
+    sys.exit(1 if report(results, opts.optional) else 0)
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()
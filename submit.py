@@ -15,10 +15,8 @@ import argparse  # commandline argument parsers
 # import math  # C library float functions
 # import subprocess  # Spawn process: subprocess.run('ls', stdout=subprocess.PIPE)
 # import typing  # Support for type hints
-from feutils import bashrun, errore, HOSTNAME, int_or_str, wide_help
+from feutils import bashrun, errore, hostname, int_or_str, wide_help
 from collections import namedtuple
-import ams
-import gau
 
 # ==============
 #  PROGRAM DATA
@@ -36,15 +34,20 @@ try:
 except TypeError:
     Queue = namedtuple("queue", ["name", "ncpu", "mem", "info"])
 
-if ".scm.com" in HOSTNAME:
-    sky = Queue("sky", 32, 192, "Skylake SP nodes: per node 32 cores (Intel(R) Xeon(R) Gold 6130 CPU @ 2.10GHz)")
-    bm  = Queue("bm", 24, 128, "Broadwell-E nodes: per node 24 cores (Intel(R) Xeon(R) CPU E5-2650 v4 @ 2.20GHz)")
-    zen = Queue("zen3", 64, 256, "Zen3 Epyc node: 64 cores (2x AMD EPYC 7513 @ 2.6GHz)")
+
+def scmqueues() -> dict:
+    """Queues of the .scm.com cluster"""
+    return {
+        "sky": Queue("sky", 32, 192, "Skylake SP nodes: per node 32 cores (Intel(R) Xeon(R) Gold 6130 CPU @ 2.10GHz)"),
+        "bm": Queue("bm", 24, 128, "Broadwell-E nodes: per node 24 cores (Intel(R) Xeon(R) CPU E5-2650 v4 @ 2.20GHz)"),
+        "zen3": Queue("zen3", 64, 256, "Zen3 Epyc node: 64 cores (2x AMD EPYC 7513 @ 2.6GHz)"),
+    }
+
 
 def standardqueue():
     """Return default queue"""
-    if ".scm.com" in HOSTNAME:
-        return sky.name
+    if ".scm.com" in hostname():
+        return scmqueues()["sky"].name
     else:
         print("ERROR: No default queue found, please specify queue name, memory, and cores")
         raise Exception
@@ -122,7 +125,7 @@ def parseopt(args=None):
         add_help=False,
         conflict_handler="resolve",
     )
-    if ".scm.com" not in HOSTNAME:
+    if ".scm.com" not in hostname():
         import gau  # Gaussian script
 
         gaussian = helparser.add_argument_group("g16 options")
@@ -139,18 +142,14 @@ def parseopt(args=None):
     if not other or opts.hlp:
         helparser.print_help()
         sys.exit()
-    if ".scm.com" in HOSTNAME:
+    if ".scm.com" in hostname():
         # Default queues on Master
-        if opts.queue == "sky":
-            if opts.ppn is None: opts.ppn = sky.ncpu
-            if opts.mem is None: opts.mem = sky.mem
-        if opts.queue == "bm":
-            if opts.ppn is None: opts.ppn = bm.ncpu
-            if opts.mem is None: opts.mem = bm.mem
+        queues = scmqueues()
         if opts.queue in "zen3":
-            opts.queue = zen.name
-            if opts.ppn is None: opts.ppn = zen.ncpu
-            if opts.mem is None: opts.mem = zen.mem
+            opts.queue = queues["zen3"].name
+        if opts.queue in queues:
+            if opts.ppn is None: opts.ppn = queues[opts.queue].ncpu
+            if opts.mem is None: opts.mem = queues[opts.queue].mem
     if opts.mem:
         # If memory is given as an integer, try to guess if it's MB or GB
         if isinstance(opts.mem, int):
@@ -173,6 +172,9 @@ def parseopt(args=None):
 def main():
     # Parse options
     opts, other = parseopt()
+    import ams  # AMS script
+    import gau  # Gaussian script
+
     if shutil.which("sbatch"):
         sub = f"sbatch -v -N 1 --tasks-per-node={opts.ppn} -p {opts.queue} -o {opts.job}.out -J {opts.job}"
     elif shutil.which("qsub"):
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+#
+# Probe free processors and memory from /proc and cgroups without spawning processes
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import time  # To sample /proc/stat
+import math  # C library float functions
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+
+# ==========
+#  DEFAULTS
+# ==========
+PROCLOAD = "/proc/loadavg"
+PROCSTAT = "/proc/stat"
+PROCMEM = "/proc/meminfo"
+PROCCGROUP = "/proc/self/cgroup"
+CGROUPFS = "/sys/fs/cgroup"
+# Seconds between two samples of /proc/stat
+STATWAIT = 0.25
+# Fields of /proc/stat cpu lines not counted as busy: idle and iowait
+IDLEFIELDS = (3, 4)
+# cgroup v1 reports "no limit" as a huge page-aligned number
+NOLIMIT = 2**60
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+def readfirst(path: str):
+    """Return first line of file or None if unreadable"""
+    try:
+        with open(path, "r") as fil:
+            return fil.readline().strip()
+    except OSError:
+        return None
+
+
+def readkeys(path: str, scale: int = 1) -> dict:
+    """Read 'key value' or 'key: value unit' lines into a dictionary of integers"""
+    data = {}
+    try:
+        with open(path, "r") as fil:
+            for line in fil:
+                words = line.replace(":", " ").split()
+                if len(words) >= 2:
+                    try:
+                        data[words[0]] = int(words[1]) * scale
+                    except ValueError:
+                        continue
+    except OSError:
+        pass
+    return data
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+def loadavg():
+    """Return 1, 5 and 15 minutes load averages"""
+    line = readfirst(PROCLOAD)
+    if line is None:
+        return None
+    return tuple(float(x) for x in line.split()[:3])
+
+
+def cpustat() -> dict:
+    """Return busy and total jiffies for every processor"""
+    stat = {}
+    try:
+        with open(PROCSTAT, "r") as fil:
+            for line in fil:
+                if not line.startswith("cpu"):
+                    break
+                words = line.split()
+                if words[0] == "cpu":
+                    continue
+                ticks = [int(x) for x in words[1:]]
+                idle = sum(ticks[n] for n in IDLEFIELDS if n < len(ticks))
+                # guest time is already included in user time
+                total = sum(ticks[:8])
+                stat[int(words[0][3:])] = (total - idle, total)
+    except OSError:
+        pass
+    return stat
+
+
+def cpubusy(interval: float = STATWAIT, cpus=None) -> float:
+    """Number of busy processors among cpus measured over interval"""
+    if cpus is None:
+        cpus = os.sched_getaffinity(0)
+    before = cpustat()
+    time.sleep(interval)
+    after = cpustat()
+    busy = 0.0
+    for cpu in cpus:
+        if cpu in before and cpu in after:
+            dbusy = after[cpu][0] - before[cpu][0]
+            dtotal = after[cpu][1] - before[cpu][1]
+            if dtotal > 0:
+                busy = busy + dbusy / dtotal
+    return busy
+
+
+def cgroupdirs(controller: str):
+    """Directories of the cgroup of this process for controller, innermost first"""
+    dirs = []
+    try:
+        with open(PROCCGROUP, "r") as fil:
+            lines = fil.read().splitlines()
+    except OSError:
+        return dirs
+    for line in lines:
+        hier, controllers, path = line.split(":", 2)
+        if hier == "0" and not controllers:
+            # cgroup v2 unified hierarchy
+            base = CGROUPFS
+        elif controller in controllers.split(","):
+            # cgroup v1 hierarchy mounted under the controller names
+            base = os.path.join(CGROUPFS, controllers)
+            if not os.path.isdir(base):
+                base = os.path.join(CGROUPFS, controller)
+        else:
+            continue
+        path = path.strip("/")
+        while True:
+            dirs.append(os.path.join(base, path))
+            if not path:
+                break
+            path = os.path.dirname(path)
+    return dirs
+
+
+def cpuquota(cgdir: str):
+    """Number of processors allowed by the CPU quota of one cgroup or None if unlimited"""
+    quota, period = None, None
+    cpumax = readfirst(os.path.join(cgdir, "cpu.max"))
+    if cpumax is not None:
+        words = cpumax.split()
+        if words[0] != "max":
+            quota, period = int(words[0]), int(words[1])
+    else:
+        quota = readfirst(os.path.join(cgdir, "cpu.cfs_quota_us"))
+        period = readfirst(os.path.join(cgdir, "cpu.cfs_period_us"))
+        if quota is not None and period is not None and int(quota) > 0:
+            quota, period = int(quota), int(period)
+        else:
+            quota, period = None, None
+    if quota is not None and period:
+        return quota / period
+    return None
+
+
+def quotadir():
+    """Directory of the cgroup with the tightest CPU quota and its number of processors, (None, None) if unlimited"""
+    limitdir, limit = None, None
+    for cgdir in cgroupdirs("cpu"):
+        ncpu = cpuquota(cgdir)
+        if ncpu is not None and (limit is None or ncpu < limit):
+            limitdir, limit = cgdir, ncpu
+    return limitdir, limit
+
+
+def cgroupcpu():
+    """Number of processors allowed by cgroup CPU quota or None if unlimited"""
+    return quotadir()[1]
+
+
+def cgroupusage(cgdir: str):
+    """CPU seconds used by the processes of a cgroup or None if unknown"""
+    # cgroup v2
+    usage = readkeys(os.path.join(cgdir, "cpu.stat")).get("usage_usec")
+    if usage is not None:
+        return usage / 1e6
+    # cgroup v1, cpuacct mounted with cpu
+    usage = readfirst(os.path.join(cgdir, "cpuacct.usage"))
+    if usage is not None:
+        return int(usage) / 1e9
+    return None
+
+
+def cgroupbusy(cgdir: str, interval: float = STATWAIT):
+    """Number of processors used by a cgroup over interval or None if unknown"""
+    before = cgroupusage(cgdir)
+    if before is None:
+        return None
+    time0 = time.perf_counter()
+    time.sleep(interval)
+    after = cgroupusage(cgdir)
+    if after is None:
+        return None
+    return (after - before) / (time.perf_counter() - time0)
+
+
+def cgroupmem():
+    """Memory limit and memory used (without reclaimable page cache)
+    of the cgroup, or (None, None) if unlimited"""
+    limit, used = None, None
+    for cgdir in cgroupdirs("memory"):
+        if os.path.isfile(os.path.join(cgdir, "memory.max")):
+            # cgroup v2
+            value = readfirst(os.path.join(cgdir, "memory.max"))
+            current = readfirst(os.path.join(cgdir, "memory.current"))
+            cache = readkeys(os.path.join(cgdir, "memory.stat")).get("inactive_file", 0)
+        else:
+            # cgroup v1
+            value = readfirst(os.path.join(cgdir, "memory.limit_in_bytes"))
+            current = readfirst(os.path.join(cgdir, "memory.usage_in_bytes"))
+            cache = readkeys(os.path.join(cgdir, "memory.stat")).get("total_inactive_file", 0)
+        if value is None or value == "max" or int(value) >= NOLIMIT:
+            continue
+        if limit is None or int(value) < limit:
+            limit = int(value)
+            used = max(int(current or 0) - cache, 0)
+    return limit, used
+
+
+def ncpulimit() -> int:
+    """Processors this process can use: affinity mask capped by cgroup quota"""
+    try:
+        ncpu = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        ncpu = os.cpu_count() or 1
+    quota = cgroupcpu()
+    if quota is not None:
+        ncpu = min(ncpu, max(math.ceil(quota), 1))
+    return ncpu
+
+
+def nfreecpu(interval: float = STATWAIT) -> int:
+    """Processors not busy among those this process can use"""
+    ncpu = ncpulimit()
+    try:
+        cpus = os.sched_getaffinity(0)
+    except (AttributeError, OSError):
+        cpus = set(range(os.cpu_count() or 1))
+    # Within a CPU quota only the usage of our cgroup counts, whatever other tenants do
+    cgdir, quota = quotadir()
+    if quota is not None and quota < len(cpus):
+        busy = cgroupbusy(cgdir, interval) if interval > 0 else 0.0
+        if busy is not None:
+            return max(ncpu - round(busy), 0)
+    # Short-term usage of our processors and one-minute average of the node scaled to them
+    busy = cpubusy(interval, cpus) if interval > 0 else 0.0
+    load = loadavg()
+    if load is not None:
+        busy = max(busy, load[0] * len(cpus) / (os.cpu_count() or len(cpus)))
+    return max(ncpu - round(busy), 0)
+
+
+def freemem() -> int:
+    """Free memory in bytes, within the cgroup memory limit"""
+    info = readkeys(PROCMEM, scale=1024)
+    free = info.get("MemAvailable", info.get("MemFree", 0) + info.get("Cached", 0))
+    limit, used = cgroupmem()
+    if limit is not None:
+        free = min(free, max(limit - used, 0))
+    return free
+
+
+def totmem() -> int:
+    """Total memory in bytes, within the cgroup memory limit"""
+    total = readkeys(PROCMEM, scale=1024).get("MemTotal", 0)
+    limit, used = cgroupmem()
+    if limit is not None:
+        total = min(total, limit)
+    return total
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main():
+    gib = 1024**3
+    print(f"Processors available: {ncpulimit()}")
+    print(f"Processors free:      {nfreecpu()}")
+    print(f"Memory total:         {totmem() / gib:.1f} GB")
+    print(f"Memory free:          {freemem() / gib:.1f} GB")
+    sys.exit()
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()
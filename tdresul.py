@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+#
+# Tabulate excited states from Gaussian TD calculations
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import argparse  # commandline argument parsers
+import math  # C library float functions
+import gaulog  # Indexed Gaussian log parser
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+
+# ==========
+#  DEFAULTS
+# ==========
+# Separator that can be useful to change for LaTeX
+SEP = "   "
+HEADER = " State   Sym   E/eV     l/nm       f      D/AU   A/deg    R(L)/cgs   R(V)/cgs"
+HLINE = "-" * 80
+# Columns after state and symmetry with their format
+COLUMNS = {
+    "eV": "{:.4f}",
+    "nm": "{:.2f}",
+    "f": "{:.4f}",
+    "dipS": "{:.4f}",
+    "angle": "{:.2f}",
+    "Rlen": "{:.4f}",
+    "Rvel": "{:.4f}",
+    "dAng": "{:.3f}",
+    "spaz": "{:g}",
+}
+
+
+# =================
+#  PARSING OPTIONS
+# =================
+def parseopt(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(prog=PROGNAME, description="Tabulate excited states of Gaussian TD calculations")
+    parser.add_argument("logs", nargs="+", metavar="LOG", help="Gaussian output file")
+    parser.add_argument("-s", "--sep", metavar="SEP", dest="sep", default=SEP, help="Column separator, e.g. ' & '")
+    parser.add_argument(
+        "-n", "--nstate", metavar="NSTATE", dest="nstate", type=int, default=0, help="Print only the first NSTATE states"
+    )
+    opts = parser.parse_args(args)
+    return opts
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+def rows(step: dict, sep: str, nstate: int = 0):
+    """Lines of table of excited states of one TD step"""
+    for ist, state in enumerate(step["State"]):
+        if nstate and ist >= nstate:
+            break
+        fields = [str(state), "  " + str(step["Sym"][ist])]
+        for name, fmt in COLUMNS.items():
+            value = step[name][ist]
+            fields.append("" if math.isnan(value) else fmt.format(value))
+        yield sep + sep.join(fields)
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main(args=None):
+    opts = parseopt(args)
+    for log in opts.logs:
+        steps = gaulog.excitations(log)
+        if not steps:
+            print(f" No excitation energies in file {log}")
+            sys.exit(1)
+        print(f" TD results from file: {log}")
+        print(HLINE)
+        print(HEADER)
+        for step in steps:
+            for row in rows(step, opts.sep, opts.nstate):
+                print(row)
+            print(HLINE)
+    sys.exit()
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+#
+# Store and query resources and timings of finished Gaussian jobs
+#
+
+# =========
+#  MODULES
+# =========
+import os  # OS interface: os.getcwd(), os.chdir('dir'), os.system('mkdir dir')
+import sys  # System-specific functions: sys.argv(), sys.exit(), sys.stderr.write()
+import re  # Regex
+import argparse  # commandline argument parsers
+import hashlib  # Hash of input files
+import math  # C library float functions
+import socket  # Just to get hostname
+import sqlite3  # Telemetry store
+import time  # Date of records
+from feutils import errore, wide_help  # My generic functions
+
+# ==============
+#  PROGRAM DATA
+# ==============
+AUTHOR = "Franco Egidi (franco.egidi@sns.it)"
+VERSION = "2026.10.18"
+PROGNAME = os.path.basename(sys.argv[0])
+HOME = os.getenv("HOME")
+
+# ==========
+#  DEFAULTS
+# ==========
+DATADIR = os.getenv("XDG_DATA_HOME") or os.path.join(HOME, ".local", "share")
+# SQLite locks are unreliable on NFS: a home directory shared by the nodes needs GAU_TELEMETRY on a local filesystem
+DBFILE = os.getenv("GAU_TELEMETRY") or os.path.join(DATADIR, "gautelemetry", "telemetry.db")
+# Set GAU_NOTELEMETRY to record nothing
+USETELEMETRY = not os.getenv("GAU_NOTELEMETRY")
+# Seconds waiting for the database lock, many jobs end together
+TIMEOUT = 60
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    runkey TEXT UNIQUE,
+    recorded TEXT,
+    host TEXT,
+    family TEXT,
+    queue TEXT,
+    jobid TEXT,
+    input TEXT,
+    inputhash TEXT,
+    log TEXT,
+    step INTEGER,
+    route TEXT,
+    keywords TEXT,
+    version TEXT,
+    natoms INTEGER,
+    nbasis INTEGER,
+    nproc INTEGER,
+    mem INTEGER,
+    cpu REAL,
+    wall REAL,
+    status TEXT,
+    exitcode INTEGER
+);
+CREATE TABLE IF NOT EXISTS links (
+    run INTEGER REFERENCES runs(id),
+    link INTEGER,
+    calls INTEGER,
+    cpu REAL,
+    wall REAL,
+    PRIMARY KEY (run, link)
+);
+CREATE INDEX IF NOT EXISTS runs_recorded ON runs(recorded);
+"""
+# Columns runs can be grouped by
+GROUPS = ("family", "queue", "version", "host", "keywords", "status", "nproc", "input")
+# Keywords of route section, without options
+REKEYWORD = re.compile(r"(?:^|\s)([^\s=(]+)")
+RESTART = re.compile(r"^\s*#[pnt]?", flags=re.IGNORECASE)
+BLOCK = 1024**2
+
+
+# =================
+#  BASIC FUNCTIONS
+# =================
+def keywords(route: str) -> str:
+    """Sorted keywords of route section, lower case and without options"""
+    return " ".join(sorted(set(REKEYWORD.findall(RESTART.sub("", route.lower())))))
+
+
+def filehash(path: str):
+    """SHA-256 of file content or None if unreadable"""
+    sha = hashlib.sha256()
+    try:
+        with open(path, "rb") as fil:
+            for block in iter(lambda: fil.read(BLOCK), b""):
+                sha.update(block)
+    except OSError:
+        return None
+    return sha.hexdigest()
+
+
+def connect(path: str = DBFILE) -> sqlite3.Connection:
+    """Open, possibly creating, the telemetry store"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def filters(opts) -> tuple:
+    """SQL condition and parameters selecting runs from options"""
+    where, params = ["1"], []
+    for word in opts.keyword or []:
+        where.append("(' ' || keywords || ' ') LIKE ?")
+        params.append(f"% {word.lower()} %")
+    for column in ("family", "queue", "version", "status"):
+        value = getattr(opts, column)
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if opts.since is not None:
+        where.append("recorded >= ?")
+        params.append(opts.since)
+    return " AND ".join(where), params
+
+
+# =================
+#  PARSING OPTIONS
+# =================
+def parseopt(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(
+        prog=PROGNAME,
+        formatter_class=wide_help(argparse.HelpFormatter, w=140, h=40),
+        description="Record finished Gaussian jobs from their logs, or summarize the recorded ones",
+        epilog="The store must not sit on a shared NFS filesystem, where SQLite locking is unreliable and slow: "
+        + "set GAU_TELEMETRY to a file on a local filesystem, or GAU_NOTELEMETRY to record nothing.",
+    )
+    parser.add_argument("logs", nargs="*", metavar="LOG", help="Gaussian logs to record")
+    parser.add_argument("--db", metavar="FILE", dest="db", default=DBFILE, help=f"Telemetry store (default: {DBFILE})")
+    record = parser.add_argument_group("recording")
+    record.add_argument("-r", "--record", dest="record", action="store_true", help="Record LOGs")
+    record.add_argument(
+        "-i", "--input", metavar="GJF", dest="inputs", action="append", default=[], help="Input of each LOG, in order"
+    )
+    record.add_argument("--exit", metavar="STATUS", dest="exitcode", type=int, default=None, help="Exit status")
+    record.add_argument("--family", metavar="FAMILY", dest="family", default=None, help="Node family")
+    record.add_argument("--queue", metavar="QUEUE", dest="queue", default=None, help="Queue")
+    query = parser.add_argument_group("query")
+    query.add_argument("-b", "--by", metavar="COLUMN", dest="by", default="family", choices=GROUPS, help="Group by")
+    query.add_argument("-k", "--keyword", metavar="KEY", dest="keyword", action="append", help="Route keyword")
+    query.add_argument("--version", metavar="REV", dest="version", default=None, help="Gaussian revision")
+    query.add_argument("--status", metavar="STATUS", dest="status", default=None, help="normal, error or incomplete")
+    query.add_argument("--since", metavar="DATE", dest="since", default=None, help="Recorded from YYYY-MM-DD")
+    query.add_argument("-l", "--links", dest="links", action="store_true", help="Time spent in each link")
+    opts = parser.parse_args(args)
+    if opts.record and not opts.logs:
+        errore("No log to record")
+    if len(opts.inputs) > len(opts.logs):
+        errore("More inputs than logs")
+    return opts
+
+
+# ================
+#  WORK FUNCTIONS
+# ================
+def record(log: str, gjf=None, exitcode=None, family=None, queue=None, path: str = DBFILE) -> int:
+    """Record the jobs of a log, return the number of jobs not already recorded"""
+    import gaulog  # Indexed Gaussian log parser, slow to import with numpy
+
+    jobs = gaulog.summaries(log)
+    if not jobs:
+        return 0
+    queue = queue or os.getenv("PBS_QUEUE") or os.getenv("PBS_O_QUEUE")
+    common = {
+        "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "host": socket.gethostname(),
+        "family": family,
+        "queue": queue,
+        "jobid": os.getenv("PBS_JOBID"),
+        "input": os.path.abspath(gjf) if gjf else None,
+        "inputhash": filehash(gjf) if gjf else None,
+        "log": os.path.abspath(log),
+        "exitcode": exitcode,
+    }
+    added = 0
+    with connect(path) as conn:
+        for step, job in enumerate(jobs):
+            route = str(job["route"])
+            # Appending to a log or running again gives new termination lines
+            runkey = hashlib.sha1(repr((common["log"], step, route, str(job["ended"]))).encode()).hexdigest()
+            row = dict(common)
+            row.update(
+                runkey=runkey,
+                step=step,
+                route=route,
+                keywords=keywords(route),
+                version=str(job["version"]),
+                natoms=int(job["natoms"]),
+                nbasis=int(job["nbasis"]),
+                nproc=int(job["nproc"]),
+                mem=int(job["maxmem"]),
+                cpu=None if math.isnan(job["cpu"]) else float(job["cpu"]),
+                wall=None if math.isnan(job["wall"]) else float(job["wall"]),
+                status=str(job["status"]),
+            )
+            columns = ", ".join(row)
+            cursor = conn.execute(
+                f"INSERT OR IGNORE INTO runs ({columns}) VALUES ({', '.join('?' * len(row))})", tuple(row.values())
+            )
+            if not cursor.rowcount:
+                continue
+            added = added + 1
+            links = {}
+            for link, cpu, wall in zip(job["link"], job["linkcpu"], job["linkwall"]):
+                calls, tcpu, twall = links.get(int(link), (0, 0.0, 0.0))
+                links[int(link)] = (calls + 1, tcpu + float(cpu), twall + float(wall))
+            conn.executemany(
+                "INSERT INTO links (run, link, calls, cpu, wall) VALUES (?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, link) + values for link, values in links.items()],
+            )
+    conn.close()
+    return added
+
+
+def runs(conn: sqlite3.Connection, where: str = "1", params=()) -> list:
+    """Recorded jobs as dictionaries"""
+    return [dict(row) for row in conn.execute(f"SELECT * FROM runs WHERE {where} ORDER BY id", params)]
+
+
+def summary(conn: sqlite3.Connection, by: str, where: str = "1", params=()) -> list:
+    """Jobs, mean size, parallel efficiency, mean wall time and failures grouped by column"""
+    if by not in GROUPS:
+        raise ValueError(f"Cannot group by {by}")
+    query = f"""
+        SELECT {by} AS name, COUNT(*) AS runs, AVG(natoms) AS natoms, AVG(nbasis) AS nbasis, AVG(nproc) AS nproc,
+            SUM(cpu) / SUM(wall * nproc) AS efficiency, AVG(wall) / 3600 AS hours,
+            SUM(status != 'normal') AS failed
+        FROM runs WHERE {where} GROUP BY {by} ORDER BY {by}"""
+    return [dict(row) for row in conn.execute(query, params)]
+
+
+def linktimes(conn: sqlite3.Connection, where: str = "1", params=()) -> list:
+    """Calls, CPU and wall time of each link, longest first"""
+    query = f"""
+        SELECT link, SUM(calls) AS calls, SUM(links.cpu) AS cpu, SUM(links.wall) AS wall
+        FROM links JOIN runs ON links.run = runs.id WHERE {where} GROUP BY link ORDER BY SUM(links.wall) DESC"""
+    return [dict(row) for row in conn.execute(query, params)]
+
+
+# ==============
+#  MAIN PROGRAM
+# ==============
+def main(args=None):
+    opts = parseopt(args)
+    if opts.record:
+        for nlog, log in enumerate(opts.logs):
+            gjf = opts.inputs[nlog] if nlog < len(opts.inputs) else None
+            try:
+                added = record(log, gjf, opts.exitcode, opts.family, opts.queue, opts.db)
+            except (OSError, ValueError, sqlite3.Error) as err:
+                print(f"WARNING: {log} not recorded: {err}")
+                continue
+            print(f"Recorded {added} jobs of {log}")
+        sys.exit()
+    if not os.path.isfile(opts.db):
+        errore(f"No telemetry store {opts.db}")
+    conn = connect(opts.db)
+    where, params = filters(opts)
+    if opts.links:
+        print(f"{'Link':>5} {'Calls':>8} {'CPU/h':>10} {'Wall/h':>10}")
+        for row in linktimes(conn, where, params):
+            print(f"{row['link']:>5} {row['calls']:>8} {row['cpu'] / 3600:>10.2f} {row['wall'] / 3600:>10.2f}")
+    else:
+        rows = summary(conn, opts.by, where, params)
+        width = max([len(str(row["name"])) for row in rows] + [len(opts.by)])
+        header = f"{opts.by:<{width}} {'Runs':>6} {'NAtoms':>7} {'NBasis':>7}"
+        print(f"{header} {'NProc':>6} {'Eff':>5} {'Wall/h':>7} {'Fail':>5}")
+        for row in rows:
+            eff = "-" if row["efficiency"] is None else f"{row['efficiency']:.2f}"
+            hours = "-" if row["hours"] is None else f"{row['hours']:.2f}"
+            line = f"{str(row['name']):<{width}} {row['runs']:>6} {row['natoms']:>7.0f} {row['nbasis']:>7.0f}"
+            print(f"{line} {row['nproc']:>6.1f} {eff:>5} {hours:>7} {row['failed']:>5}")
+    conn.close()
+    sys.exit()
+
+
+# ===========
+#  MAIN CALL
+# ===========
+if __name__ == "__main__":
+    main()